@@ -0,0 +1,186 @@
+"""
+Full Actuaciones history: every actuacion of a process, read page by page
+(newest first) and stored in SQLite as it is read
+"""
+
+import sqlite3
+import threading
+import time
+from config import HISTORY_FILE_PATH, logger
+from excel_operations import normalize_number
+from failures import StageFailure
+
+# Columns of the history table and of the exported sheet
+HISTORY_COLUMNS = ["number", "fecha_actuacion", "actuacion", "anotacion",
+                   "fecha_inicial", "fecha_final", "fecha_registro"]
+
+
+def history_values(row):
+    """
+    The 6 Actuaciones values of a row as stripped strings
+    """
+    values = [str(value or "").strip() for value in row[:6]]
+    return values + [""] * (6 - len(values))
+
+
+def actuacion_key(row):
+    """
+    Identity of an actuacion: its 6 values (the table shows no id). Two
+    actuaciones with identical date, name and annotation are stored once.
+    """
+    return "\x1f".join(history_values(row))
+
+
+class HistoryStore:
+    """
+    On-disk history of actuaciones per normalized radicacion number.
+    A number is marked complete once its history was read down to the oldest
+    actuacion; only then may a later read stop at the first stored row
+    (an interrupted read is completed on the next run). Thread-safe.
+    """
+
+    def __init__(self, file_path=HISTORY_FILE_PATH):
+        self.file_path = file_path
+        self.added = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(file_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS actuaciones (
+                number TEXT NOT NULL,
+                row_key TEXT NOT NULL,
+                fecha_actuacion TEXT NOT NULL,
+                actuacion TEXT NOT NULL,
+                anotacion TEXT NOT NULL,
+                fecha_inicial TEXT NOT NULL,
+                fecha_final TEXT NOT NULL,
+                fecha_registro TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (number, row_key)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS complete (number TEXT PRIMARY KEY, completed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def known_keys(self, search_number):
+        """
+        Keys of the actuaciones stored for search_number
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT row_key FROM actuaciones WHERE number = ?", (normalize_number(search_number),)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def is_complete(self, search_number):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM complete WHERE number = ?", (normalize_number(search_number),)
+            ).fetchone() is not None
+
+    def mark_complete(self, search_number):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO complete VALUES (?, ?)",
+                               (normalize_number(search_number), time.time()))
+            self._conn.commit()
+
+    def add_rows(self, search_number, rows):
+        """
+        Store one page worth of actuaciones (6 values each) and commit, so
+        rows are on disk as soon as their page has been read
+        """
+        number = normalize_number(search_number)
+        now = time.time()
+        records = []
+        for row in rows:
+            values = history_values(row)
+            records.append([number, actuacion_key(values)] + values + [now])
+        with self._lock:
+            added = self._conn.executemany(
+                "INSERT OR IGNORE INTO actuaciones VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", records
+            ).rowcount
+            self._conn.commit()
+            self.added += max(added, 0)
+
+    def iter_rows(self):
+        """
+        Yield every stored actuacion as a HISTORY_COLUMNS list, newest first per number
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT number, fecha_actuacion, actuacion, anotacion, fecha_inicial, fecha_final, "
+                "fecha_registro FROM actuaciones ORDER BY number, fecha_actuacion DESC, rowid"
+            ).fetchall()
+        for row in rows:
+            yield list(row)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def collect_history(search_number, pages, store):
+    """
+    Store the actuaciones of search_number from pages, an iterable of row
+    lists (newest first) that fetches each page only when it is needed.
+    Reading stops at the first actuacion already stored when the stored
+    history is complete. A page that cannot be read ends the walk without
+    failing the lookup; the history stays incomplete and is read again on
+    the next run. Returns the number of new actuaciones stored.
+    """
+    complete = store.is_complete(search_number)
+    known = store.known_keys(search_number) if complete else set()
+    seen = set()
+    new_rows = 0
+    try:
+        for page_number, page in enumerate(pages, start=1):
+            fresh = []
+            reached_known = False
+            for row in page:
+                key = actuacion_key(row)
+                if key in known:
+                    reached_known = True
+                    break
+                if key not in seen:
+                    seen.add(key)
+                    fresh.append(row)
+            if fresh:
+                store.add_rows(search_number, fresh)
+                new_rows += len(fresh)
+            if reached_known:
+                logger.info(f"History of {search_number}: {new_rows} new actuacion(es), "
+                            f"stopped at a stored one on page {page_number}")
+                return new_rows
+    except StageFailure as e:
+        logger.warning(f"History of {search_number} left incomplete: {str(e)}")
+        return new_rows
+
+    store.mark_complete(search_number)
+    logger.info(f"History of {search_number}: {new_rows} new actuacion(es), read to the oldest")
+    return new_rows
+
+
+def export_history_to_xlsx(store, xlsx_path):
+    """
+    Write the whole history to an .xlsx file (sheet "Actuaciones") in
+    write-only mode. Returns the number of rows written, or -1 on error.
+    """
+    try:
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet("Actuaciones")
+        worksheet.append(HISTORY_COLUMNS)
+        written = 0
+        for row in store.iter_rows():
+            worksheet.append(row)
+            written += 1
+        workbook.save(xlsx_path)
+        logger.info(f"Exported {written} actuacion(es) to: {xlsx_path}")
+        return written
+    except Exception as e:
+        logger.error(f"Error exporting history to {xlsx_path}: {str(e)}", exc_info=True)
+        return -1
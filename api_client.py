@@ -0,0 +1,223 @@
+"""
+Browserless lookups against the consulta procesos JSON backend
+"""
+
+import json
+import re
+import threading
+from config import API_BASE_URL, HTTP_TIMEOUT_SECONDS, HTTP_POOL_MAXSIZE, logger
+from rate_limiter import search_limiter
+from incremental import is_unchanged, unchanged_result
+from stage_timing import timed
+from failures import run_stage, StageFailure, NOT_FOUND
+from actuaciones_history import collect_history
+
+
+class ApiError(Exception):
+    """
+    Raised when the backend answers with an error status or an unreadable body
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+# Shared keep-alive connection pool (thread-safe, created on first use)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_http_pool():
+    """
+    Return the process-wide keep-alive connection pool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import urllib3
+
+            _pool = urllib3.PoolManager(
+                maxsize=HTTP_POOL_MAXSIZE,
+                block=True,
+                retries=False,
+                timeout=urllib3.Timeout(total=HTTP_TIMEOUT_SECONDS),
+                headers={"Accept": "application/json"}
+            )
+        return _pool
+
+
+def get_json(path, params=None):
+    """
+    GET API_BASE_URL + path and return the decoded JSON body.
+    Every request goes through the shared rate limiter.
+    Raises ApiError on HTTP errors or invalid JSON.
+    """
+    url = API_BASE_URL.rstrip("/") + path
+    with search_limiter.request():
+        response = get_http_pool().request("GET", url, fields=params)
+        if response.status >= 400:
+            raise ApiError(f"HTTP {response.status} for {url}", status=response.status)
+    try:
+        return json.loads(response.data.decode("utf-8"))
+    except ValueError as e:
+        raise ApiError(f"Invalid JSON from {url}: {str(e)}", status=response.status)
+
+
+# ============================================================================
+# BACKEND CALLS
+# ============================================================================
+
+@timed("http_search")
+def search_procesos(search_number):
+    """
+    Search processes by radicacion number (the 23 digits, any punctuation is dropped).
+    Returns the list of processes found.
+    """
+    numero = re.sub(r"\D", "", str(search_number))
+    data = get_json("/Procesos/Consulta/NumeroRadicacion",
+                    {"numero": numero, "SoloActivos": "false", "pagina": 1})
+    return data.get("procesos") or []
+
+
+@timed("http_detalle")
+def fetch_detalle(id_proceso):
+    """
+    Fetch the process detail (Datos del Proceso)
+    """
+    return get_json(f"/Proceso/Detalle/{id_proceso}")
+
+
+@timed("http_actuaciones")
+def fetch_actuaciones(id_proceso, pagina=1):
+    """
+    Fetch one page of actuaciones, most recent first
+    """
+    return get_json(f"/Proceso/Actuaciones/{id_proceso}", {"pagina": pagina})
+
+
+@timed("http_sujetos")
+def fetch_sujetos(id_proceso, pagina=1):
+    """
+    Fetch one page of sujetos procesales
+    """
+    return get_json(f"/Proceso/Sujetos/{id_proceso}", {"pagina": pagina})
+
+
+# ============================================================================
+# PAYLOAD MAPPING - Same values the Selenium path reads from the tables
+# ============================================================================
+
+def format_api_date(value):
+    """
+    Format an API timestamp ("2024-03-01T00:00:00") like the site's tables ("2024-03-01")
+    """
+    if not value:
+        return ""
+    return str(value)[:10]
+
+
+def actuacion_to_row(actuacion):
+    """
+    Map one actuacion payload to the 6 Actuaciones columns (E-J)
+    """
+    return [
+        format_api_date(actuacion.get("fechaActuacion")),
+        (actuacion.get("actuacion") or "").strip(),
+        (actuacion.get("anotacion") or "").strip(),
+        format_api_date(actuacion.get("fechaInicial")),
+        format_api_date(actuacion.get("fechaFinal")),
+        format_api_date(actuacion.get("fechaRegistro"))
+    ]
+
+
+def sujetos_to_partes(sujetos):
+    """
+    Return the first Demandante and Demandado names from a sujetos payload
+    """
+    partes = {"demandante": "", "demandado": ""}
+    for sujeto in sujetos:
+        tipo = (sujeto.get("tipoSujeto") or "").strip().lower()
+        nombre = (sujeto.get("nombreRazonSocial") or "").strip()
+        if tipo in partes and not partes[tipo]:
+            partes[tipo] = nombre
+    return partes
+
+
+def build_result(proceso, detalle, actuaciones, sujetos):
+    """
+    Build the same result dictionary scrape_number returns from API payloads
+    """
+    result = {"despacho": "", "actuaciones": [], "demandante": "", "demandado": ""}
+    result["despacho"] = ((detalle or {}).get("despacho") or proceso.get("despacho") or "").strip()
+    if actuaciones:
+        result["actuaciones"] = actuacion_to_row(actuaciones[0])
+    result.update(sujetos_to_partes(sujetos))
+    return result
+
+
+def iter_actuaciones_pages(id_proceso, first_page):
+    """
+    Yield the Actuaciones rows of every backend page, newest first, starting
+    with the already fetched first_page payload. Each further page is
+    requested only when the caller asks for it.
+    """
+    payload = first_page
+    pagina = 1
+    while True:
+        yield [actuacion_to_row(a) for a in payload.get("actuaciones") or []]
+        paginas = (payload.get("paginacion") or {}).get("cantidadPaginas") or 1
+        if pagina >= paginas or not payload.get("actuaciones"):
+            return
+        pagina += 1
+        payload = run_stage("http_actuaciones", fetch_actuaciones, id_proceso, pagina, check_result=False)
+
+
+# ============================================================================
+# FULL LOOKUP
+# ============================================================================
+
+def fetch_number(search_number, known_actuaciones=None, history=None):
+    """
+    Look up one number through the JSON backend.
+    Returns the same dictionary as web_scraper.scrape_number ('despacho',
+    'actuaciones', 'demandante', 'demandado'). Each backend request is
+    retried on its own; raises StageFailure when one still fails, or with
+    NOT_FOUND when the number has no public process.
+
+    Incremental mode: when known_actuaciones (the stored E-J values) is given
+    and the latest actuacion matches it, the detail and sujetos requests are
+    skipped and {'changed': False, 'actuaciones': [...]} is returned.
+
+    history (an actuaciones_history.HistoryStore) also stores the full
+    Actuaciones history, reading further pages only until a stored actuacion.
+    """
+    procesos = run_stage("http_search", search_procesos, search_number, failure_kind=NOT_FOUND)
+
+    # Same choice as the browser: the first process that can be opened
+    public_procesos = [p for p in procesos if not p.get("esPrivado")]
+    if not public_procesos:
+        raise StageFailure(NOT_FOUND, "http_search", "no public process")
+
+    proceso = public_procesos[0]
+    id_proceso = proceso.get("idProceso")
+    logger.info(f"Found process {id_proceso} for: {search_number}")
+
+    first_page = run_stage("http_actuaciones", fetch_actuaciones, id_proceso, check_result=False)
+    actuaciones = first_page.get("actuaciones") or []
+    if history is not None:
+        collect_history(search_number, iter_actuaciones_pages(id_proceso, first_page), history)
+    if known_actuaciones is not None:
+        latest_row = actuacion_to_row(actuaciones[0]) if actuaciones else []
+        if is_unchanged(latest_row, known_actuaciones):
+            logger.info(f"No new actuacion for {search_number}, skipping detail and sujetos")
+            return unchanged_result(latest_row)
+
+    detalle = run_stage("http_detalle", fetch_detalle, id_proceso, check_result=False)
+    sujetos = run_stage("http_sujetos", fetch_sujetos, id_proceso, check_result=False).get("sujetos") or []
+
+    result = build_result(proceso, detalle, actuaciones, sujetos)
+    if known_actuaciones is not None:
+        result["changed"] = True
+    logger.info(f"Fetched {search_number} via HTTP - Despacho: {result['despacho']}")
+    return result
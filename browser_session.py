@@ -0,0 +1,220 @@
+"""
+Browser session manager: keeps one worker's Chrome session healthy and
+replaces it, warmed up in the background, before it slows down
+"""
+
+import statistics
+import threading
+from collections import deque
+from config import (
+    logger,
+    SESSION_MAX_LOOKUPS,
+    SESSION_MAX_RENDERER_MB,
+    SESSION_MEMORY_CHECK_EVERY,
+    SESSION_LATENCY_WINDOW,
+    SESSION_DEGRADATION_FACTOR,
+    SESSION_WARM_AHEAD
+)
+from web_driver import access_url, is_session_alive, return_to_search_form, quit_driver
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# ============================================================================
+# HEALTH SIGNALS
+# ============================================================================
+
+def renderer_memory_mb(driver):
+    """
+    Memory used by the session's page in MB: the RSS of Chrome's renderer
+    processes when psutil is installed, otherwise the page's JS heap from
+    the DevTools Performance domain. None if neither can be read.
+    """
+    if psutil is not None:
+        try:
+            chrome_processes = psutil.Process(driver.service.process.pid).children(recursive=True)
+            rss = sum(p.memory_info().rss for p in chrome_processes if "--type=renderer" in " ".join(p.cmdline()))
+            if rss:
+                return rss / (1024 * 1024)
+        except Exception as e:
+            logger.debug(f"Could not read renderer RSS: {str(e)}")
+    try:
+        driver.execute_cdp_cmd("Performance.enable", {})
+        metrics = driver.execute_cdp_cmd("Performance.getMetrics", {}).get("metrics") or []
+        heap = next((m["value"] for m in metrics if m.get("name") == "JSHeapUsedSize"), None)
+        return None if heap is None else heap / (1024 * 1024)
+    except Exception as e:
+        logger.debug(f"Could not read JS heap size: {str(e)}")
+        return None
+
+
+# ============================================================================
+# SESSION MANAGER
+# ============================================================================
+
+class BrowserSession:
+    """
+    One worker's browser. acquire() returns a driver on the search form and
+    record() feeds back how each lookup went. The manager tracks lookups per
+    driver, renderer memory and rolling lookup latency, and when a limit is
+    reached it starts a replacement browser on a background thread. The
+    replacement takes over once it is ready; the old driver is closed in the
+    background. Used by a single worker thread.
+    """
+
+    def __init__(self):
+        self.driver = None
+        # The driver was just started and is already on the search form
+        self._fresh = False
+        # (thread, box): box["driver"] is set by the warming thread when it finishes
+        self._replacement = None
+        self._retiring = []
+        self.recycled = 0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.lookups = 0
+        self.memory_mb = None
+        self.baseline_latency = None
+        self.latencies = deque(maxlen=SESSION_LATENCY_WINDOW)
+        self.recycle_reason = None
+
+    # ------------------------------------------------------------------
+    # Replacement browser
+    # ------------------------------------------------------------------
+
+    def _start_replacement(self, reason):
+        if self._replacement is not None:
+            return
+        self.recycle_reason = reason
+        logger.info(f"Warming a replacement browser ({reason})")
+        box = {}
+
+        def warm():
+            box["driver"] = access_url()
+
+        thread = threading.Thread(target=warm, name=f"{threading.current_thread().name}-warm", daemon=True)
+        thread.start()
+        self._replacement = (thread, box)
+
+    def _take_replacement(self, wait):
+        """
+        Return (finished, driver) for the warming browser. Without wait, an
+        unfinished replacement is left running and (False, None) is returned.
+        """
+        if self._replacement is None:
+            return False, None
+        thread, box = self._replacement
+        if thread.is_alive() and not wait:
+            return False, None
+        thread.join()
+        self._replacement = None
+        return True, box.get("driver")
+
+    def _retire(self, driver):
+        """
+        Close a driver on a background thread so the worker can go on
+        """
+        if driver is None:
+            return
+        thread = threading.Thread(target=quit_driver, args=(driver,), name="retire-browser", daemon=True)
+        thread.start()
+        self._retiring.append(thread)
+
+    def _switch_to(self, driver, reason):
+        self._retire(self.driver)
+        self.driver = driver
+        self._fresh = True
+        self.recycled += 1
+        logger.info(f"Browser session recycled ({reason}); {self.recycled} so far on this worker")
+        self._reset_stats()
+
+    def _promote_replacement(self):
+        """
+        Swap in the replacement browser once it is ready. At the lookup limit
+        the worker waits for it instead of going on with the old session.
+        """
+        if self._replacement is None:
+            return
+        finished, driver = self._take_replacement(wait=self.lookups >= SESSION_MAX_LOOKUPS)
+        if not finished:
+            return
+        if driver is None:
+            # Try again after the next lookup; the current session keeps working meanwhile
+            logger.warning(f"Replacement browser could not be started ({self.recycle_reason})")
+            self.recycle_reason = None
+            return
+        self._switch_to(driver, self.recycle_reason)
+
+    # ------------------------------------------------------------------
+    # Worker interface
+    # ------------------------------------------------------------------
+
+    def acquire(self):
+        """
+        Return a driver positioned on the search form, or None if no browser
+        could be started. A broken session is replaced right away (by the
+        warming replacement if there is one).
+        """
+        self._promote_replacement()
+
+        if self._fresh and self.driver is not None:
+            self._fresh = False
+            return self.driver
+        if is_session_alive(self.driver) and return_to_search_form(self.driver):
+            return self.driver
+
+        if self.driver is not None:
+            logger.warning("Browser session is not usable, starting a new one")
+        self._retire(self.driver)
+        self.driver = None
+        finished, driver = self._take_replacement(wait=True)
+        self.driver = driver if finished and driver is not None else access_url()
+        self._reset_stats()
+        return self.driver
+
+    def record(self, seconds, ok=True):
+        """
+        Account one lookup on the current driver and start warming a
+        replacement when a recycling limit is reached
+        """
+        if self.driver is None:
+            return
+        self.lookups += 1
+        if ok:
+            self.latencies.append(seconds)
+            if self.baseline_latency is None and len(self.latencies) == self.latencies.maxlen:
+                self.baseline_latency = statistics.median(self.latencies)
+        if self._replacement is not None:
+            return
+
+        if self.lookups >= SESSION_MAX_LOOKUPS - SESSION_WARM_AHEAD:
+            self._start_replacement(f"{self.lookups} lookups")
+            return
+
+        if SESSION_MEMORY_CHECK_EVERY and self.lookups % SESSION_MEMORY_CHECK_EVERY == 0:
+            self.memory_mb = renderer_memory_mb(self.driver)
+            if self.memory_mb is not None and self.memory_mb > SESSION_MAX_RENDERER_MB:
+                self._start_replacement(f"renderer memory {self.memory_mb:.0f} MB")
+                return
+
+        if self.baseline_latency and len(self.latencies) == self.latencies.maxlen:
+            current = statistics.median(self.latencies)
+            if current > self.baseline_latency * SESSION_DEGRADATION_FACTOR:
+                self._start_replacement(f"median lookup {current:.2f}s vs {self.baseline_latency:.2f}s at start")
+
+    def close(self):
+        """
+        Close the current and the replacement browser and wait for every
+        retired browser to exit
+        """
+        self._retire(self.driver)
+        self.driver = None
+        _, driver = self._take_replacement(wait=True)
+        self._retire(driver)
+        for thread in self._retiring:
+            thread.join()
+        self._retiring = []
@@ -0,0 +1,157 @@
+"""
+Crash-safe checkpoint journal: one fsync'd JSON line per finished number
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from config import JOURNAL_FILE_PATH, DEAD_LETTER_FILE_PATH, logger
+from excel_operations import normalize_number
+
+# Journal statuses
+COMPLETED = "completed"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+def partial_file_path(file_path):
+    """
+    Path a run writes its journal or dead-letter file to until it finishes
+    (e.g. run_journal.partial.jsonl), so the previous run's file is only
+    replaced by a complete one
+    """
+    base, extension = os.path.splitext(file_path)
+    return f"{base}.partial{extension}"
+
+
+class RunJournal:
+    """
+    Append-only journal of completed, failed and skipped numbers with the
+    stage they reached. Completed entries carry the extracted result, so a
+    resumed run can re-apply them without looking the number up again.
+
+    A run writes to the partial file and only replaces the journal at
+    file_path once it finishes (close(finished=True)), so the last finished
+    run's journal survives a new run until that one is done. --resume
+    continues an interrupted run's partial journal if there is one,
+    otherwise the last finished journal.
+    """
+
+    def __init__(self, file_path=JOURNAL_FILE_PATH, resume=False):
+        self.file_path = file_path
+        self.partial_path = partial_file_path(file_path)
+        self._lock = threading.Lock()
+        if resume:
+            if not os.path.exists(self.partial_path) and os.path.exists(file_path):
+                shutil.copyfile(file_path, self.partial_path)
+            self.entries = self.replay(self.partial_path)
+        else:
+            self.entries = {}
+            if os.path.exists(self.partial_path):
+                logger.info(f"Starting a new checkpoint journal (interrupted run discarded): {self.partial_path}")
+        # Resumed runs keep appending to the same journal
+        self._file = open(self.partial_path, "a" if resume else "w", encoding="utf-8")
+
+    @staticmethod
+    def replay(file_path):
+        """
+        Read a journal and return {number: last entry}. A torn last line
+        (crash while writing) is ignored.
+        """
+        entries = {}
+        if not os.path.exists(file_path):
+            logger.warning(f"No checkpoint journal to resume from: {file_path}")
+            return entries
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry["number"]] = entry
+        logger.info(f"Replayed checkpoint journal: {len(entries)} number(s) recorded")
+        return entries
+
+    def record(self, search_number, status, stage, result=None, error=None):
+        """
+        Append one entry and fsync it before returning
+        """
+        entry = {
+            "number": normalize_number(search_number),
+            "status": status,
+            "stage": stage,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        if result is not None:
+            entry["result"] = result
+        if error:
+            entry["error"] = error
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.entries[entry["number"]] = entry
+
+    def last_entry(self, search_number):
+        """
+        Return the last recorded entry for search_number, or None
+        """
+        return self.entries.get(normalize_number(search_number))
+
+    def close(self, finished=False):
+        """
+        Close the journal; a finished run's journal replaces the previous one
+        """
+        with self._lock:
+            self._file.close()
+            if finished:
+                os.replace(self.partial_path, self.file_path)
+
+
+class DeadLetterFile:
+    """
+    JSON lines of the numbers of this run that still failed after their
+    retries, with the failure kind and stage. The file is a valid --input,
+    so the failed numbers can be re-run on their own.
+
+    Entries go to the partial file; it replaces file_path only when the run
+    finishes, so a --retry-dead-letter run reads the previous dead letters
+    while it runs, and an interrupted one leaves them in place.
+    """
+
+    def __init__(self, file_path=DEAD_LETTER_FILE_PATH):
+        self.file_path = file_path
+        self.partial_path = partial_file_path(file_path)
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(self.partial_path, "w", encoding="utf-8")
+
+    def record(self, search_number, kind, stage, error=None):
+        entry = {
+            "number": normalize_number(search_number),
+            "kind": kind,
+            "stage": stage,
+            "error": error or "",
+            "time": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.count += 1
+
+    def close(self, finished=False):
+        """
+        Close the file; a finished run's dead letters replace the previous ones
+        """
+        with self._lock:
+            self._file.close()
+            if finished:
+                os.replace(self.partial_path, self.file_path)
+            elif self.count:
+                logger.warning(f"Run interrupted: {self.file_path} kept, "
+                               f"this run's {self.count} failure(s) are in {self.partial_path}")
@@ -2,9 +2,16 @@
 Configuration and logging setup for NumeroRadicacion project
 """
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import socket
 import sys
+import threading
 from datetime import datetime
 
 # ============================================================================
@@ -19,49 +26,522 @@ else:
     # Running in normal Python environment
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-URL = "https://consultaprocesos.ramajudicial.gov.co/Procesos/NumeroRadicacion"
+# Consulta site (can point to the local replica in tests/ for offline runs)
+URL = os.environ.get(
+    "NUMERO_RADICACION_URL",
+    "https://consultaprocesos.ramajudicial.gov.co/Procesos/NumeroRadicacion"
+)
+# JSON backend used by the consulta site (can point to a local stub for offline runs)
+API_BASE_URL = os.environ.get(
+    "NUMERO_RADICACION_API_URL",
+    "https://consultaprocesos.ramajudicial.gov.co:448/api/v2"
+)
 EXCEL_FILE_PATH = os.path.join(BASE_DIR, "NumeroRadicacion.xlsx")
-LOG_DIR = os.path.join(BASE_DIR, "logs")
-LOG_FILE_PATH = os.path.join(LOG_DIR, f"execution_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+# Directory of the run logs (the log file itself is named after the run, see log_file_path())
+LOG_DIR = os.environ.get("NUMERO_RADICACION_LOG_DIR", os.path.join(BASE_DIR, "logs"))
+RUN_TIMESTAMP = datetime.now().strftime('%Y%m%d_%H%M%S')
+LOG_FILE_NAME = f"execution_{RUN_TIMESTAMP}.log"
+CACHE_FILE_PATH = os.path.join(BASE_DIR, "results_cache.sqlite3")
+# Checkpoint journal of the current run, used by --resume after a crash
+JOURNAL_FILE_PATH = os.path.join(BASE_DIR, "run_journal.jsonl")
+# Full Actuaciones history of every process looked up with --history
+HISTORY_FILE_PATH = os.path.join(BASE_DIR, "actuaciones_history.sqlite3")
+# Numbers that still failed after their retries (re-run with --retry-dead-letter)
+DEAD_LETTER_FILE_PATH = os.path.join(BASE_DIR, "dead_letter.jsonl")
+# Last successful fetch and change count per number, used to schedule lookups
+FETCH_STATS_FILE_PATH = os.path.join(BASE_DIR, "fetch_stats.sqlite3")
+# Shared job queue of a multi-node run (--queue); must be on a volume every node can lock
+QUEUE_FILE_PATH = os.path.join(BASE_DIR, "job_queue.sqlite3")
+# chromedriver/Chrome paths found by Selenium Manager, reused by later runs
+DRIVER_PATHS_FILE = os.path.join(BASE_DIR, "driver_paths.json")
+# Per-stage timing trace of the current run (Chrome trace-event JSON)
+TRACE_DIR = os.path.join(BASE_DIR, "traces")
+TRACE_FILE_PATH = os.path.join(TRACE_DIR, f"trace_{RUN_TIMESTAMP}.json")
+
+# Record per-stage timing spans, print a p50/p95/max summary at the end of
+# the run and save them to TRACE_FILE_PATH
+TRACE_ENABLED = True
+# Durations kept per stage for the p50/p95 summary (a random sample once a
+# stage has more spans; count, failures and max are always exact)
+TRACE_SAMPLE_SIZE = 2000
+
+# ============================================================================
+# BROWSER SESSION
+# ============================================================================
+
+# Keep one Chrome session alive for the whole batch and return to the search
+# form between numbers instead of launching a new browser for each number.
+# A fresh driver is only created when the current session is broken.
+REUSE_BROWSER_SESSION = True
+
+# A reused session is recycled (replaced by a new browser) after
+# SESSION_MAX_LOOKUPS lookups, when its renderer uses more than
+# SESSION_MAX_RENDERER_MB (checked every SESSION_MEMORY_CHECK_EVERY lookups;
+# renderer RSS with psutil installed, otherwise the page's JS heap), or when
+# the median of its last SESSION_LATENCY_WINDOW lookups is more than
+# SESSION_DEGRADATION_FACTOR times the median of its first ones.
+# The replacement is started in the background SESSION_WARM_AHEAD lookups
+# before the limit (or as soon as memory or latency trip) and takes over
+# once it is on the search form, so the worker never waits for a new browser.
+SESSION_MAX_LOOKUPS = 200
+SESSION_MAX_RENDERER_MB = 1024
+SESSION_MEMORY_CHECK_EVERY = 10
+SESSION_LATENCY_WINDOW = 20
+SESSION_DEGRADATION_FACTOR = 2.0
+SESSION_WARM_AHEAD = 5
+
+# ============================================================================
+# CHROME PROFILE
+# ============================================================================
+
+# Run Chrome without a window
+CHROME_HEADLESS = True
+
+# "eager" returns from driver.get() once the DOM is ready instead of waiting
+# for every subresource; the search form wait covers the rest ("normal" to disable)
+CHROME_PAGE_LOAD_STRATEGY = "eager"
+
+# Window size used for layout (also in headless mode)
+CHROME_WINDOW_SIZE = "1366,900"
+
+# Resources the page does not need for the lookup
+CHROME_DISABLE_IMAGES = True
+CHROME_DISABLE_FONTS = True
+CHROME_DISABLE_MEDIA = True
+
+# Third-party and analytics requests blocked through CDP Network.setBlockedURLs
+# ("*" wildcards). Stylesheets are kept: the waits rely on element visibility.
+CHROME_BLOCKED_URLS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*facebook.com/tr*",
+    "*hotjar.com*",
+    "*clarity.ms*",
+    "*youtube.com*",
+    "*twitter.com*",
+    "*addthis.com*"
+]
+
+# Extra command line switches passed to Chrome as-is
+CHROME_EXTRA_ARGUMENTS = []
+
+# ============================================================================
+# LOOKUP ENGINE
+# ============================================================================
+
+# How each number is looked up:
+#   "selenium" - drive Chrome through the consulta site
+#   "http"     - call the site's JSON backend directly (no browser)
+LOOKUP_ENGINE = "selenium"
+
+# HTTP engine: request timeout (in seconds) and keep-alive connections kept per host
+HTTP_TIMEOUT_SECONDS = 20
+HTTP_POOL_MAXSIZE = 10
+
+# ============================================================================
+# WORKER POOL
+# ============================================================================
+
+# Input read by default (.xlsx column D, .csv or .jsonl). Results are always
+# written to EXCEL_FILE_PATH.
+INPUT_FILE_PATH = EXCEL_FILE_PATH
+
+# Number of concurrent lookup workers. Each worker owns its own driver (or
+# shares the HTTP pool) and pulls numbers from a shared queue; results are
+# written by a single collector.
+WORKER_COUNT = 1
+
+# Numbers read ahead of the workers (per worker). Input is streamed, so only
+# this many numbers are held in memory waiting for a worker.
+WORK_QUEUE_SIZE_PER_WORKER = 4
+
+# ============================================================================
+# RETRIES
+# ============================================================================
+
+# A failed stage (click, tab, extraction or backend request) is retried on
+# its own, up to RETRY_ATTEMPTS attempts in total, waiting an exponentially
+# growing, jittered delay (RETRY_BASE_DELAY_SECONDS, 2x, 4x, ... capped at
+# RETRY_MAX_DELAY_SECONDS) between attempts
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 20.0
+
+# Failure kinds worth retrying ("timeout", "site_error", "parse_failure");
+# "not_found" never changes on retry
+RETRYABLE_FAILURES = ["timeout", "site_error", "parse_failure"]
+
+# ============================================================================
+# RATE LIMITING
+# ============================================================================
+
+# Every search (browser lookup or backend request) goes through one shared
+# limiter: a token bucket for requests per second plus an AIMD concurrency
+# limit. Both grow slowly while latency and error rate stay healthy and are
+# halved on timeouts, HTTP 429/5xx or a sustained latency increase.
+RATE_LIMIT_INITIAL_RPS = 0.5
+RATE_LIMIT_MIN_RPS = 0.1
+RATE_LIMIT_MAX_RPS = 5.0
+RATE_LIMIT_RPS_STEP = 0.1
+RATE_LIMIT_BURST = 2
+
+CONCURRENCY_INITIAL = 1
+CONCURRENCY_MAX = 8
+
+# Latency back-off: every RATE_LIMIT_LATENCY_SAMPLES healthy requests, the
+# RATE_LIMIT_LATENCY_PERCENTILE of their latencies is compared with the
+# baseline (running average of the previous batches' medians). The limits are
+# halved when it is above both this many times the baseline and
+# RATE_LIMIT_LATENCY_FLOOR_SECONDS, so a single slow request or a slowdown
+# that is still fast in absolute terms does not back off.
+RATE_LIMIT_LATENCY_FACTOR = 2.5
+RATE_LIMIT_LATENCY_PERCENTILE = 0.9
+RATE_LIMIT_LATENCY_SAMPLES = 20
+RATE_LIMIT_LATENCY_FLOOR_SECONDS = 2.0
+
+# Back off when more than this fraction of the recent requests failed
+RATE_LIMIT_ERROR_RATE = 0.2
+RATE_LIMIT_WINDOW = 20
+
+# ============================================================================
+# PAGE WAITS
+# ============================================================================
+
+# Maximum time (in seconds) to wait for a page step to become ready.
+# Steps move on as soon as their readiness condition is met.
+WAIT_TIMEOUT_SECONDS = 10
+
+# Elements that indicate the page is still loading (spinners, overlays)
+LOADING_OVERLAY_SELECTOR = (
+    ".v-overlay--active, .v-progress-circular--indeterminate, "
+    ".v-progress-linear--active, [aria-busy='true']"
+)
+
+# ============================================================================
+# EXTRACTION
+# ============================================================================
+
+# How table data is read from the page:
+#   "script" - one injected script per tab returns every table as JSON
+#   "dom"    - walk the tables element by element (one WebDriver call per cell)
+#   "network" - read the JSON the page itself fetches (DevTools performance
+#               log) and map it like the HTTP engine; tables are never read
+EXTRACTION_MODE = "script"
+
+# ============================================================================
+# RESULT CACHE
+# ============================================================================
+
+# Results are cached on disk per radicacion number. Entries younger than
+# CACHE_TTL_HOURS are written to Excel without opening the browser;
+# use --refresh or --invalidate to force a new lookup.
+CACHE_ENABLED = True
+CACHE_TTL_HOURS = 24
+
+# ============================================================================
+# SCHEDULING
+# ============================================================================
+
+# Look the most valuable numbers up first instead of in input order (also
+# with --schedule, and always with --max-minutes). The value of a number is
+#   (1 + SCHEDULE_PRIORITY_WEIGHT * priority) * hours since its last
+#   successful fetch * (SCHEDULE_MIN_CHANGE_RATE + share of its past
+#   lookups that found a new actuacion)
+# priority comes from an optional "Prioridad"/"priority" input column
+# (0 when missing); a number never fetched counts as
+# SCHEDULE_NEVER_FETCHED_HOURS old and its change rate starts at 1/2.
+SCHEDULE_BY_VALUE = False
+SCHEDULE_PRIORITY_WEIGHT = 1.0
+SCHEDULE_MIN_CHANGE_RATE = 0.05
+SCHEDULE_NEVER_FETCHED_HOURS = 24 * 365
+
+# ============================================================================
+# INCREMENTAL MODE
+# ============================================================================
+
+# Only re-extract processes with a new actuacion: the latest actuacion is
+# compared with columns E-J (or the cached snapshot) and the lookup stops
+# there when nothing changed. Can also be enabled with --incremental.
+INCREMENTAL_MODE = False
+
+# ============================================================================
+# ACTUACIONES HISTORY
+# ============================================================================
+
+# Also read every page of the Actuaciones table (or backend pages) and
+# store each actuacion in HISTORY_FILE_PATH as it is read. Pages are read
+# newest first and reading stops at the first actuacion already stored, so
+# later runs only read the new ones. Can also be enabled with --history.
+ACTUACIONES_HISTORY = False
+
+# ============================================================================
+# MULTI-NODE RUNS
+# ============================================================================
+
+# Name of this node in the shared job queue (--node-id overrides it)
+NODE_ID = os.environ.get("NUMERO_RADICACION_NODE", f"{socket.gethostname()}-{os.getpid()}")
+
+# A node leases QUEUE_CLAIM_BATCH numbers at a time for QUEUE_LEASE_SECONDS
+# and renews its leases every QUEUE_HEARTBEAT_SECONDS while it runs. When a
+# node dies its leases expire and its numbers go to the other nodes; a number
+# whose lease expired QUEUE_MAX_ATTEMPTS times is marked failed.
+QUEUE_LEASE_SECONDS = 120
+QUEUE_HEARTBEAT_SECONDS = 30
+QUEUE_CLAIM_BATCH = 5
+QUEUE_MAX_ATTEMPTS = 3
+# How often a node with nothing to claim checks for expired leases of other nodes
+QUEUE_POLL_SECONDS = 5
+
+# ============================================================================
+# EXCEL WRITES
+# ============================================================================
+
+# Results are buffered in memory and saved to the workbook in batches:
+# every WRITE_FLUSH_ROWS updated rows or WRITE_FLUSH_SECONDS seconds,
+# whichever comes first, plus once at the end of the run
+WRITE_FLUSH_ROWS = 25
+WRITE_FLUSH_SECONDS = 30
+
+# ============================================================================
+# RESULT SINKS
+# ============================================================================
+
+# Where results are written: "excel" (columns A-J of EXCEL_FILE_PATH),
+# "csv", "sqlite" and "parquet" (needs pyarrow). Several can be combined.
+RESULT_SINKS = ["excel"]
+
+# Output file of each append-friendly sink (for parquet, a directory that
+# gets one part file per run)
+RESULT_SINK_PATHS = {
+    "csv": os.path.join(BASE_DIR, "results.csv"),
+    "sqlite": os.path.join(BASE_DIR, "results.sqlite3"),
+    "parquet": os.path.join(BASE_DIR, "results.parquet")
+}
+
+# SQLite commits / Parquet row groups every SINK_BATCH_ROWS results
+SINK_BATCH_ROWS = 100
+
+# ============================================================================
+# LOGGING
+# ============================================================================
+
+# Log file layout: "text" (one readable line per record) or "jsonl" (one JSON
+# object per line: time, level, thread, module, line, message)
+LOG_FILE_FORMAT = "text"
+
+# Rotation of the run's log file: "size" (LOG_MAX_BYTES per file), "time"
+# (a new file every LOG_ROTATE_WHEN) or None (a single file)
+LOG_ROTATION = "size"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_ROTATE_WHEN = "midnight"
+# Rotated files kept per run
+LOG_BACKUP_COUNT = 5
+# Log files kept in LOG_DIR across runs (oldest deleted first, None keeps all)
+LOG_KEEP_FILES = 50
+
+# DEBUG records are limited per call site: at most LOG_DEBUG_PER_SECOND per
+# second from one logging line; the rest are dropped and counted, and the next
+# record let through says how many were dropped
+LOG_DEBUG_PER_SECOND = 20
 
 # ============================================================================
 # LOGGING CONFIGURATION
 # ============================================================================
 
+def log_file_path():
+    """
+    Path of the run's log file, in LOG_DIR as it is set now (so a LOG_DIR
+    overridden after config is imported still moves the log file)
+    """
+    return os.path.join(LOG_DIR, LOG_FILE_NAME)
+
+
+class LazyFileOpenMixin:
+    """
+    Creates the logs directory and the log file with the first record, so
+    importing config never touches the disk. The file goes to LOG_DIR as it
+    is at that moment. Old log files beyond LOG_KEEP_FILES are deleted at
+    the same moment.
+    """
+
+    _path_resolved = False
+
+    def _open(self):
+        if not self._path_resolved:
+            self.baseFilename = os.path.abspath(log_file_path())
+            self._path_resolved = True
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        prune_old_logs(os.path.dirname(self.baseFilename))
+        return super()._open()
+
+
+class LazyFileHandler(LazyFileOpenMixin, logging.FileHandler):
+    def __init__(self, file_path):
+        super().__init__(file_path, delay=True)
+
+
+class LazyRotatingFileHandler(LazyFileOpenMixin, logging.handlers.RotatingFileHandler):
+    def __init__(self, file_path):
+        super().__init__(file_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, delay=True)
+
+
+class LazyTimedRotatingFileHandler(LazyFileOpenMixin, logging.handlers.TimedRotatingFileHandler):
+    def __init__(self, file_path):
+        super().__init__(file_path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, delay=True)
+
+
+def prune_old_logs(log_dir, keep=None):
+    """
+    Delete the oldest execution_*.log files (and their rotated parts) so at
+    most keep files remain (LOG_KEEP_FILES by default, None keeps all)
+    """
+    keep = LOG_KEEP_FILES if keep is None else keep
+    if keep is None:
+        return
+    try:
+        names = [n for n in os.listdir(log_dir) if n.startswith("execution_") and ".log" in n]
+    except OSError:
+        return
+    # The timestamp in the name sorts oldest first
+    for name in sorted(names)[:max(0, len(names) - keep)]:
+        try:
+            os.remove(os.path.join(log_dir, name))
+        except OSError:
+            pass
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, thread, module, line and message
+    (with the traceback, if any)
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "thread": record.threadName,
+            "module": record.module,
+            "line": record.lineno,
+            "message": record.getMessage()
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DebugRateLimiter(logging.Filter):
+    """
+    Lets at most per_second DEBUG records through per call site (file and
+    line) each second. Dropped records are counted; the next record let
+    through from that line carries the count. Other levels always pass.
+    """
+
+    def __init__(self, per_second=LOG_DEBUG_PER_SECOND):
+        super().__init__()
+        self.per_second = per_second
+        self.dropped = 0
+        self._lock = threading.Lock()
+        # (pathname, lineno) -> [window start second, records in window, dropped since last pass]
+        self._sites = {}
+
+    def filter(self, record):
+        if record.levelno != logging.DEBUG or not self.per_second:
+            return True
+        second = int(record.created)
+        with self._lock:
+            site = self._sites.setdefault((record.pathname, record.lineno), [second, 0, 0])
+            if site[0] != second:
+                site[0], site[1] = second, 0
+            if site[1] >= self.per_second:
+                site[2] += 1
+                self.dropped += 1
+                return False
+            site[1] += 1
+            dropped, site[2] = site[2], 0
+        if dropped:
+            record.msg = f"{record.getMessage()} ({dropped} similar debug record(s) dropped)"
+            record.args = None
+        return True
+
+
+class TracebackQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps the traceback apart from the message: the
+    standard prepare() folds it into msg, so the JSON lines formatter could
+    never put it in its own field. The traceback is rendered here (the
+    frames may be gone by the time the listener writes the record) and
+    passed on as exc_text, which every formatter appends or uses itself.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def build_file_handler():
+    """
+    The run's log file handler, with the configured rotation and format
+    """
+    if LOG_ROTATION == "size":
+        handler = LazyRotatingFileHandler(log_file_path())
+    elif LOG_ROTATION == "time":
+        handler = LazyTimedRotatingFileHandler(log_file_path())
+    else:
+        handler = LazyFileHandler(log_file_path())
+    handler.setLevel(logging.DEBUG)
+    if LOG_FILE_FORMAT == "jsonl":
+        handler.setFormatter(JsonLinesFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(threadName)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        ))
+    return handler
+
+
 def setup_logging():
     """
-    Configure logging to save to both console and file
+    Configure logging to save to both console and file.
+    Records are put on a queue and written by a QueueListener thread, so
+    workers never wait for the disk or the console; DEBUG records are rate
+    limited per call site before they are queued. The listener is stopped
+    (and the queue drained) at exit.
+    Returns (logger, debug_rate_limiter).
     """
-    # Create logs directory if it doesn't exist
-    os.makedirs(LOG_DIR, exist_ok=True)
-    
     # Create logger
     logger = logging.getLogger("NumeroRadicacion")
     logger.setLevel(logging.DEBUG)
-    
+
     # Clear any existing handlers
     logger.handlers = []
-    
-    # Create formatters
-    detailed_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # File handler
-    file_handler = logging.FileHandler(LOG_FILE_PATH)
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(detailed_formatter)
-    logger.addHandler(file_handler)
-    
+
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
-    console_formatter = logging.Formatter('%(levelname)s - %(message)s')
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
-    
-    return logger
+    console_handler.setFormatter(logging.Formatter('%(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = TracebackQueueHandler(log_queue)
+    debug_rate_limiter = DebugRateLimiter()
+    queue_handler.addFilter(debug_rate_limiter)
+    logger.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, build_file_handler(), console_handler,
+                                              respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    return logger, debug_rate_limiter
 
 # Initialize logger globally
-logger = setup_logging()
+logger, debug_rate_limiter = setup_logging()
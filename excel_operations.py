@@ -2,167 +2,394 @@
 Excel file operations: reading and writing data
 """
 
-from openpyxl import load_workbook
-from config import EXCEL_FILE_PATH, logger
+import csv
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from config import EXCEL_FILE_PATH, WRITE_FLUSH_ROWS, WRITE_FLUSH_SECONDS, logger
 
+# openpyxl is imported where a workbook is opened: it is a slow import that
+# runs reading CSV/JSONL input into other sinks never need
 
-def read_numbers_from_excel():
+
+# ============================================================================
+# ROW INDEX - Radicacion number -> Excel rows
+# ============================================================================
+
+# Characters people type inside or after a radicacion number ("18001-31-05...", "...0203.")
+NUMBER_SEPARATORS = re.compile(r"[\s.\-_/]")
+
+
+def normalize_number(value):
     """
-    Read all numbers from column D of the Excel file (excluding header)
+    Normalize a radicacion number from a cell or the search list so both
+    sides compare equal: a number written with spaces, dots, dashes or
+    slashes becomes its plain digits. Returns an empty string for empty cells.
     """
-    try:
-        logger.info(f"Reading numbers from Excel file: {EXCEL_FILE_PATH}")
+    if value is None:
+        return ""
+    # Numbers typed without quotes come back as int/float from openpyxl
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    digits = NUMBER_SEPARATORS.sub("", text)
+    return digits if digits.isdigit() else text
 
-        # Load the workbook
-        workbook = load_workbook(EXCEL_FILE_PATH)
-        worksheet = workbook.active
 
+def build_row_index(worksheet):
+    """
+    Scan column D once and map each normalized number to the list of rows
+    (in sheet order) where it appears, so duplicates are all kept.
+    """
+    row_index = {}
+    for excel_row, row in enumerate(worksheet.iter_rows(min_row=2, min_col=4, max_col=4, values_only=True),
+                                    start=2):
+        number = normalize_number(row[0])
+        if number:
+            row_index.setdefault(number, []).append(excel_row)
+    return row_index
+
+
+# ============================================================================
+# INPUT SOURCES - Stream numbers from xlsx, CSV or JSONL
+# ============================================================================
+
+# Column names recognised as the radicacion number in CSV headers and JSONL objects
+NUMBER_FIELD_NAMES = ("radicado", "radicacion", "numero", "number")
+# Optional column (header or JSONL key) with a lookup priority; higher goes first
+PRIORITY_FIELD_NAMES = ("prioridad", "priority")
+
+
+def _iter_xlsx_numbers(file_path):
+    from openpyxl import load_workbook
+
+    # read_only mode streams rows from the file instead of loading the whole workbook
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        worksheet = workbook.active
         # Read all numbers from column D (4th column), skipping the header (first row)
-        numbers = []
         for row_index, row in enumerate(worksheet.iter_rows(min_row=2, min_col=4, max_col=4, values_only=True),
                                         start=2):
-            if row[0] is not None:
-                number = str(row[0]).strip()
-                if number:
-                    numbers.append(number)
-                    logger.debug(f"Row {row_index}: {number}")
-
-        if not numbers:
-            logger.warning(f"No numbers found in Excel file")
-            return []
-
-        logger.info(f"Successfully read {len(numbers)} number(s) from Excel")
-        return numbers
-
-    except FileNotFoundError:
-        logger.error(f"Excel file not found: {EXCEL_FILE_PATH}")
-        return []
-    except Exception as e:
-        logger.error(f"Error reading Excel file: {str(e)}", exc_info=True)
-        return []
+            number = normalize_number(row[0]) if row else ""
+            if number:
+                logger.debug(f"Row {row_index}: {number}")
+                yield number
+    finally:
+        workbook.close()
 
 
-def write_data_to_excel(search_number, row_data):
+def _iter_csv_numbers(file_path):
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        names = [h.strip().lower() for h in header]
+        column = next((names.index(n) for n in NUMBER_FIELD_NAMES if n in names), None)
+        if column is None:
+            # No recognised header: same layout as the workbook (column D) or a single column list
+            column = 3 if len(header) >= 4 else 0
+            first = normalize_number(header[column])
+            if first:
+                yield first
+        for row in reader:
+            number = normalize_number(row[column]) if len(row) > column else ""
+            if number:
+                yield number
+
+
+def _iter_jsonl_numbers(file_path):
+    with open(file_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            value = json.loads(line)
+            if isinstance(value, dict):
+                value = next((value[k] for k in value if k.lower() in NUMBER_FIELD_NAMES), None)
+            number = normalize_number(value)
+            if number:
+                yield number
+
+
+def snapshot_input(file_path):
     """
-    Write the provided row_data (list of up to 6 values) into columns E-J (5-10)
-    for the Excel row whose column D equals search_number.
-    Returns True on success, False otherwise.
+    Copy an input file to a temporary file and return its path. Used when
+    the input is the workbook the Excel sink saves during the run: the
+    streaming reader would otherwise read a file that is being rewritten.
+    The caller deletes the copy.
     """
+    fd, snapshot_path = tempfile.mkstemp(prefix="nr_input_", suffix=os.path.splitext(file_path)[1])
+    os.close(fd)
+    shutil.copyfile(file_path, snapshot_path)
+    logger.info(f"Reading the numbers from a snapshot of {file_path} (it is also the output)")
+    return snapshot_path
+
+
+def iter_numbers(file_path=None):
+    """
+    Lazily yield the numbers to look up from an .xlsx (column D, streamed
+    in read-only mode), .csv or .jsonl file, without holding the whole
+    input in memory
+    """
+    file_path = file_path or EXCEL_FILE_PATH
+    extension = os.path.splitext(file_path)[1].lower()
+    logger.info(f"Reading numbers from: {file_path}")
+    if extension == ".csv":
+        return _iter_csv_numbers(file_path)
+    if extension in (".jsonl", ".ndjson"):
+        return _iter_jsonl_numbers(file_path)
+    return _iter_xlsx_numbers(file_path)
+
+
+def _parse_priority(value):
     try:
-        workbook = load_workbook(EXCEL_FILE_PATH)
-        worksheet = workbook.active
+        return float(str(value).strip().replace(",", "."))
+    except (TypeError, ValueError):
+        return None
 
-        target_row = None
-        for row_index, row in enumerate(worksheet.iter_rows(min_row=2, min_col=4, max_col=4), start=2):
-            cell_val = row[0].value
-            if cell_val is not None and str(cell_val).strip() == str(search_number).strip():
-                target_row = row_index
-                break
 
-        if target_row is None:
-            logger.error(f"Number {search_number} not found in Excel file")
-            return False
+def _iter_xlsx_priorities(file_path):
+    from openpyxl import load_workbook
 
-        # Ensure exactly 6 columns E-J
-        values = row_data[:6]
-        while len(values) < 6:
-            values.append("")
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(h or "").strip().lower() for h in next(rows, ())]
+        column = next((header.index(n) for n in PRIORITY_FIELD_NAMES if n in header), None)
+        if column is None:
+            return
+        for row in rows:
+            if len(row) > column and len(row) >= 4:
+                yield normalize_number(row[3]), row[column]
+    finally:
+        workbook.close()
 
-        for i, val in enumerate(values):
-            col = 5 + i  # Start from column E (5)
-            cell = worksheet.cell(row=target_row, column=col)
-            cell.value = val if val is not None else ""
-            # Set cell to text format to avoid auto-formatting
-            cell.number_format = '@'
-            logger.debug(f"  Row {target_row}, Col {col}: {cell.value}")
 
-        workbook.save(EXCEL_FILE_PATH)
-        logger.info(f"Successfully wrote data to Excel for: {search_number}")
-        return True
-    except FileNotFoundError:
-        logger.error(f"Excel file not found: {EXCEL_FILE_PATH}")
-        return False
-    except Exception as e:
-        logger.error(f"Error writing to Excel: {str(e)}", exc_info=True)
-        return False
+def _iter_csv_priorities(file_path):
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        names = [h.strip().lower() for h in next(reader, [])]
+        number_column = next((names.index(n) for n in NUMBER_FIELD_NAMES if n in names), None)
+        column = next((names.index(n) for n in PRIORITY_FIELD_NAMES if n in names), None)
+        if number_column is None or column is None:
+            return
+        for row in reader:
+            if len(row) > max(number_column, column):
+                yield normalize_number(row[number_column]), row[column]
+
 
+def _iter_jsonl_priorities(file_path):
+    with open(file_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            value = json.loads(line)
+            if not isinstance(value, dict):
+                continue
+            number = next((value[k] for k in value if k.lower() in NUMBER_FIELD_NAMES), None)
+            priority = next((value[k] for k in value if k.lower() in PRIORITY_FIELD_NAMES), None)
+            yield normalize_number(number), priority
 
-def write_despacho_to_excel(search_number, despacho_value):
+
+def read_priorities(file_path=None):
     """
-    Write the despacho value into column C (3)
-    for the Excel row whose column D equals search_number.
-    Returns True on success, False otherwise.
+    Map each number to its value in the optional priority column of the
+    input (highest one when the number is on several rows). Returns an
+    empty dict when the input has no priority column.
     """
+    file_path = file_path or EXCEL_FILE_PATH
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".csv":
+        pairs = _iter_csv_priorities(file_path)
+    elif extension in (".jsonl", ".ndjson"):
+        pairs = _iter_jsonl_priorities(file_path)
+    else:
+        pairs = _iter_xlsx_priorities(file_path)
+
+    priorities = {}
     try:
-        workbook = load_workbook(EXCEL_FILE_PATH)
-        worksheet = workbook.active
+        for number, value in pairs:
+            priority = _parse_priority(value)
+            if number and priority is not None:
+                priorities[number] = max(priority, priorities.get(number, priority))
+    except Exception as e:
+        logger.error(f"Error reading priorities from {file_path}: {str(e)}", exc_info=True)
+    return priorities
 
-        target_row = None
-        for row_index, row in enumerate(worksheet.iter_rows(min_row=2, min_col=4, max_col=4), start=2):
-            cell_val = row[0].value
-            if cell_val is not None and str(cell_val).strip() == str(search_number).strip():
-                target_row = row_index
-                break
 
-        if target_row is None:
-            logger.error(f"Number {search_number} not found in Excel file")
-            return False
+def iter_unique_numbers(numbers, row_counts=None):
+    """
+    Yield each normalized number once, in the order it first appears.
+    row_counts (a dict, optional) receives how many input rows hold each
+    number; the writers fan a result out to all of them.
+    """
+    row_counts = {} if row_counts is None else row_counts
+    for number in numbers:
+        count = row_counts.get(number, 0)
+        row_counts[number] = count + 1
+        if count:
+            logger.debug(f"Repeated number {number} (row {count + 1} holding it), already queued")
+            continue
+        yield number
 
-        # Write despacho value to column C (3)
-        cell = worksheet.cell(row=target_row, column=3)
-        cell.value = despacho_value if despacho_value else ""
-        # Set cell to text format to avoid auto-formatting
-        cell.number_format = '@'
-        logger.debug(f"  Row {target_row}, Col 3 (Despacho): {cell.value}")
 
-        workbook.save(EXCEL_FILE_PATH)
-        logger.info(f"Successfully wrote Despacho to Excel for: {search_number}")
-        return True
-    except FileNotFoundError:
-        logger.error(f"Excel file not found: {EXCEL_FILE_PATH}")
-        return False
-    except Exception as e:
-        logger.error(f"Error writing Despacho to Excel: {str(e)}", exc_info=True)
-        return False
+# ============================================================================
+# RESULT WRITER - One open workbook with batched, coalesced writes
+# ============================================================================
 
+# Columns for each result field (A-J)
+DEMANDANTE_COLUMN = 1
+DEMANDADO_COLUMN = 2
+DESPACHO_COLUMN = 3
+ACTUACIONES_FIRST_COLUMN = 5
 
-def write_sujetos_to_excel(search_number, demandante, demandado):
+
+class ExcelResultWriter:
     """
-    Write Demandante (column A) and Demandado (column B)
-    for the Excel row whose column D equals search_number.
-    Returns True on success, False otherwise.
+    Keep the workbook open for the whole run and buffer per-row updates for
+    columns A-J. Pending updates are saved every flush_rows rows or
+    flush_seconds seconds, and once more on close(). Several writes to the
+    same row are merged into a single update. All methods are thread-safe.
     """
-    try:
-        workbook = load_workbook(EXCEL_FILE_PATH)
-        worksheet = workbook.active
 
-        target_row = None
-        for row_index, row in enumerate(worksheet.iter_rows(min_row=2, min_col=4, max_col=4), start=2):
-            cell_val = row[0].value
-            if cell_val is not None and str(cell_val).strip() == str(search_number).strip():
-                target_row = row_index
-                break
+    def __init__(self, file_path=None, flush_rows=WRITE_FLUSH_ROWS, flush_seconds=WRITE_FLUSH_SECONDS):
+        from openpyxl import load_workbook
+
+        self.file_path = file_path or EXCEL_FILE_PATH
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.workbook = load_workbook(self.file_path)
+        self.worksheet = self.workbook.active
+        # Built once: normalized number -> rows, so lookups never rescan column D
+        self.row_index = build_row_index(self.worksheet)
+        # row -> {column: value}
+        self.pending = {}
+        self.last_flush = time.time()
+        self._lock = threading.RLock()
+        logger.info(f"Opened Excel file for writing: {self.file_path}")
 
-        if target_row is None:
+    def find_rows(self, search_number):
+        """
+        Return every Excel row whose column D equals search_number (empty list if none)
+        """
+        return self.row_index.get(normalize_number(search_number), [])
+
+    def update(self, search_number, column_values):
+        """
+        Queue {column: value} updates for every row of search_number.
+        Returns True if at least one row was found, False otherwise.
+        """
+        target_rows = self.find_rows(search_number)
+        if not target_rows:
             logger.error(f"Number {search_number} not found in Excel file")
             return False
 
-        # Column A (1) -> Demandante, Column B (2) -> Demandado
-        cell_a = worksheet.cell(row=target_row, column=1)
-        cell_b = worksheet.cell(row=target_row, column=2)
-        cell_a.value = demandante if demandante else ""
-        cell_b.value = demandado if demandado else ""
-        cell_a.number_format = '@'
-        cell_b.number_format = '@'
-        logger.debug(f"  Row {target_row}, Col 1 (Demandante): {cell_a.value}")
-        logger.debug(f"  Row {target_row}, Col 2 (Demandado): {cell_b.value}")
-
-        workbook.save(EXCEL_FILE_PATH)
-        logger.info(f"Successfully wrote Demandante/Demandado to Excel for: {search_number}")
+        with self._lock:
+            for target_row in target_rows:
+                self.pending.setdefault(target_row, {}).update(column_values)
+            self.maybe_flush()
         return True
-    except FileNotFoundError:
-        logger.error(f"Excel file not found: {EXCEL_FILE_PATH}")
-        return False
-    except Exception as e:
-        logger.error(f"Error writing Demandante/Demandado to Excel: {str(e)}", exc_info=True)
-        return False
+
+    def read_actuaciones(self, search_number):
+        """
+        Return the Actuaciones values (columns E-J) currently stored for
+        search_number, including updates not saved yet. None if the number
+        is not in the file or the columns are empty.
+        """
+        target_rows = self.find_rows(search_number)
+        if not target_rows:
+            return None
+        target_row = target_rows[0]
+        values = []
+        with self._lock:
+            pending = self.pending.get(target_row, {})
+            for col in range(ACTUACIONES_FIRST_COLUMN, ACTUACIONES_FIRST_COLUMN + 6):
+                if col in pending:
+                    values.append(pending[col])
+                else:
+                    values.append(self.worksheet.cell(row=target_row, column=col).value)
+        if all(v is None or str(v).strip() == "" for v in values):
+            return None
+        return values
+
+    def write_despacho(self, search_number, despacho_value):
+        """
+        Queue the despacho value for column C (3)
+        """
+        return self.update(search_number, {DESPACHO_COLUMN: despacho_value})
+
+    def write_data(self, search_number, row_data):
+        """
+        Queue the Actuaciones row (up to 6 values) for columns E-J (5-10)
+        """
+        # Ensure exactly 6 columns E-J
+        values = list(row_data[:6])
+        while len(values) < 6:
+            values.append("")
+        return self.update(search_number, {ACTUACIONES_FIRST_COLUMN + i: val for i, val in enumerate(values)})
+
+    def write_sujetos(self, search_number, demandante, demandado):
+        """
+        Queue Demandante (column A) and Demandado (column B)
+        """
+        return self.update(search_number, {DEMANDANTE_COLUMN: demandante, DEMANDADO_COLUMN: demandado})
+
+    def maybe_flush(self):
+        """
+        Flush if enough rows are pending or enough time has passed
+        """
+        if len(self.pending) >= self.flush_rows or time.time() - self.last_flush >= self.flush_seconds:
+            return self.flush()
+        return True
+
+    def flush(self):
+        """
+        Apply all pending updates to the worksheet and save the workbook once.
+        Pending updates are kept if the save fails, so they are retried on the next flush.
+        Returns True on success, False otherwise.
+        """
+        with self._lock:
+            return self._flush()
+
+    def _flush(self):
+        self.last_flush = time.time()
+        if not self.pending:
+            return True
+
+        try:
+            for target_row, column_values in self.pending.items():
+                for col, val in sorted(column_values.items()):
+                    cell = self.worksheet.cell(row=target_row, column=col)
+                    cell.value = val if val is not None else ""
+                    # Set cell to text format to avoid auto-formatting
+                    cell.number_format = '@'
+                    logger.debug(f"  Row {target_row}, Col {col}: {cell.value}")
+
+            # Save next to the file and swap it in, so the workbook on disk is
+            # always complete (a crash or a reader never sees a half-written file)
+            base, extension = os.path.splitext(self.file_path)
+            saving_path = f"{base}.saving{extension}"
+            try:
+                self.workbook.save(saving_path)
+                os.replace(saving_path, self.file_path)
+            finally:
+                if os.path.exists(saving_path):
+                    os.remove(saving_path)
+            logger.info(f"Saved {len(self.pending)} row(s) to Excel")
+            self.pending = {}
+            return True
+        except Exception as e:
+            logger.error(f"Error saving Excel file: {str(e)}", exc_info=True)
+            return False
+
+    def close(self):
+        """
+        Flush any remaining updates
+        """
+        return self.flush()
@@ -0,0 +1,97 @@
+"""
+Failure classification and stage-level retries with jittered backoff
+"""
+
+import random
+import time
+from config import (
+    logger,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_MAX_DELAY_SECONDS,
+    RETRYABLE_FAILURES
+)
+
+# Failure kinds
+TIMEOUT = "timeout"
+SITE_ERROR = "site_error"
+NOT_FOUND = "not_found"
+PARSE_FAILURE = "parse_failure"
+
+
+class StageFailure(Exception):
+    """
+    Raised when a lookup stage still fails after its retries (or fails in a
+    way that retrying cannot fix). kind is one of the failure kinds above.
+    """
+
+    def __init__(self, kind, stage, message=""):
+        super().__init__(f"{stage} failed ({kind})" + (f": {message}" if message else ""))
+        self.kind = kind
+        self.stage = stage
+        self.message = message
+
+
+def classify_exception(error):
+    """
+    Map an exception to a failure kind
+    """
+    if isinstance(error, StageFailure):
+        return error.kind
+    status = getattr(error, "status", None)
+    if status == 404:
+        return NOT_FOUND
+    if status is not None and status >= 400:
+        return SITE_ERROR
+    if isinstance(error, TimeoutError) or any("Timeout" in cls.__name__ for cls in type(error).__mro__):
+        return TIMEOUT
+    if isinstance(error, (ValueError, KeyError, IndexError, TypeError)):
+        return PARSE_FAILURE
+    # Connection errors, crashed browser, unexpected page state
+    return SITE_ERROR
+
+
+def is_failure_value(value):
+    """
+    The values the scraping functions return when a step did not work
+    """
+    return value is False or value is None or value == "" or value == []
+
+
+def backoff_delay(retry, base=RETRY_BASE_DELAY_SECONDS, cap=RETRY_MAX_DELAY_SECONDS):
+    """
+    Exponential backoff with jitter: half of the delay is fixed, the other
+    half random, so workers that failed together do not retry together
+    """
+    delay = min(cap, base * 2 ** retry)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def run_stage(stage, func, *args, failure_kind=TIMEOUT, check_result=True, attempts=RETRY_ATTEMPTS):
+    """
+    Run one lookup stage, retrying only this stage on failure.
+    A stage fails when func raises, or (check_result) returns a failure value
+    (False, None, "" or []); failure_kind is the kind of such a result, or a
+    function of the result returning it. Retryable failures are retried up to
+    attempts times in total with jittered backoff; anything else, or the last
+    failure, raises StageFailure. Returns func's result.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            value = func(*args)
+            if not (check_result and is_failure_value(value)):
+                return value
+            kind = failure_kind(value) if callable(failure_kind) else failure_kind
+            message = f"returned {value!r}"
+        except StageFailure:
+            raise
+        except Exception as e:
+            kind = classify_exception(e)
+            message = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+
+        if kind not in RETRYABLE_FAILURES or attempt == attempts:
+            raise StageFailure(kind, stage, message)
+
+        delay = backoff_delay(attempt - 1)
+        logger.warning(f"Stage {stage} failed ({kind}: {message}), retry {attempt}/{attempts - 1} in {delay:.1f}s")
+        time.sleep(delay)
@@ -0,0 +1,46 @@
+"""
+Incremental runs: detect whether a process has a new actuacion since the last run
+"""
+
+import hashlib
+from datetime import date, datetime
+
+
+def normalize_cell(value):
+    """
+    Normalize one Actuaciones value (from Excel, the cache or a fresh lookup)
+    so the same actuacion always compares equal
+    """
+    if value is None:
+        return ""
+    # Dates typed into Excel come back as datetime objects
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    return " ".join(str(value).split())
+
+
+def actuacion_fingerprint(row_values):
+    """
+    Fingerprint of an Actuaciones row (columns E-J). Returns None for an
+    empty row, which never matches anything.
+    """
+    values = [normalize_cell(v) for v in list(row_values or [])[:6]]
+    values += [""] * (6 - len(values))
+    if not any(values):
+        return None
+    return hashlib.sha1("\x1f".join(values).encode("utf-8")).hexdigest()
+
+
+def is_unchanged(latest_row, known_row):
+    """
+    True if the latest actuacion read from the site is the one already stored
+    """
+    latest = actuacion_fingerprint(latest_row)
+    return latest is not None and latest == actuacion_fingerprint(known_row)
+
+
+def unchanged_result(latest_row):
+    """
+    Result returned when the cheap check finds no new actuacion
+    """
+    return {"changed": False, "actuaciones": list(latest_row)}
@@ -0,0 +1,301 @@
+"""
+Shared job queue for multi-node runs: one SQLite file that every node
+claims numbers from (with expiring leases) and stores its results in,
+merged back into the A-J layout once the queue is drained
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from config import (
+    logger,
+    QUEUE_FILE_PATH,
+    NODE_ID,
+    QUEUE_LEASE_SECONDS,
+    QUEUE_HEARTBEAT_SECONDS,
+    QUEUE_CLAIM_BATCH,
+    QUEUE_MAX_ATTEMPTS,
+    QUEUE_POLL_SECONDS
+)
+from excel_operations import normalize_number
+
+# Characters of a node name not used in its per-node file names
+NODE_NAME_UNSAFE = re.compile(r"[^\w.-]")
+
+# Job statuses
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Numbers of one job and their state, shared by every node through one
+    SQLite file. A node leases numbers, renews its leases with a heartbeat
+    thread and stores each result (or failure) in the queue; leases of a
+    node that stopped renewing them expire and the numbers are claimed by
+    the others. The first result stored for a number wins. Thread-safe
+    within a node; nodes are serialized by SQLite's file lock.
+    """
+
+    def __init__(self, file_path=QUEUE_FILE_PATH, node=NODE_ID):
+        self.file_path = file_path
+        self.node = node
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        self._stop = threading.Event()
+        # Autocommit; claims open their own write transaction
+        self._conn = sqlite3.connect(file_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                number TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                node TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                failure TEXT,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, position)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS nodes (node TEXT PRIMARY KEY, heartbeat_at REAL NOT NULL)")
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Write transaction taken up front (BEGIN IMMEDIATE), so two nodes can
+        never claim the same number
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # ------------------------------------------------------------------
+    # Coordinator
+    # ------------------------------------------------------------------
+
+    def seed(self, numbers):
+        """
+        Add numbers to the queue in input order. Numbers already queued keep
+        their state, so seeding again only adds the new ones. Returns the
+        number of numbers added.
+        """
+        added = 0
+        now = time.time()
+        with self._transaction() as conn:
+            position = conn.execute("SELECT COALESCE(MAX(position), 0) FROM jobs").fetchone()[0]
+            for number in numbers:
+                position += 1
+                added += conn.execute(
+                    "INSERT OR IGNORE INTO jobs (number, position, status, updated_at) VALUES (?, ?, ?, ?)",
+                    (normalize_number(number), position, PENDING, now)
+                ).rowcount
+        return added
+
+    def counts(self):
+        """
+        {status: number of jobs}
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def live_nodes(self):
+        """
+        Nodes that sent a heartbeat within the last lease period
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT node FROM nodes WHERE heartbeat_at > ? ORDER BY node",
+                                      (time.time() - QUEUE_LEASE_SECONDS,)).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_results(self):
+        """
+        Yield (number, result) of every finished number in input order
+        (result is None when nothing needed to be written)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT number, result FROM jobs WHERE status = ? ORDER BY position", (DONE,)
+            ).fetchall()
+        for number, result in rows:
+            yield number, json.loads(result) if result else None
+
+    def iter_failures(self):
+        """
+        Yield (number, failure dict) of every failed number in input order
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT number, failure FROM jobs WHERE status = ? ORDER BY position", (FAILED,)
+            ).fetchall()
+        for number, failure in rows:
+            yield number, json.loads(failure) if failure else {}
+
+    # ------------------------------------------------------------------
+    # Node
+    # ------------------------------------------------------------------
+
+    def claim(self, limit=QUEUE_CLAIM_BATCH):
+        """
+        Lease up to limit numbers for this node: pending ones first in input
+        order, then those whose lease expired. A number whose lease already
+        expired QUEUE_MAX_ATTEMPTS times is marked failed instead.
+        """
+        now = time.time()
+        claimed = []
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT number, status, node, attempts FROM jobs "
+                "WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                "ORDER BY status = ?, position LIMIT ?",
+                (PENDING, LEASED, now, LEASED, limit)
+            ).fetchall()
+            for number, status, node, attempts in rows:
+                if status == LEASED:
+                    if attempts >= QUEUE_MAX_ATTEMPTS:
+                        failure = {"kind": "lease_expired", "stage": "queue",
+                                   "error": f"lease expired {attempts} time(s), last on node {node}"}
+                        conn.execute("UPDATE jobs SET status = ?, failure = ?, node = NULL, lease_expires = NULL, "
+                                     "updated_at = ? WHERE number = ?", (FAILED, json.dumps(failure), now, number))
+                        logger.warning(f"Queue: {number} failed, {failure['error']}")
+                        continue
+                    logger.warning(f"Queue: reassigning {number} (lease of node {node} expired)")
+                conn.execute(
+                    "UPDATE jobs SET status = ?, node = ?, lease_expires = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE number = ?",
+                    (LEASED, self.node, now + QUEUE_LEASE_SECONDS, now, number)
+                )
+                claimed.append(number)
+        return claimed
+
+    def has_work_elsewhere(self):
+        """
+        True while numbers are pending or leased by another node (whose
+        leases may still expire and come back to this one)
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM jobs WHERE status = ? OR (status = ? AND node != ?) LIMIT 1",
+                (PENDING, LEASED, self.node)
+            ).fetchone() is not None
+
+    def iter_claimed_numbers(self):
+        """
+        Yield numbers leased by this node until the queue is drained. While
+        other nodes still hold leases, poll every QUEUE_POLL_SECONDS so their
+        numbers are picked up if they die.
+        """
+        while True:
+            numbers = self.claim()
+            if numbers:
+                yield from numbers
+                continue
+            if not self.has_work_elsewhere():
+                return
+            time.sleep(QUEUE_POLL_SECONDS)
+
+    def heartbeat(self):
+        """
+        Renew the leases of this node and record that it is alive
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET lease_expires = ? WHERE status = ? AND node = ?",
+                               (now + QUEUE_LEASE_SECONDS, LEASED, self.node))
+            self._conn.execute("INSERT OR REPLACE INTO nodes VALUES (?, ?)", (self.node, now))
+
+    def start_heartbeat(self):
+        """
+        Renew this node's leases every QUEUE_HEARTBEAT_SECONDS on a
+        background thread until close()
+        """
+        def beat():
+            while not self._stop.wait(QUEUE_HEARTBEAT_SECONDS):
+                try:
+                    self.heartbeat()
+                except sqlite3.Error as e:
+                    logger.warning(f"Queue heartbeat failed: {str(e)}")
+
+        self.heartbeat()
+        self._heartbeat = threading.Thread(target=beat, name="queue-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def complete(self, search_number, result):
+        """
+        Store the result of a number. Ignored if another node already
+        finished it (its lease had expired here).
+        """
+        with self._lock:
+            stored = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, failure = NULL, node = ?, lease_expires = NULL, "
+                "updated_at = ? WHERE number = ? AND status != ?",
+                (DONE, json.dumps(result, ensure_ascii=False) if result else None, self.node, time.time(),
+                 normalize_number(search_number), DONE)
+            ).rowcount
+        if not stored:
+            logger.info(f"Queue: {search_number} was already finished by another node")
+
+    def fail(self, search_number, failure):
+        """
+        Record a number that still failed after its retries
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, failure = ?, node = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE number = ? AND status != ?",
+                (FAILED, json.dumps(failure, ensure_ascii=False), self.node, time.time(),
+                 normalize_number(search_number), DONE)
+            )
+
+    def release(self):
+        """
+        Give back the numbers this node still holds (interrupted run), so
+        other nodes take them without waiting for the lease to expire
+        """
+        with self._lock:
+            released = self._conn.execute(
+                "UPDATE jobs SET status = ?, node = NULL, lease_expires = NULL, attempts = attempts - 1, "
+                "updated_at = ? WHERE status = ? AND node = ?",
+                (PENDING, time.time(), LEASED, self.node)
+            ).rowcount
+        if released:
+            logger.info(f"Queue: released {released} unfinished number(s) of node {self.node}")
+        return released
+
+    def close(self):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        with self._lock:
+            self._conn.close()
+
+
+def format_counts(counts):
+    """
+    One-line summary of the job statuses
+    """
+    return ", ".join(f"{counts.get(status, 0)} {status}" for status in (PENDING, LEASED, DONE, FAILED))
+
+
+def node_file_path(file_path, node):
+    """
+    Per-node variant of a run file (journal, dead-letter file), so nodes
+    sharing a directory never write to the same one
+    """
+    base, extension = os.path.splitext(file_path)
+    return f"{base}.{NODE_NAME_UNSAFE.sub('_', node)}{extension}"
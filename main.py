@@ -4,131 +4,473 @@ Refactored with modular architecture for better maintainability
 """
 
 import time
-from config import logger, LOG_FILE_PATH
-from excel_operations import (
-    read_numbers_from_excel,
-    write_data_to_excel,
-    write_despacho_to_excel,
-    write_sujetos_to_excel
-)
-from web_driver import access_url
-from web_scraper import (
-    select_second_radio_button,
-    enter_search_number,
-    click_consultar_button,
-    click_volver_button,
-    click_first_clickable_table_number,
-    click_actuaciones_tab,
-    print_actuaciones_first_row,
-    extract_despacho_value,
-    click_subjetos_procesales_tab,
-    extract_subjetos_procesales
+
+# Taken before the other imports so the startup time includes them
+STARTED_AT = time.perf_counter()
+
+import argparse
+import os
+from config import (
+    logger, debug_rate_limiter, log_file_path, INPUT_FILE_PATH, WORKER_COUNT, CACHE_ENABLED, INCREMENTAL_MODE, RESULT_SINKS,
+    TRACE_ENABLED, TRACE_FILE_PATH, JOURNAL_FILE_PATH, DEAD_LETTER_FILE_PATH, ACTUACIONES_HISTORY, NODE_ID,
+    SCHEDULE_BY_VALUE
 )
+from excel_operations import iter_numbers, iter_unique_numbers, read_priorities, snapshot_input
+from result_sinks import SINK_TYPES, sink_paths, open_sinks, export_to_xlsx
+from result_cache import ResultCache, has_values
+from checkpoint_journal import RunJournal, DeadLetterFile, COMPLETED, FAILED, SKIPPED
+from worker_pool import run_worker_pool
+from actuaciones_history import HistoryStore, export_history_to_xlsx
+from job_queue import JobQueue, format_counts, node_file_path, PENDING, LEASED
+from scheduler import FetchStats, TimeBudget, order_by_value
+from stage_timing import tracer, FAILED as SPAN_FAILED
+from failures import SITE_ERROR
 
 
 # ============================================================================
 # MAIN EXECUTION
 # ============================================================================
 
-def main():
+def write_result(sinks, number, result):
+    """
+    Hand one scraped result to every result sink.
+    Only called from the collector, so writes never overlap.
+    """
+    for sink in sinks:
+        try:
+            with tracer.span(f"write_{sink.name}", number) as span:
+                written = sink.write(number, result)
+                if not written:
+                    span["outcome"] = SPAN_FAILED
+            if not written:
+                logger.error(f"Failed to write {number} to the {sink.name} sink")
+        except Exception as e:
+            logger.error(f"Error writing {number} to the {sink.name} sink: {str(e)}", exc_info=True)
+
+
+def report_changes(writer, changed_numbers, unchanged_count):
+    """
+    Log which numbers (and Excel rows, when writing to Excel) got a new
+    actuacion in an incremental run
+    """
+    logger.info(f"Incremental run: {len(changed_numbers)} changed, {unchanged_count} unchanged")
+    for number in changed_numbers:
+        if writer is None:
+            logger.info(f"  Changed: {number}")
+            continue
+        rows = ", ".join(str(row) for row in writer.find_rows(number))
+        logger.info(f"  Changed: {number} (row {rows})")
+
+
+def report_timings():
+    """
+    Log and print the per-stage p50/p95/max summary and save the trace file
+    """
+    lines = tracer.format_summary()
+    if not lines:
+        return
+    logger.info("Per-stage timings:")
+    for line in lines:
+        logger.info(f"  {line}")
+    print("\n Per-stage timings:")
+    print("\n".join(f"   {line}" for line in lines))
+    if tracer.finish_trace():
+        print(f"\n Timing trace saved to: {TRACE_FILE_PATH}")
+
+
+def report_failures(dead_letter, failure_counts):
+    """
+    Log how many numbers failed, by failure kind, and where to find them
+    """
+    if not dead_letter.count:
+        return
+    kinds = ", ".join(f"{kind} {count}" for kind, count in sorted(failure_counts.items()))
+    logger.warning(f"{dead_letter.count} number(s) failed ({kinds}). "
+                   f"Saved to {dead_letter.file_path}; re-run them with --retry-dead-letter")
+
+
+def seed_queue(queue, input_path, fetch_stats=None):
+    """
+    Coordinator: add the unique numbers of the input to the shared job queue
+    (most valuable first when fetch_stats is given, so nodes claim them first)
+    """
+    row_counts = {}
+    numbers = iter_unique_numbers(iter_numbers(input_path), row_counts)
+    if fetch_stats is not None:
+        numbers = order_by_value(numbers, fetch_stats, read_priorities(input_path))
+    added = queue.seed(numbers)
+    logger.info(f"Queued {added} new number(s) from {input_path} in {queue.file_path} "
+                f"({sum(row_counts.values())} input row(s)); {format_counts(queue.counts())}")
+
+
+def merge_queue(queue, sinks, dead_letter, fetch_stats):
+    """
+    Write every result stored in the job queue to the sinks in input order
+    (the Excel sink fills columns A-J of every row of each number) and the
+    failed numbers to the dead-letter file. The fetch stats of the
+    coordinator are updated, so the next --seed schedules by them.
+    """
+    merged = 0
+    for number, result in queue.iter_results():
+        if result:
+            write_result(sinks, number, result)
+            fetch_stats.record(number, result.get("actuaciones"), result.get("changed"))
+            merged += 1
+    failure_counts = {}
+    for number, failure in queue.iter_failures():
+        kind = failure.get("kind", SITE_ERROR)
+        failure_counts[kind] = failure_counts.get(kind, 0) + 1
+        dead_letter.record(number, kind, failure.get("stage", "lookup"), failure.get("error"))
+
+    counts = queue.counts()
+    logger.info(f"Merged {merged} result(s) from {queue.file_path}; {format_counts(counts)}")
+    if counts.get(PENDING) or counts.get(LEASED):
+        logger.warning(f"The queue is not drained yet (live nodes: {', '.join(queue.live_nodes()) or 'none'}); "
+                       f"merge again once it is")
+    report_failures(dead_letter, failure_counts)
+
+
+def run_queue_command(queue, args):
+    """
+    --seed and --merge: the coordinator side of a multi-node run
+    """
+    if not os.path.exists(args.input):
+        logger.error(f"Input file not found: {args.input}")
+        return
+    fetch_stats = FetchStats()
+    if args.seed:
+        try:
+            seed_queue(queue, args.input, fetch_stats if args.schedule else None)
+        finally:
+            fetch_stats.close()
+        return
+
+    sinks = open_sinks(args.sink, sink_paths(args.sink, args.output))
+    dead_letter = DeadLetterFile()
+    merged = False
+    try:
+        if len(sinks) == len(args.sink):
+            merge_queue(queue, sinks, dead_letter, fetch_stats)
+            merged = True
+    finally:
+        for sink in sinks:
+            sink.close()
+        dead_letter.close(finished=merged)
+        fetch_stats.close()
+    exported = next((sink for sink in sinks if sink.name != "excel"), None)
+    if args.export_xlsx and exported is not None:
+        export_to_xlsx(exported.file_path, args.export_xlsx)
+
+
+def parse_args(argv=None):
+    """
+    Parse command line options
+    """
+    parser = argparse.ArgumentParser(description="Look up radicacion numbers and fill the Excel file")
+    parser.add_argument("--refresh", action="store_true",
+                        help="ignore cached results and look every number up again")
+    parser.add_argument("--invalidate", nargs="+", metavar="NUMBER",
+                        help="remove these numbers from the result cache before running ('all' clears it)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not read or write the result cache")
+    parser.add_argument("--incremental", action="store_true", default=INCREMENTAL_MODE,
+                        help="only re-extract processes whose latest actuacion changed")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run: skip numbers already finished, retry failed ones")
+    parser.add_argument("--input", default=INPUT_FILE_PATH, metavar="PATH",
+                        help="read numbers from this .xlsx (column D), .csv or .jsonl file "
+                             "instead of the Excel file")
+    parser.add_argument("--retry-dead-letter", action="store_true",
+                        help="look up only the numbers that failed in the last run (dead-letter file)")
+    parser.add_argument("--sink", nargs="+", choices=sorted(SINK_TYPES), default=RESULT_SINKS,
+                        help="where to write results (default: %(default)s)")
+    parser.add_argument("--output", metavar="PATH",
+                        help="output file of the csv/sqlite/parquet sink "
+                             "(with several, each gets this name with its own extension)")
+    parser.add_argument("--export-xlsx", metavar="PATH",
+                        help="after the run, export the csv/sqlite/parquet results to this .xlsx (streamed)")
+    parser.add_argument("--history", action="store_true", default=ACTUACIONES_HISTORY,
+                        help="also store every actuacion of each process (read until the first stored one)")
+    parser.add_argument("--export-history", metavar="PATH",
+                        help="after the run, export the stored Actuaciones history to this .xlsx")
+    parser.add_argument("--schedule", action="store_true", default=SCHEDULE_BY_VALUE,
+                        help="look up the most valuable numbers first (priority column, time since the last "
+                             "successful fetch, past change frequency) instead of in input order")
+    parser.add_argument("--max-minutes", type=float, metavar="N",
+                        help="only queue lookups expected to finish within N minutes (implies --schedule); "
+                             "the rest are left for the next run")
+    parser.add_argument("--queue", metavar="PATH",
+                        help="multi-node run: look up the numbers of this shared job queue and store the "
+                             "results in it (see --seed and --merge)")
+    parser.add_argument("--seed", action="store_true",
+                        help="with --queue: add the numbers of --input to the queue and exit")
+    parser.add_argument("--merge", action="store_true",
+                        help="with --queue: write the results stored in the queue to the sinks and exit")
+    parser.add_argument("--node-id", default=NODE_ID, metavar="NAME",
+                        help="name of this node in the job queue (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.max_minutes is not None:
+        args.schedule = True
+    return args
+
+
+def main(argv=None):
     """
     Main execution function
     """
-    logger.info(f"Starting execution - Logs saved to: {LOG_FILE_PATH}")
-    
-    # Read all numbers from Excel file
-    search_numbers = read_numbers_from_excel()
+    args = parse_args(argv)
+    logger.info(f"Starting execution - Logs saved to: {log_file_path()}")
 
-    if not search_numbers:
-        logger.warning("No numbers to search. Exiting.")
+    # Multi-node run: the coordinator seeds and merges, nodes work from the queue
+    queue = JobQueue(args.queue, node=args.node_id) if args.queue else None
+    if queue is not None and (args.seed or args.merge):
+        try:
+            run_queue_command(queue, args)
+        finally:
+            queue.close()
         return
+    if queue is not None and args.resume:
+        logger.warning("--resume is not needed with --queue: finished numbers are kept in the queue")
+        args.resume = False
+
+    # Open the result cache and apply any explicit invalidation
+    cache = None
+    if CACHE_ENABLED and not args.no_cache:
+        cache = ResultCache()
+        if args.invalidate:
+            numbers = None if [n.lower() for n in args.invalidate] == ["all"] else args.invalidate
+            removed = cache.invalidate(numbers)
+            logger.info(f"Invalidated {removed} cached result(s)")
+        cache.evict_expired()
 
-    # Loop through each number
-    for index, number in enumerate(search_numbers, start=1):
-        logger.info(f"Processing number {index}/{len(search_numbers)}: {number}")
-
-        # Start by accessing the URL
-        driver = access_url()
-
-        if driver:
-            try:
-                # Select the 2nd radio button
-                select_second_radio_button(driver)
-
-                # Enter the search number
-                enter_search_number(driver, number)
-
-                # Click the CONSULTAR button
-                click_consultar_button(driver)
-
-                # Click the VOLVER button if a dialog appears
-                click_volver_button(driver)
-
-                # Click the first clickable number in the table's second column
-                click_first_clickable_table_number(driver)
-
-                # Extract the Despacho value from the Datos de Proceso tab (default view)
-                despacho_value = extract_despacho_value(driver)
-                if despacho_value:
-                    logger.info(f"Extracted Despacho value: {despacho_value}")
-                    # Write Despacho to column C
-                    write_despacho_to_excel(number, despacho_value)
-                else:
-                    logger.warning(f"Failed to extract Despacho value for {number}")
-
-                # Click the Actuaciones tab
-                click_actuaciones_tab(driver)
-
-                # Get the first data row from Actuaciones and write it to Excel (columns E-J)
-                first_row = print_actuaciones_first_row(driver)
-                if first_row:
-                    # Ensure exactly 6 columns (E-J)
-                    row_values = first_row[:6]
-                    while len(row_values) < 6:
-                        row_values.append("")
-
-                    logger.info(f"Actuaciones first row has {len(row_values)} columns")
-                    written = write_data_to_excel(number, row_values)
-                    if written:
-                        logger.info(f"Wrote Actuaciones first row to Excel for {number}")
-                    else:
-                        logger.error(f"Failed to write Actuaciones data to Excel for {number}")
-                else:
-                    logger.info(f"No first row found in Actuaciones table")
-
-                # Write the Despacho value to Excel (column C)
-                if despacho_value:
-                    write_despacho_to_excel(number, despacho_value)
-
-                # Click the Subjetos Procesales tab
-                click_subjetos_procesales_tab(driver)
-
-                # Extract Demandante and Demandado values
-                sujetos_data = extract_subjetos_procesales(driver)
-                if sujetos_data["demandante"] or sujetos_data["demandado"]:
-                    logger.info(f"Extracted Subjetos Procesales data - Demandante: {sujetos_data['demandante']}, Demandado: {sujetos_data['demandado']}")
-                    write_sujetos_to_excel(number, sujetos_data["demandante"], sujetos_data["demandado"])
-                else:
-                    logger.warning(f"Failed to extract Subjetos Procesales data for {number}")
-
-                logger.info(f"Successfully completed search for: {number}")
-
-            except Exception as e:
-                logger.error(f"Error during search for {number}: {str(e)}", exc_info=True)
-
-            finally:
-                # Close the driver after each search
-                driver.quit()
+    if queue is None:
+        if args.retry_dead_letter:
+            # Read while the run goes on; replaced by the numbers that still fail once it finishes
+            args.input = DEAD_LETTER_FILE_PATH
+        if not os.path.exists(args.input):
+            logger.error(f"Input file not found: {args.input}")
+            return
+
+    # The Excel sink keeps the workbook open for the whole run; writes are batched.
+    # A node stores its results in the queue; they reach the sinks at --merge.
+    sink_names = [] if queue is not None else args.sink
+    sinks = open_sinks(sink_names, sink_paths(sink_names, args.output))
+    if len(sinks) < len(sink_names):
+        for sink in sinks:
+            sink.close()
+        if cache is not None:
+            cache.close()
+        return
+    # The Excel rows also give the incremental baselines and the changed row numbers
+    writer = next((sink for sink in sinks if sink.name == "excel"), None)
+
+    # Every finished number is journaled so an interrupted run can resume
+    # (nodes sharing a directory each keep their own journal and dead-letter file)
+    journal_path, dead_letter_path = JOURNAL_FILE_PATH, DEAD_LETTER_FILE_PATH
+    if queue is not None:
+        journal_path = node_file_path(JOURNAL_FILE_PATH, queue.node)
+        dead_letter_path = node_file_path(DEAD_LETTER_FILE_PATH, queue.node)
+    journal = RunJournal(journal_path, resume=args.resume)
+    # Numbers that still fail after their retries
+    dead_letter = DeadLetterFile(dead_letter_path)
+    failure_counts = {}
+    # Full Actuaciones history, written by the workers as pages are read
+    history = HistoryStore() if args.history or args.export_history else None
+    # Last successful fetch and change count per number (a node leaves them
+    # to the coordinator, which records them at --merge)
+    fetch_stats = FetchStats() if queue is None else None
+    budget = TimeBudget(args.max_minutes) if args.max_minutes is not None else None
+    # Spans are streamed to the trace file as they are recorded
+    if TRACE_ENABLED:
+        tracer.start_trace(TRACE_FILE_PATH)
+
+    completed = 0
+    counts = {"resume": 0, "cache": 0, "lookup": 0}
+    # Input rows per normalized number: repeated rows share one lookup
+    row_counts = {}
+    # Incremental mode: stored snapshots and the numbers found to have changed
+    snapshots = {}
+    changed_numbers = []
+    unchanged_count = 0
+
+    def plan_work():
+        """
+        Stream the input (or the numbers leased from the job queue) and turn
+        each number into a work item: finished numbers (resume) and fresh
+        cache hits carry their result, the rest are looked up by the workers.
+        A number repeated on several rows is planned once; the Excel sink
+        writes its result to all of its rows. Runs on the pool's feeder thread.
+        """
+        if queue is not None:
+            numbers = queue.iter_claimed_numbers()
         else:
-            logger.error(f"Failed to initialize browser for: {number}")
+            numbers = iter_unique_numbers(iter_numbers(args.input), row_counts)
+            if args.schedule:
+                numbers = order_by_value(numbers, fetch_stats, read_priorities(args.input))
+        for position, number in enumerate(numbers, start=1):
+            if position == 1:
+                # First useful work: report the startup overhead (imports, opening
+                # the outputs and reading the input up to here)
+                tracer.record("startup", STARTED_AT)
+                logger.info(f"Startup: {time.perf_counter() - STARTED_AT:.3f}s until the first number was queued")
+            if args.resume:
+                entry = journal.last_entry(number)
+                if entry is not None and entry["status"] != FAILED:
+                    # Finished before the interruption: re-apply its journaled result
+                    # (the Excel save may not have happened) and skip the lookup
+                    yield {"number": number, "source": "resume", "result": entry.get("result")}
+                    continue
+
+            # Serve fresh cached results without touching the browser (unless the
+            # history of this number still has to be read)
+            cached = cache.get(number) if cache is not None and not args.refresh else None
+            if cached is not None and args.history and not history.is_complete(number):
+                cached = None
+            if cached is not None:
+                logger.info(f"Using cached result for: {number}")
+                yield {"number": number, "source": "cache", "result": cached}
+                continue
+
+            if budget is not None and not budget.try_queue():
+                # Out of time: the remaining lookups are left for the next run
+                continue
+            item = {"number": number, "source": "lookup"}
+            if args.incremental:
+                # The stored Actuaciones row (columns E-J, or the cached snapshot
+                # when the sheet is empty) is the change baseline
+                known = writer.read_actuaciones(number) if writer is not None else None
+                if known is None and cache is not None:
+                    snapshot = cache.get(number, max_age_seconds=float("inf"))
+                    if snapshot is not None and snapshot["actuaciones"]:
+                        known = snapshot["actuaciones"]
+                        snapshots[number] = snapshot
+                if known is not None:
+                    item["baseline"] = known
+            yield item
 
-        # Add a small delay between searches
-        if index < len(search_numbers):
-            logger.debug(f"Waiting before next search...")
-            time.sleep(2)
+    def handle_result(item, result):
+        nonlocal completed, unchanged_count
+        number = item["number"]
+        source = item["source"]
+        completed += 1
+        counts[source] += 1
+        if source == "resume":
+            if result:
+                write_result(sinks, number, result)
+            return
+        if source == "lookup":
+            if budget is not None:
+                budget.lookup_finished()
+            if fetch_stats is not None and result is not None:
+                fetch_stats.record(number, result.get("actuaciones"), result.get("changed"))
+
+        logger.info(f"Writing results for number {completed}: {number}")
+        if result is None:
+            failure = item.get("failure") or {"kind": SITE_ERROR, "stage": "lookup", "error": ""}
+            logger.error(f"Search failed for: {number} ({failure['kind']} at {failure['stage']})")
+            failure_counts[failure["kind"]] = failure_counts.get(failure["kind"], 0) + 1
+            journal.record(number, FAILED, failure["stage"], error=f"{failure['kind']}: {failure['error']}")
+            dead_letter.record(number, failure["kind"], failure["stage"], failure["error"])
+            if queue is not None:
+                queue.fail(number, failure)
+            return
+        if result.get("changed") is False:
+            unchanged_count += 1
+            logger.info(f"No changes for: {number}")
+            snapshot = snapshots.get(number)
+            if snapshot is not None:
+                # The output was empty; fill it from the still-valid snapshot
+                write_result(sinks, number, snapshot)
+                if cache is not None:
+                    cache.put(number, snapshot)
+            journal.record(number, SKIPPED, "unchanged", result=snapshot)
+            if queue is not None:
+                queue.complete(number, snapshot)
+            return
+        if args.incremental:
+            changed_numbers.append(number)
+        write_result(sinks, number, result)
+        if cache is not None and source == "lookup" and has_values(result):
+            cache.put(number, result)
+        journal.record(number, COMPLETED, source, result=result)
+        if queue is not None:
+            queue.complete(number, result)
+        logger.info(f"Successfully completed search for: {number}")
+
+    # The Excel sink saves the workbook while the input is still being read:
+    # when they are the same file, the numbers come from a copy
+    input_snapshot = None
+    if writer is not None and os.path.abspath(args.input) == os.path.abspath(writer.file_path):
+        input_snapshot = snapshot_input(args.input)
+        args.input = input_snapshot
+
+    # Set once every number went through; the journal and dead-letter file of
+    # an interrupted run are kept apart from the previous run's
+    finished = False
+    try:
+        if queue is not None:
+            # Keeps this node's leases alive while it works
+            queue.start_heartbeat()
+            logger.info(f"Working as node {queue.node} of {queue.file_path}")
+        # The input is read while the workers run; results are written here, one at a time
+        run_worker_pool(plan_work(), handle_result, worker_count=WORKER_COUNT,
+                        history=history if args.history else None)
+        finished = True
+
+        if not completed:
+            logger.warning("No numbers to search. Exiting.")
+            return
+        repeated_rows = sum(row_counts.values()) - len(row_counts)
+        if repeated_rows:
+            logger.info(f"{sum(row_counts.values())} input row(s) hold {len(row_counts)} unique number(s); "
+                        f"{repeated_rows} repeated row(s) reused a lookup")
+        if args.resume:
+            logger.info(f"Resumed: {counts['resume']} number(s) were already finished")
+        logger.info(f"{counts['cache']} number(s) served from cache, {counts['lookup']} looked up")
+        if args.incremental:
+            report_changes(writer, changed_numbers, unchanged_count)
+        report_failures(dead_letter, failure_counts)
+        if budget is not None and budget.deferred:
+            logger.warning(f"--max-minutes {args.max_minutes:g}: {budget.deferred} lookup(s) left for the next run")
+        if args.history:
+            logger.info(f"Stored {history.added} new actuacion(es) in: {history.file_path}")
+        if args.export_history:
+            export_history_to_xlsx(history, args.export_history)
+    finally:
+        # Save whatever is still buffered, even if the run was interrupted
+        for sink in sinks:
+            with tracer.span(f"close_{sink.name}"):
+                sink.close()
+        journal.close(finished)
+        dead_letter.close(finished)
+        if input_snapshot is not None:
+            os.remove(input_snapshot)
+        if cache is not None:
+            cache.close()
+        if history is not None:
+            history.close()
+        if fetch_stats is not None:
+            fetch_stats.close()
+        if queue is not None:
+            # Numbers still leased (interrupted run) go back to the other nodes
+            queue.release()
+            logger.info(f"Job queue: {format_counts(queue.counts())}")
+            queue.close()
+
+    if args.export_xlsx:
+        exported = next((sink for sink in sinks if sink.name != "excel"), None)
+        if exported is None:
+            logger.warning("--export-xlsx needs a csv, sqlite or parquet sink; nothing exported")
+        else:
+            export_to_xlsx(exported.file_path, args.export_xlsx)
 
-    logger.info(f"All {len(search_numbers)} searches completed!")
-    print(f"\n Execution complete! Check logs at: {LOG_FILE_PATH}")
+    logger.info(f"All {completed} searches completed!")
+    if debug_rate_limiter.dropped:
+        logger.info(f"{debug_rate_limiter.dropped} debug record(s) dropped by the per-line rate limit "
+                    f"(LOG_DEBUG_PER_SECOND)")
+    if TRACE_ENABLED:
+        report_timings()
+    print(f"\n Execution complete! Check logs at: {log_file_path()}")
 
 
 if __name__ == '__main__':
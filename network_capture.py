@@ -0,0 +1,98 @@
+"""
+Capture the consulta site's own JSON backend responses from Chrome's
+performance log (DevTools Network events) instead of reading the DOM
+"""
+
+import json
+import re
+import time
+from config import logger, WAIT_TIMEOUT_SECONDS
+from stage_timing import timed
+
+# Backend endpoints the SPA calls -> payload kind
+API_RESPONSE_PATTERNS = [
+    (re.compile(r"/Procesos/Consulta/NumeroRadicacion(?:\?|$)"), "consulta"),
+    (re.compile(r"/Proceso/Detalle/(\d+)"), "detalle"),
+    (re.compile(r"/Proceso/Actuaciones/(\d+)"), "actuaciones"),
+    (re.compile(r"/Proceso/Sujetos/(\d+)"), "sujetos"),
+]
+
+
+def payload_key(url):
+    """
+    Return (kind, key) for a backend URL, or None for any other request.
+    The key is the searched number (consulta), the process id (detalle,
+    sujetos) or (process id, page) for actuaciones.
+    """
+    for pattern, kind in API_RESPONSE_PATTERNS:
+        match = pattern.search(url)
+        if not match:
+            continue
+        query = dict(re.findall(r"[?&]([^=&]+)=([^&]*)", url))
+        if kind == "consulta":
+            return kind, re.sub(r"\D", "", query.get("numero", ""))
+        if kind == "actuaciones":
+            return kind, (match.group(1), int(query.get("pagina", "1") or 1))
+        return kind, match.group(1)
+    return None
+
+
+class NetworkCapture:
+    """
+    Collects the backend JSON bodies a driver received since the capture
+    started. The performance log is consumed on every read, so one capture
+    is used per lookup on a given driver.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.payloads = {}
+        # requestId -> (kind, key) of responses whose body is not loaded yet
+        self._pending = {}
+        # Drop events of earlier lookups on this driver
+        self.driver.get_log("performance")
+
+    def drain(self):
+        """
+        Read the new performance log entries and fetch the bodies of the
+        backend responses that finished loading
+        """
+        for entry in self.driver.get_log("performance"):
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+            if method == "Network.responseReceived":
+                key = payload_key(params.get("response", {}).get("url", ""))
+                if key is not None and params.get("response", {}).get("status", 0) < 400:
+                    self._pending[params["requestId"]] = key
+            elif method == "Network.loadingFinished" and params.get("requestId") in self._pending:
+                kind, key = self._pending.pop(params["requestId"])
+                body = self._response_body(params["requestId"])
+                if body is not None:
+                    self.payloads[(kind, key)] = body
+
+    def _response_body(self, request_id):
+        try:
+            response = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            return json.loads(response.get("body") or "null")
+        except Exception as e:
+            logger.debug(f"Could not read response body {request_id}: {str(e)}")
+            return None
+
+    @timed("payload_wait")
+    def wait_for(self, kind, key, timeout=WAIT_TIMEOUT_SECONDS):
+        """
+        Wait until the (kind, key) payload has been captured and return it,
+        or None on timeout
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            self.drain()
+            if (kind, key) in self.payloads:
+                return self.payloads[(kind, key)]
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.05)
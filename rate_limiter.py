@@ -0,0 +1,220 @@
+"""
+Adaptive rate limiter shared by every worker: token bucket + AIMD concurrency control
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from config import (
+    logger,
+    RATE_LIMIT_INITIAL_RPS,
+    RATE_LIMIT_MIN_RPS,
+    RATE_LIMIT_MAX_RPS,
+    RATE_LIMIT_RPS_STEP,
+    RATE_LIMIT_BURST,
+    CONCURRENCY_INITIAL,
+    CONCURRENCY_MAX,
+    RATE_LIMIT_LATENCY_FACTOR,
+    RATE_LIMIT_LATENCY_PERCENTILE,
+    RATE_LIMIT_LATENCY_SAMPLES,
+    RATE_LIMIT_LATENCY_FLOOR_SECONDS,
+    RATE_LIMIT_ERROR_RATE,
+    RATE_LIMIT_WINDOW
+)
+from stage_timing import tracer, percentile
+from failures import classify_exception, NOT_FOUND, PARSE_FAILURE
+
+# Request outcomes
+OK = "ok"
+ERROR = "error"
+CONGESTED = "congested"
+# The site answered, but not with a result (number not found, page not
+# parsed): neither a sign of overload nor a healthy request to speed up on
+NEUTRAL = "neutral"
+
+# Minimum number of recent outcomes before the error rate is trusted
+MIN_ERROR_SAMPLES = 5
+
+
+def is_congestion_error(error):
+    """
+    True for errors that mean the server is overloaded: timeouts and HTTP 429/5xx
+    """
+    # Stage failures from the retry layer carry their own classification
+    if getattr(error, "kind", None) == "timeout":
+        return True
+    status = getattr(error, "status", None)
+    if status == 429 or (status is not None and status >= 500):
+        return True
+    if isinstance(error, TimeoutError):
+        return True
+    # Selenium TimeoutException, urllib3 ReadTimeoutError/ConnectTimeoutError, ...
+    return any("Timeout" in cls.__name__ for cls in type(error).__mro__)
+
+
+def error_outcome(error):
+    """
+    Outcome of a request that raised error: CONGESTED for overload, NEUTRAL
+    for a missing number or an unparsed page, ERROR for site errors
+    """
+    if is_congestion_error(error):
+        return CONGESTED
+    if classify_exception(error) in (NOT_FOUND, PARSE_FAILURE):
+        return NEUTRAL
+    return ERROR
+
+
+class AdaptiveLimiter:
+    """
+    Token bucket (requests per second) combined with an AIMD concurrency limit.
+    The rate and the limit increase additively after a window of healthy
+    requests and are halved on congestion (timeouts, 429/5xx, a sustained
+    latency increase) or when the recent error rate is too high.
+    """
+
+    def __init__(self, initial_rate=RATE_LIMIT_INITIAL_RPS, min_rate=RATE_LIMIT_MIN_RPS,
+                 max_rate=RATE_LIMIT_MAX_RPS, rate_step=RATE_LIMIT_RPS_STEP, burst=RATE_LIMIT_BURST,
+                 initial_concurrency=CONCURRENCY_INITIAL, max_concurrency=CONCURRENCY_MAX,
+                 latency_factor=RATE_LIMIT_LATENCY_FACTOR, latency_percentile=RATE_LIMIT_LATENCY_PERCENTILE,
+                 latency_samples=RATE_LIMIT_LATENCY_SAMPLES, latency_floor=RATE_LIMIT_LATENCY_FLOOR_SECONDS,
+                 error_rate=RATE_LIMIT_ERROR_RATE, window=RATE_LIMIT_WINDOW):
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self.burst = burst
+        self.limit = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_factor = latency_factor
+        self.latency_percentile = latency_percentile
+        self.latency_samples = max(1, latency_samples)
+        self.latency_floor = latency_floor
+        self.error_rate = error_rate
+
+        self._cond = threading.Condition()
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._in_flight = 0
+        self._healthy_streak = 0
+        self._latency_baseline = None
+        self._latencies = []
+        self._outcomes = deque(maxlen=window)
+        self._last_backoff = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """
+        Block until a concurrency slot and a token are available.
+        Returns the start time to pass to release().
+        """
+        with self._cond:
+            while True:
+                self._refill()
+                if self._in_flight < self.limit and self._tokens >= 1:
+                    self._tokens -= 1
+                    self._in_flight += 1
+                    return time.monotonic()
+                if self._in_flight >= self.limit:
+                    # Woken up by release(); the timeout only guards against limit changes
+                    self._cond.wait(1.0)
+                else:
+                    self._cond.wait((1 - self._tokens) / self.rate)
+
+    def release(self, started, outcome):
+        """
+        Free the slot taken by acquire() and adapt the rate and concurrency
+        limit to the outcome (OK, NEUTRAL, ERROR or CONGESTED)
+        """
+        latency = time.monotonic() - started
+        with self._cond:
+            self._in_flight -= 1
+
+            if outcome == CONGESTED:
+                self._outcomes.append(False)
+                self._back_off("timeout or server overload")
+            else:
+                # NEUTRAL counts as a success for the error rate only
+                self._outcomes.append(outcome != ERROR)
+                failures = self._outcomes.count(False)
+                too_many_errors = (len(self._outcomes) >= MIN_ERROR_SAMPLES
+                                   and failures / len(self._outcomes) > self.error_rate)
+                slow_latency = self._record_latency(latency) if outcome == OK else None
+
+                if too_many_errors and outcome == ERROR:
+                    self._back_off(f"error rate {failures}/{len(self._outcomes)}")
+                elif slow_latency is not None:
+                    self._back_off(f"p{self.latency_percentile * 100:.0f} latency {slow_latency:.2f}s")
+                elif outcome == OK:
+                    self._healthy_streak += 1
+                    if self._healthy_streak >= self.limit:
+                        self._increase()
+
+            self._cond.notify_all()
+
+    def _record_latency(self, latency):
+        # Latencies are judged by batches of latency_samples healthy requests:
+        # returns the batch percentile when it is too slow, None otherwise
+        self._latencies.append(latency)
+        if len(self._latencies) < self.latency_samples:
+            return None
+        batch = sorted(self._latencies)
+        self._latencies = []
+        slow = percentile(batch, self.latency_percentile)
+        baseline = self._latency_baseline
+        too_slow = baseline is not None and slow > max(self.latency_factor * baseline, self.latency_floor)
+        # Running average of the batch medians: a site that stays slower after
+        # backing off becomes the new baseline over a few batches
+        median = percentile(batch, 0.5)
+        self._latency_baseline = median if baseline is None else 0.8 * baseline + 0.2 * median
+        return slow if too_slow else None
+
+    def _increase(self):
+        # Additive increase, once per window of healthy requests
+        self._healthy_streak = 0
+        new_rate = min(self.max_rate, self.rate + self.rate_step)
+        new_limit = min(self.max_concurrency, self.limit + 1)
+        if new_rate != self.rate or new_limit != self.limit:
+            self.rate = new_rate
+            self.limit = new_limit
+            logger.debug(f"Rate limit raised to {self.rate:.2f} req/s, {self.limit} concurrent")
+
+    def _back_off(self, reason):
+        # Multiplicative decrease, at most once per average request time so a
+        # burst of failures from the same overload only halves the limits once
+        self._healthy_streak = 0
+        now = time.monotonic()
+        if now - self._last_backoff < max(1.0, self._latency_baseline or 0):
+            return
+        self._last_backoff = now
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.limit = max(1, self.limit // 2)
+        self._tokens = min(self._tokens, 0.0)
+        logger.warning(f"Backing off ({reason}): {self.rate:.2f} req/s, {self.limit} concurrent")
+
+    @contextmanager
+    def request(self):
+        """
+        Context manager around one search or backend request. Exceptions are
+        classified (congestion, not found or unparsed, other error), recorded
+        and re-raised.
+        """
+        with tracer.span("rate_limit_wait"):
+            started = self.acquire()
+        outcome = ERROR
+        try:
+            yield
+            outcome = OK
+        except Exception as e:
+            outcome = error_outcome(e)
+            raise
+        finally:
+            self.release(started, outcome)
+
+
+# Process-wide limiter shared by all workers and engines
+search_limiter = AdaptiveLimiter()
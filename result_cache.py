@@ -0,0 +1,116 @@
+"""
+Persistent per-radicacion result cache (SQLite) with a time-to-live
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from config import CACHE_FILE_PATH, CACHE_TTL_HOURS, logger
+from excel_operations import normalize_number
+
+
+class ResultCache:
+    """
+    On-disk cache of lookup results keyed by normalized radicacion number.
+    Each entry holds the Despacho, the first Actuaciones row and
+    Demandante/Demandado, plus the time it was fetched.
+    """
+
+    def __init__(self, file_path=CACHE_FILE_PATH, ttl_hours=CACHE_TTL_HOURS):
+        self.file_path = file_path
+        self.ttl_seconds = ttl_hours * 3600
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(file_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                number TEXT PRIMARY KEY,
+                despacho TEXT NOT NULL,
+                actuaciones TEXT NOT NULL,
+                demandante TEXT NOT NULL,
+                demandado TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, search_number, max_age_seconds=None):
+        """
+        Return the cached result for search_number if it is younger than the
+        TTL (or max_age_seconds), otherwise None
+        """
+        max_age = self.ttl_seconds if max_age_seconds is None else max_age_seconds
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT despacho, actuaciones, demandante, demandado, fetched_at FROM results WHERE number = ?",
+                (normalize_number(search_number),)
+            ).fetchone()
+        if row is None or time.time() - row[4] > max_age:
+            return None
+        return {
+            "despacho": row[0],
+            "actuaciones": json.loads(row[1]),
+            "demandante": row[2],
+            "demandado": row[3]
+        }
+
+    def put(self, search_number, result):
+        """
+        Store (or replace) the result for search_number with the current time
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    normalize_number(search_number),
+                    result.get("despacho") or "",
+                    json.dumps(result.get("actuaciones") or [], ensure_ascii=False),
+                    result.get("demandante") or "",
+                    result.get("demandado") or "",
+                    time.time()
+                )
+            )
+            self._conn.commit()
+
+    def invalidate(self, search_numbers=None):
+        """
+        Remove the given numbers from the cache (every entry if None).
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            if search_numbers is None:
+                removed = self._conn.execute("DELETE FROM results").rowcount
+            else:
+                removed = self._conn.executemany(
+                    "DELETE FROM results WHERE number = ?",
+                    [(normalize_number(n),) for n in search_numbers]
+                ).rowcount
+            self._conn.commit()
+        return removed
+
+    def evict_expired(self):
+        """
+        Remove entries older than the TTL. Returns the number of entries removed.
+        """
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM results WHERE fetched_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            self._conn.commit()
+        if removed:
+            logger.info(f"Evicted {removed} expired cache entr{'y' if removed == 1 else 'ies'}")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def has_values(result):
+    """
+    True if a lookup result carries any extracted value (worth caching)
+    """
+    return bool(result and (result.get("despacho") or result.get("actuaciones")
+                            or result.get("demandante") or result.get("demandado")))
@@ -0,0 +1,374 @@
+"""
+Result sinks: where finished lookups are written (Excel A-J, CSV, SQLite, Parquet)
+"""
+
+import csv
+import os
+import sqlite3
+import threading
+from config import logger, RESULT_SINK_PATHS, SINK_BATCH_ROWS, RUN_TIMESTAMP
+from excel_operations import ExcelResultWriter, normalize_number
+
+
+# Same headers and order as columns A-J of the Excel file
+RESULT_COLUMNS = [
+    "Demandante",
+    "Demandado",
+    "Despacho",
+    "Radicado",
+    "Fecha de Actuacion",
+    "Actuacion",
+    "Anotacion",
+    "Fecha inicia Termino",
+    "Fecha finaliza Termino",
+    "Fecha de Registro"
+]
+
+
+def result_to_row(search_number, result):
+    """
+    Flatten one lookup result into the 10 A-J values (all strings)
+    """
+    actuaciones = [("" if v is None else str(v)) for v in list(result.get("actuaciones") or [])[:6]]
+    actuaciones += [""] * (6 - len(actuaciones))
+    return [
+        result.get("demandante") or "",
+        result.get("demandado") or "",
+        result.get("despacho") or "",
+        normalize_number(search_number)
+    ] + actuaciones
+
+
+class ResultSink:
+    """
+    Interface of a result sink. write() is only called from the collector
+    thread; close() saves anything still buffered.
+    """
+
+    name = None
+
+    def write(self, search_number, result):
+        """
+        Store one result. Returns True on success, False otherwise.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# ============================================================================
+# EXCEL - Columns A-J of the rows with the same number in the source workbook
+# ============================================================================
+
+class ExcelSink(ExcelResultWriter, ResultSink):
+    """
+    The original layout: each result fills columns A-J of every row of the
+    workbook whose column D holds the number (batched by ExcelResultWriter)
+    """
+
+    name = "excel"
+
+    def write(self, search_number, result):
+        ok = True
+
+        # Write Despacho to column C
+        despacho_value = result.get("despacho")
+        if despacho_value:
+            logger.info(f"Extracted Despacho value: {despacho_value}")
+            ok = self.write_despacho(search_number, despacho_value) and ok
+        else:
+            logger.warning(f"Failed to extract Despacho value for {search_number}")
+
+        # Write the Actuaciones first row to columns E-J
+        row_values = result.get("actuaciones")
+        if row_values:
+            logger.info(f"Actuaciones first row has {len(row_values)} columns")
+            if self.write_data(search_number, row_values):
+                logger.info(f"Queued Actuaciones first row for Excel for {search_number}")
+            else:
+                logger.error(f"Failed to write Actuaciones data to Excel for {search_number}")
+                ok = False
+        else:
+            logger.info(f"No first row found in Actuaciones table")
+
+        # Write Demandante and Demandado to columns A-B
+        if result.get("demandante") or result.get("demandado"):
+            logger.info(f"Extracted Subjetos Procesales data - Demandante: {result.get('demandante')}, "
+                        f"Demandado: {result.get('demandado')}")
+            ok = self.write_sujetos(search_number, result.get("demandante"), result.get("demandado")) and ok
+        else:
+            logger.warning(f"Failed to extract Subjetos Procesales data for {search_number}")
+
+        return ok
+
+
+# ============================================================================
+# APPEND-FRIENDLY SINKS
+# ============================================================================
+
+class CsvSink(ResultSink):
+    """
+    One CSV line per result, appended and flushed as it arrives. A number
+    looked up again in a later run is appended again (the last line wins).
+    """
+
+    name = "csv"
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path or RESULT_SINK_PATHS["csv"]
+        new_file = not os.path.exists(self.file_path) or os.path.getsize(self.file_path) == 0
+        self._file = open(self.file_path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(RESULT_COLUMNS)
+        logger.info(f"Writing results to CSV: {self.file_path}")
+
+    def write(self, search_number, result):
+        self._writer.writerow(result_to_row(search_number, result))
+        self._file.flush()
+        return True
+
+    def close(self):
+        self._file.close()
+
+
+class SqliteSink(ResultSink):
+    """
+    SQLite table keyed by number (re-running a number replaces its row).
+    Inserts are committed every batch_rows results and on close().
+    """
+
+    name = "sqlite"
+
+    def __init__(self, file_path=None, batch_rows=SINK_BATCH_ROWS):
+        self.file_path = file_path or RESULT_SINK_PATHS["sqlite"]
+        self.batch_rows = batch_rows
+        self._uncommitted = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.file_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                demandante TEXT, demandado TEXT, despacho TEXT,
+                radicado TEXT PRIMARY KEY,
+                fecha_actuacion TEXT, actuacion TEXT, anotacion TEXT,
+                fecha_inicia_termino TEXT, fecha_finaliza_termino TEXT, fecha_registro TEXT,
+                written_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        self._conn.commit()
+        logger.info(f"Writing results to SQLite: {self.file_path}")
+
+    def write(self, search_number, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (demandante, demandado, despacho, radicado, fecha_actuacion, "
+                "actuacion, anotacion, fecha_inicia_termino, fecha_finaliza_termino, fecha_registro) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                result_to_row(search_number, result)
+            )
+            self._uncommitted += 1
+            if self._uncommitted >= self.batch_rows:
+                self._conn.commit()
+                self._uncommitted = 0
+        return True
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+def parquet_part_path(directory):
+    """
+    New part file of this run in a parquet dataset directory (part names sort
+    by run, so later parts hold the newer results)
+    """
+    path = os.path.join(directory, f"part-{RUN_TIMESTAMP}.parquet")
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"part-{RUN_TIMESTAMP}-{suffix}.parquet")
+        suffix += 1
+    return path
+
+
+def import_pyarrow(needed_by):
+    """
+    Import pyarrow on first use (it is optional and slow to import).
+    Raises RuntimeError naming what needs it when it is not installed.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError(f"{needed_by} needs pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+class ParquetSink(ResultSink):
+    """
+    Parquet dataset: file_path is a directory and every run writes its own
+    part file in it (part-<run timestamp>.parquet), one row group every
+    batch_rows results, so a later run (resume, queue merge) never
+    overwrites earlier results. Needs pyarrow.
+    """
+
+    name = "parquet"
+
+    def __init__(self, file_path=None, batch_rows=SINK_BATCH_ROWS):
+        pyarrow = import_pyarrow("The parquet sink")
+        self._pyarrow = pyarrow
+        self.file_path = file_path or RESULT_SINK_PATHS["parquet"]
+        if os.path.isfile(self.file_path):
+            raise RuntimeError(f"{self.file_path} is a single parquet file; the parquet sink writes a directory "
+                               f"of part files there (move or rename the file first)")
+        os.makedirs(self.file_path, exist_ok=True)
+        self.part_path = parquet_part_path(self.file_path)
+        self.batch_rows = batch_rows
+        self._schema = pyarrow.schema([(column, pyarrow.string()) for column in RESULT_COLUMNS])
+        self._writer = pyarrow.parquet.ParquetWriter(self.part_path, self._schema)
+        self._rows = []
+        logger.info(f"Writing results to Parquet: {self.part_path}")
+
+    def write(self, search_number, result):
+        self._rows.append(result_to_row(search_number, result))
+        if len(self._rows) >= self.batch_rows:
+            self._write_batch()
+        return True
+
+    def _write_batch(self):
+        if not self._rows:
+            return
+        pyarrow = self._pyarrow
+        columns = list(zip(*self._rows))
+        table = pyarrow.Table.from_arrays([pyarrow.array(c, pyarrow.string()) for c in columns],
+                                          schema=self._schema)
+        self._writer.write_table(table)
+        self._rows = []
+
+    def close(self):
+        self._write_batch()
+        self._writer.close()
+
+
+SINK_TYPES = {sink.name: sink for sink in (ExcelSink, CsvSink, SqliteSink, ParquetSink)}
+
+
+def sink_paths(names, output_path):
+    """
+    Map each file sink in names to output_path. With several file sinks,
+    each one gets output_path with its own extension (.csv, .sqlite3, .parquet).
+    """
+    file_sinks = [name for name in names if name in RESULT_SINK_PATHS]
+    if not output_path or not file_sinks:
+        return {}
+    if len(file_sinks) == 1:
+        return {file_sinks[0]: output_path}
+    base = os.path.splitext(output_path)[0]
+    return {name: base + os.path.splitext(RESULT_SINK_PATHS[name])[1] for name in file_sinks}
+
+
+def open_sinks(names, paths=None):
+    """
+    Open the sinks listed in names ("excel", "csv", "sqlite", "parquet").
+    paths optionally maps a sink name to its output file.
+    Sinks that cannot be opened are logged and left out.
+    """
+    paths = paths or {}
+    sinks = []
+    for name in names:
+        if name not in SINK_TYPES:
+            logger.error(f"Unknown result sink: {name}")
+            continue
+        try:
+            sinks.append(SINK_TYPES[name](paths.get(name)))
+        except FileNotFoundError as e:
+            logger.error(f"Cannot open {name} sink, file not found: {str(e)}")
+        except RuntimeError as e:
+            logger.error(f"Cannot open {name} sink: {str(e)}")
+        except Exception as e:
+            logger.error(f"Cannot open {name} sink: {str(e)}", exc_info=True)
+    return sinks
+
+
+# ============================================================================
+# XLSX EXPORT - Streamed with openpyxl write_only mode
+# ============================================================================
+
+def iter_sink_rows(file_path):
+    """
+    Yield the A-J rows stored in a CSV, SQLite or Parquet sink file (or
+    Parquet dataset directory, part by part), in the order they were written
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".csv":
+        with open(file_path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                yield row
+    elif extension == ".parquet":
+        pyarrow = import_pyarrow("Reading a parquet file")
+        if os.path.isdir(file_path):
+            part_paths = [os.path.join(file_path, name) for name in sorted(os.listdir(file_path))
+                          if name.endswith(".parquet")]
+        else:
+            part_paths = [file_path]
+        for part_path in part_paths:
+            parquet_file = pyarrow.parquet.ParquetFile(part_path)
+            for batch in parquet_file.iter_batches():
+                columns = [batch.column(i).to_pylist() for i in range(batch.num_columns)]
+                for row in zip(*columns):
+                    yield list(row)
+    else:
+        conn = sqlite3.connect(file_path)
+        try:
+            cursor = conn.execute(
+                "SELECT demandante, demandado, despacho, radicado, fecha_actuacion, actuacion, anotacion, "
+                "fecha_inicia_termino, fecha_finaliza_termino, fecha_registro FROM results ORDER BY rowid"
+            )
+            for row in cursor:
+                yield list(row)
+        finally:
+            conn.close()
+
+
+def iter_latest_rows(file_path):
+    """
+    Yield the rows of a sink file keeping only the last row written for each
+    number (CSV lines and Parquet parts of later runs win). Reads the file
+    twice, so only the position of each number's last row is held in memory.
+    """
+    last_position = {}
+    for position, row in enumerate(iter_sink_rows(file_path)):
+        last_position[normalize_number(row[3])] = position
+    for position, row in enumerate(iter_sink_rows(file_path)):
+        if last_position.get(normalize_number(row[3])) == position:
+            yield row
+
+
+def export_to_xlsx(source_path, xlsx_path):
+    """
+    Copy a sink file into a new .xlsx with the A-J layout, one row per
+    number (the last one written). The workbook is created in write_only
+    mode, so rows are streamed to disk instead of being held in memory.
+    Returns the number of rows exported, or -1 on error.
+    """
+    try:
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet("Resultados")
+        worksheet.append(RESULT_COLUMNS)
+        count = 0
+        for row in iter_latest_rows(source_path):
+            worksheet.append(row)
+            count += 1
+        workbook.save(xlsx_path)
+        logger.info(f"Exported {count} row(s) from {source_path} to {xlsx_path}")
+        return count
+    except Exception as e:
+        logger.error(f"Error exporting {source_path} to xlsx: {str(e)}", exc_info=True)
+        return -1
@@ -0,0 +1,158 @@
+"""
+Lookup scheduling: order the numbers by how much a fresh lookup is worth
+(priority, staleness, past change frequency) and stop queueing lookups
+that would not finish within a time budget
+"""
+
+import sqlite3
+import threading
+import time
+from config import (
+    logger,
+    FETCH_STATS_FILE_PATH,
+    SCHEDULE_PRIORITY_WEIGHT,
+    SCHEDULE_MIN_CHANGE_RATE,
+    SCHEDULE_NEVER_FETCHED_HOURS
+)
+from excel_operations import normalize_number
+from incremental import actuacion_fingerprint
+
+
+class FetchStats:
+    """
+    Per-number lookup statistics: time of the last successful lookup, how
+    many successful lookups there were and how many of them found a new
+    latest actuacion. Kept across runs (unlike the cache, never evicted).
+    """
+
+    def __init__(self, file_path=FETCH_STATS_FILE_PATH):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(file_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fetch_stats (
+                number TEXT PRIMARY KEY,
+                last_success REAL NOT NULL,
+                lookups INTEGER NOT NULL,
+                changes INTEGER NOT NULL,
+                fingerprint TEXT
+            )
+            """
+        )
+        self._conn.commit()
+
+    def record(self, search_number, actuaciones, changed=None):
+        """
+        Count one successful lookup. Whether it found a new actuacion is
+        taken from changed when known (incremental runs), otherwise from the
+        fingerprint of the latest actuacion compared with the previous one.
+        """
+        number = normalize_number(search_number)
+        fingerprint = actuacion_fingerprint(actuaciones)
+        with self._lock:
+            row = self._conn.execute("SELECT lookups, changes, fingerprint FROM fetch_stats WHERE number = ?",
+                                     (number,)).fetchone()
+            lookups, changes, previous = row if row is not None else (0, 0, None)
+            if changed is None:
+                changed = row is not None and fingerprint is not None and fingerprint != previous
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fetch_stats VALUES (?, ?, ?, ?, ?)",
+                (number, time.time(), lookups + 1, changes + int(bool(changed)), fingerprint or previous)
+            )
+            self._conn.commit()
+
+    def get_all(self):
+        """
+        {number: (last_success, lookups, changes)}
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT number, last_success, lookups, changes FROM fetch_stats").fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ============================================================================
+# ORDERING
+# ============================================================================
+
+def lookup_value(priority, stats, now):
+    """
+    Value of looking a number up now (see SCHEDULING in config.py):
+    priority-weighted staleness in hours times the chance of a new actuacion
+    """
+    if stats is None:
+        hours, change_rate = SCHEDULE_NEVER_FETCHED_HOURS, 0.5
+    else:
+        last_success, lookups, changes = stats
+        hours = max(now - last_success, 0) / 3600
+        # Smoothed, so one lookup without a change does not rule a number out
+        change_rate = (changes + 1) / (lookups + 2)
+    return (1 + SCHEDULE_PRIORITY_WEIGHT * priority) * hours * (SCHEDULE_MIN_CHANGE_RATE + change_rate)
+
+
+def order_by_value(numbers, fetch_stats, priorities=None):
+    """
+    Return numbers sorted by lookup value, highest first (input order among
+    equal values). Reads the whole input, so the first lookup waits for it.
+    """
+    priorities = priorities or {}
+    stats = fetch_stats.get_all()
+    now = time.time()
+    numbers = list(numbers)
+    values = {number: lookup_value(priorities.get(number, 0), stats.get(number), now) for number in numbers}
+    ordered = sorted(numbers, key=lambda number: values[number], reverse=True)
+    never = sum(1 for number in numbers if number not in stats)
+    logger.info(f"Scheduled {len(ordered)} number(s) by value: {never} never fetched, "
+                f"{sum(1 for number in numbers if number in priorities)} with a priority")
+    return ordered
+
+
+# ============================================================================
+# TIME BUDGET
+# ============================================================================
+
+class TimeBudget:
+    """
+    Deadline of a --max-minutes run. A new lookup is only queued while the
+    lookups already queued plus this one are expected to finish in time,
+    at the throughput measured so far. Once one lookup is deferred every
+    later one is too, so a less valuable number never overtakes it; they
+    are left for the next run, where they are among the stalest.
+    """
+
+    def __init__(self, minutes):
+        self.seconds = minutes * 60
+        self.deadline = time.monotonic() + self.seconds
+        self.queued = 0
+        self.finished = 0
+        self.deferred = 0
+        self._first_queued_at = None
+        self._lock = threading.Lock()
+
+    def try_queue(self):
+        """
+        Reserve one lookup; False (and counted as deferred) once it would
+        end after the deadline
+        """
+        now = time.monotonic()
+        with self._lock:
+            allowed = not self.deferred and now < self.deadline
+            if allowed and self.finished:
+                throughput = self.finished / max(now - self._first_queued_at, 1e-6)
+                pending = self.queued - self.finished + 1
+                allowed = now + pending / throughput <= self.deadline
+            if not allowed:
+                self.deferred += 1
+                return False
+            if self._first_queued_at is None:
+                self._first_queued_at = now
+            self.queued += 1
+            return True
+
+    def lookup_finished(self):
+        with self._lock:
+            self.finished += 1
@@ -0,0 +1,244 @@
+"""
+Per-stage timing spans: each lookup step is timed per radicacion, summarized
+at the end of the run and streamed to a Chrome trace-event file
+"""
+
+import atexit
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from config import logger, TRACE_ENABLED, TRACE_SAMPLE_SIZE
+
+# Span outcomes
+OK = "ok"
+FAILED = "failed"
+ERROR = "error"
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted, non-empty list
+    """
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class SpanRecorder:
+    """
+    Thread-safe recorder of (number, stage, start, duration, outcome) spans.
+    The radicacion being processed is kept per thread (set_number), so the
+    scraping functions do not need to pass it around.
+
+    Memory does not grow with the run: each stage keeps its count, failures,
+    maximum and a random sample of at most TRACE_SAMPLE_SIZE durations for
+    the percentiles (exact while a stage has fewer spans), and the spans
+    themselves are streamed to the trace file opened with start_trace().
+    """
+
+    def __init__(self, enabled=TRACE_ENABLED, sample_size=TRACE_SAMPLE_SIZE):
+        self.enabled = enabled
+        self.sample_size = sample_size
+        self.spans = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # stage -> {'count', 'failed', 'max', 'sample'}
+        self._stages = {}
+        self._thread_names = {}
+        self._random = random.Random()
+        self._trace_file = None
+        self._trace_path = None
+        self._trace_events = 0
+
+    def set_number(self, search_number):
+        """
+        Set the radicacion the current thread is working on
+        """
+        self._local.number = search_number
+
+    @contextmanager
+    def span(self, stage, search_number=None):
+        """
+        Time the enclosed block as one span of the given stage. The yielded
+        dictionary's 'outcome' can be set to FAILED by the caller; exceptions
+        mark the span as ERROR and are re-raised.
+        """
+        if not self.enabled:
+            yield {}
+            return
+        span = {"outcome": OK}
+        number = search_number if search_number is not None else getattr(self._local, "number", None)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span["outcome"] = ERROR
+            raise
+        finally:
+            self._add(number, stage, started, time.perf_counter() - started, span["outcome"])
+
+    def record(self, stage, started, outcome=OK):
+        """
+        Record a span from started (a time.perf_counter() value) until now,
+        for work no context manager can wrap (e.g. the program startup)
+        """
+        if not self.enabled:
+            return
+        self._add(getattr(self._local, "number", None), stage, started, time.perf_counter() - started, outcome)
+
+    def _add(self, number, stage, started, duration, outcome):
+        thread = threading.current_thread()
+        with self._lock:
+            self._thread_names[thread.ident] = thread.name
+            self.spans += 1
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = {"count": 0, "failed": 0, "max": 0.0, "sample": []}
+            stats["count"] += 1
+            stats["failed"] += outcome != OK
+            stats["max"] = max(stats["max"], duration)
+            # Reservoir sampling: every span of the stage has the same chance to be kept
+            if len(stats["sample"]) < self.sample_size:
+                stats["sample"].append(duration)
+            else:
+                slot = self._random.randrange(stats["count"])
+                if slot < self.sample_size:
+                    stats["sample"][slot] = duration
+            if self._trace_file is not None:
+                self._write_event({
+                    "name": stage,
+                    "cat": "lookup",
+                    "ph": "X",
+                    "ts": round(started * 1e6),
+                    "dur": round(duration * 1e6),
+                    "pid": os.getpid(),
+                    "tid": thread.ident,
+                    "args": {"number": number, "outcome": outcome}
+                })
+
+    def summary(self):
+        """
+        Return {stage: {'count', 'p50', 'p95', 'max', 'failed'}} with durations in seconds
+        """
+        with self._lock:
+            stages = {stage: dict(stats, sample=sorted(stats["sample"])) for stage, stats in self._stages.items()}
+        return {
+            stage: {
+                "count": stats["count"],
+                "p50": percentile(stats["sample"], 0.50),
+                "p95": percentile(stats["sample"], 0.95),
+                "max": stats["max"],
+                "failed": stats["failed"]
+            }
+            for stage, stats in stages.items()
+        }
+
+    def format_summary(self):
+        """
+        Return the per-stage summary as printable lines (slowest total first)
+        """
+        stats = self.summary()
+        if not stats:
+            return []
+        width = max(len("stage"), max(len(stage) for stage in stats))
+        lines = [f"{'stage':<{width}}  {'count':>6}  {'p50 s':>8}  {'p95 s':>8}  {'max s':>8}  {'failed':>6}"]
+        for stage, s in sorted(stats.items(), key=lambda item: -item[1]["p50"] * item[1]["count"]):
+            lines.append(f"{stage:<{width}}  {s['count']:>6}  {s['p50']:>8.3f}  {s['p95']:>8.3f}  "
+                         f"{s['max']:>8.3f}  {s['failed']:>6}")
+        return lines
+
+    # ------------------------------------------------------------------
+    # Chrome trace file
+    # ------------------------------------------------------------------
+
+    def _write_event(self, event):
+        """
+        Append one event to the trace file (called with the lock held). Every
+        event is followed by a comma; finish_trace() ends the list.
+        """
+        try:
+            self._trace_file.write("\n" + json.dumps(event, ensure_ascii=False) + ",")
+            self._trace_events += 1
+        except Exception as e:
+            logger.error(f"Error writing timing trace, no further spans saved: {str(e)}")
+            try:
+                self._trace_file.close()
+            except Exception:
+                pass
+            self._trace_file = None
+
+    def start_trace(self, file_path):
+        """
+        Stream every following span to file_path in Chrome trace-event format
+        (open with chrome://tracing or https://ui.perfetto.dev). The file is
+        completed by finish_trace(), or at exit if the run is interrupted.
+        Returns True if the file could be opened.
+        """
+        if not self.enabled:
+            return False
+        try:
+            directory = os.path.dirname(file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            trace_file = open(file_path, "w", encoding="utf-8")
+            trace_file.write('{"traceEvents": [')
+        except Exception as e:
+            logger.error(f"Error opening timing trace: {str(e)}", exc_info=True)
+            return False
+        with self._lock:
+            self._trace_file = trace_file
+            self._trace_path = file_path
+            self._trace_events = 0
+        atexit.register(self.finish_trace)
+        return True
+
+    def finish_trace(self):
+        """
+        Add the thread names and close the trace file. Returns True when a
+        trace file was completed, False otherwise (also when called again).
+        """
+        with self._lock:
+            trace_file, self._trace_file = self._trace_file, None
+            thread_names = dict(self._thread_names)
+            events = self._trace_events
+        if trace_file is None:
+            return False
+        atexit.unregister(self.finish_trace)
+        pid = os.getpid()
+        metadata = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in thread_names.items()]
+        try:
+            # The events written so far end with a comma, the metadata closes the list
+            trace_file.write("\n" + json.dumps(metadata, ensure_ascii=False)[1:-1] if metadata else "\n{}")
+            trace_file.write('\n], "displayTimeUnit": "ms"}')
+            trace_file.close()
+        except Exception as e:
+            logger.error(f"Error saving timing trace: {str(e)}", exc_info=True)
+            return False
+        logger.info(f"Saved timing trace ({events} spans) to: {self._trace_path}")
+        return True
+
+
+# Process-wide recorder shared by all workers
+tracer = SpanRecorder()
+
+
+def timed(stage):
+    """
+    Decorator recording every call of the function as a span of the given
+    stage. Calls returning False, None, "" or [] (the scraping functions'
+    failure values) are recorded as FAILED.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(stage) as span:
+                value = func(*args, **kwargs)
+                if value is False or value is None or value == "" or value == []:
+                    span["outcome"] = FAILED
+                return value
+        return wrapper
+    return decorator
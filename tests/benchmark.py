@@ -0,0 +1,272 @@
+"""
+End-to-end benchmark: runs the real main pipeline (headless Chrome by
+default) against the local site replica over the sample workbooks and
+reports numbers per minute and per-stage latency.
+
+Run with:
+    python tests/benchmark.py                          # selenium engine, 3/10/50-row workbooks
+    python tests/benchmark.py --engine http --workers 4
+    python tests/benchmark.py --save baseline.json     # keep the numbers of this tree
+    python tests/benchmark.py --baseline baseline.json # compare a change against them
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from openpyxl import load_workbook
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from replica_server import start_replica_server
+
+# Stages shown in the per-workbook table (others are still saved with --save)
+SUMMARY_STAGES = ["lookup", "page_load", "return_to_form", "consultar", "volver", "open_process",
+                  "extract_despacho", "actuaciones_tab", "extract_actuaciones", "extract_actuaciones_page",
+                  "actuaciones_next_page", "sujetos_tab",
+                  "extract_sujetos", "http_search", "http_detalle", "http_actuaciones", "http_sujetos",
+                  "write_excel", "close_excel"]
+
+
+def count_numbers(workbook_path):
+    """
+    Number of non-empty cells in column D below the header
+    """
+    workbook = load_workbook(workbook_path, read_only=True)
+    try:
+        return sum(1 for (value,) in workbook.active.iter_rows(min_row=2, min_col=4, max_col=4, values_only=True)
+                   if value is not None and str(value).strip())
+    finally:
+        workbook.close()
+
+
+def count_filled(workbook_path):
+    """
+    Number of rows whose Despacho (column C) was filled by the run
+    """
+    workbook = load_workbook(workbook_path, read_only=True)
+    try:
+        return sum(1 for (value,) in workbook.active.iter_rows(min_row=2, min_col=3, max_col=3, values_only=True)
+                   if value is not None and str(value).strip())
+    finally:
+        workbook.close()
+
+
+def stage_stats(trace_path):
+    """
+    {stage: {'count', 'p50', 'p95', 'max'}} in seconds from a Chrome trace file
+    """
+    from stage_timing import percentile
+
+    with open(trace_path, encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    durations = {}
+    for event in events:
+        if event.get("ph") == "X":
+            durations.setdefault(event["name"], []).append(event["dur"] / 1e6)
+    stats = {}
+    for stage, values in durations.items():
+        values.sort()
+        stats[stage] = {"count": len(values), "p50": percentile(values, 0.50),
+                        "p95": percentile(values, 0.95), "max": values[-1]}
+    return stats
+
+
+# ============================================================================
+# ONE RUN
+# ============================================================================
+
+def state_overrides(work_dir, name):
+    """
+    Config overrides sending every file a child run keeps besides its output
+    (logs, journal, dead letters, cache, history, fetch stats, job queue,
+    driver paths, traces, sink files) to work_dir, so no run touches the repo.
+    File names start with name, so several runs can share work_dir.
+    """
+    def path(file_name):
+        return os.path.join(work_dir, f"{name}_{file_name}")
+
+    return {
+        "LOG_DIR": os.path.join(work_dir, "logs"),
+        "CACHE_FILE_PATH": path("results_cache.sqlite3"),
+        "JOURNAL_FILE_PATH": path("journal.jsonl"),
+        "HISTORY_FILE_PATH": path("actuaciones_history.sqlite3"),
+        "DEAD_LETTER_FILE_PATH": path("dead_letter.jsonl"),
+        "FETCH_STATS_FILE_PATH": path("fetch_stats.sqlite3"),
+        "QUEUE_FILE_PATH": path("job_queue.sqlite3"),
+        "DRIVER_PATHS_FILE": os.path.join(work_dir, "driver_paths.json"),
+        "TRACE_DIR": os.path.join(work_dir, "traces"),
+        "TRACE_FILE_PATH": path("trace.json"),
+        "RESULT_SINK_PATHS": {
+            "csv": path("results.csv"),
+            "sqlite": path("results.sqlite3"),
+            "parquet": path("results.parquet")
+        }
+    }
+
+
+def run_child(settings):
+    """
+    Entry point of the benchmark subprocess: override config values before
+    anything imports them, then run main exactly as the command line does
+    """
+    import config
+    for name, value in settings["config"].items():
+        setattr(config, name, value)
+    import main
+    main.main(settings["argv"])
+
+
+def run_workbook(workbook_path, work_dir, site_url, api_url, args):
+    """
+    Run main over a copy of workbook_path in a fresh process.
+    Returns the result dictionary of this workbook.
+    """
+    name = os.path.splitext(os.path.basename(workbook_path))[0]
+    excel_path = os.path.join(work_dir, f"{name}.xlsx")
+    trace_path = os.path.join(work_dir, f"{name}_trace.json")
+    shutil.copy(workbook_path, excel_path)
+
+    overrides = state_overrides(work_dir, name)
+    overrides.update({
+        "URL": site_url,
+        "API_BASE_URL": api_url,
+        "EXCEL_FILE_PATH": excel_path,
+        "INPUT_FILE_PATH": excel_path,
+        "TRACE_FILE_PATH": trace_path,
+        "TRACE_ENABLED": True,
+        "CACHE_ENABLED": False,
+        "LOOKUP_ENGINE": args.engine,
+        "WORKER_COUNT": args.workers,
+        "CHROME_HEADLESS": not args.headed
+    })
+    if not args.throttle:
+        # The replica is local: measure the pipeline, not the politeness delay
+        overrides.update({
+            "RATE_LIMIT_INITIAL_RPS": 1000.0,
+            "RATE_LIMIT_MAX_RPS": 1000.0,
+            "RATE_LIMIT_BURST": 1000,
+            "CONCURRENCY_INITIAL": max(8, args.workers),
+            "CONCURRENCY_MAX": max(8, args.workers)
+        })
+    settings = {"config": overrides, "argv": ["--no-cache"]}
+
+    numbers = count_numbers(excel_path)
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", json.dumps(settings)],
+        cwd=REPO_DIR, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - started
+
+    result = {"workbook": name, "numbers": numbers, "seconds": round(elapsed, 3), "returncode": process.returncode}
+    if process.returncode != 0 or not os.path.exists(trace_path):
+        result["error"] = (process.stderr or process.stdout)[-2000:]
+        return result
+
+    result["filled"] = count_filled(excel_path)
+    result["numbers_per_minute"] = round(numbers * 60 / elapsed, 2) if elapsed else 0
+    result["stages"] = stage_stats(trace_path)
+    return result
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def print_result(result, baseline=None):
+    """
+    Print the throughput and stage latencies of one workbook, with the
+    change against the baseline run when given
+    """
+    print(f"\n{result['workbook']}: {result['numbers']} number(s)")
+    if "error" in result:
+        print(f"  FAILED (exit code {result['returncode']}):")
+        print("  " + result["error"].strip().replace("\n", "\n  "))
+        return
+
+    line = (f"  {result['seconds']:.1f}s total, {result['numbers_per_minute']:.1f} numbers/minute, "
+            f"{result['filled']}/{result['numbers']} rows filled")
+    if baseline and baseline.get("numbers_per_minute"):
+        change = (result["numbers_per_minute"] / baseline["numbers_per_minute"] - 1) * 100
+        line += f" (baseline {baseline['numbers_per_minute']:.1f}, {change:+.1f}%)"
+    print(line)
+
+    print(f"  {'stage':<20}  {'count':>5}  {'p50 s':>7}  {'p95 s':>7}  {'max s':>7}  {'base p50':>8}")
+    for stage in SUMMARY_STAGES:
+        stats = result["stages"].get(stage)
+        if not stats:
+            continue
+        base = ((baseline or {}).get("stages") or {}).get(stage)
+        base_p50 = f"{base['p50']:>8.3f}" if base else f"{'-':>8}"
+        print(f"  {stage:<20}  {stats['count']:>5}  {stats['p50']:>7.3f}  {stats['p95']:>7.3f}  "
+              f"{stats['max']:>7.3f}  {base_p50}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the lookup pipeline against the local site replica")
+    parser.add_argument("--engine", choices=["selenium", "http"], default="selenium")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[3, 10, 50],
+                        help="sample workbooks to run (tests/NumeroRadicacion_<size>.xlsx)")
+    parser.add_argument("--latency-ms", type=int, default=50,
+                        help="delay of every backend answer of the replica")
+    parser.add_argument("--no-dialog", action="store_true", help="do not show the VOLVER dialog")
+    parser.add_argument("--throttle", action="store_true",
+                        help="keep the rate limiter settings of config.py")
+    parser.add_argument("--headed", action="store_true", help="show the browser window")
+    parser.add_argument("--save", metavar="PATH", help="save the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="compare with results saved by --save")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(json.loads(args.child))
+        return
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {r["workbook"]: r for r in json.load(f)["results"]}
+
+    server, site_url, api_url = start_replica_server(synthetic=True, latency_ms=args.latency_ms)
+    if args.no_dialog:
+        site_url += "?dialog=0"
+    print(f"Site replica at {site_url} ({args.engine} engine, {args.workers} worker(s), "
+          f"{args.latency_ms} ms backend latency)")
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="nr_benchmark_") as work_dir:
+            for size in args.sizes:
+                workbook_path = os.path.join(TESTS_DIR, f"NumeroRadicacion_{size}.xlsx")
+                if not os.path.exists(workbook_path):
+                    print(f"\nSkipping missing workbook: {workbook_path}")
+                    continue
+                result = run_workbook(workbook_path, work_dir, site_url, api_url, args)
+                results.append(result)
+                print_result(result, baseline.get(result["workbook"]))
+    finally:
+        server.shutdown()
+
+    if args.save:
+        report = {
+            "engine": args.engine,
+            "workers": args.workers,
+            "latency_ms": args.latency_ms,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "results": results
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to: {args.save}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Shared pytest setup: the repository modules are importable from the tests,
+the log file of a test session goes to a temporary directory instead of
+the repository's logs/, and a fake clock for the time-based modules
+"""
+
+import os
+import sys
+import tempfile
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, REPO_DIR)
+
+# Read by config.py at import, which happens after this file is loaded
+os.environ.setdefault("NUMERO_RADICACION_LOG_DIR", tempfile.mkdtemp(prefix="nr_pytest_logs_"))
+
+
+class FakeClock:
+    """
+    Stand-in for the time module (time, monotonic and sleep) that only moves
+    when the test calls it with a number of seconds
+    """
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    monotonic = time
+
+    def sleep(self, seconds):
+        pass
+
+    def __call__(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    """
+    A FakeClock; test files install it with monkeypatch.setattr(module, "time", clock)
+    """
+    return FakeClock(1_000_000.0)
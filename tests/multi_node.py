@@ -0,0 +1,158 @@
+"""
+Multi-node run on one machine: seeds a shared job queue from a sample
+workbook, runs several node processes against the local site replica
+(HTTP engine), optionally kills one of them mid-run so its leased numbers
+are reassigned, merges the queue into a copy of the workbook and compares
+columns A-J with a single-process run over the same workbook.
+
+Run with:
+    python tests/multi_node.py
+    python tests/multi_node.py --nodes 4 --kill-after 2
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from openpyxl import load_workbook
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from replica_server import start_replica_server
+from benchmark import state_overrides
+
+BENCHMARK = os.path.join(TESTS_DIR, "benchmark.py")
+
+
+def child_command(overrides, argv):
+    """
+    Command line running main in a fresh process with config overrides
+    (through the benchmark's --child entry point)
+    """
+    settings = {"config": overrides, "argv": argv}
+    return [sys.executable, BENCHMARK, "--child", json.dumps(settings)]
+
+
+def base_overrides(work_dir, api_url, name, args):
+    overrides = state_overrides(work_dir, name)
+    overrides.update({
+        "API_BASE_URL": api_url,
+        "LOOKUP_ENGINE": "http",
+        "WORKER_COUNT": args.workers,
+        "CACHE_ENABLED": False,
+        "TRACE_ENABLED": False,
+        # The replica is local: measure the queue, not the politeness delay
+        "RATE_LIMIT_INITIAL_RPS": 1000.0,
+        "RATE_LIMIT_MAX_RPS": 1000.0,
+        "RATE_LIMIT_BURST": 1000,
+        "CONCURRENCY_INITIAL": 8,
+        "CONCURRENCY_MAX": 8,
+        # Short leases so a killed node's numbers come back within seconds
+        "QUEUE_LEASE_SECONDS": args.lease_seconds,
+        "QUEUE_HEARTBEAT_SECONDS": args.lease_seconds / 4,
+        "QUEUE_POLL_SECONDS": 0.5,
+        "QUEUE_CLAIM_BATCH": 2
+    })
+    return overrides
+
+
+def read_columns(workbook_path):
+    """
+    Columns A-J of every row below the header
+    """
+    workbook = load_workbook(workbook_path, read_only=True)
+    try:
+        return [tuple("" if v is None else str(v) for v in row)
+                for row in workbook.active.iter_rows(min_row=2, max_col=10, values_only=True)]
+    finally:
+        workbook.close()
+
+
+def queue_report(queue_path):
+    """
+    (finished numbers per node, numbers leased more than once)
+    """
+    conn = sqlite3.connect(queue_path)
+    try:
+        per_node = dict(conn.execute("SELECT node, COUNT(*) FROM jobs WHERE status = 'done' GROUP BY node"))
+        reassigned = conn.execute("SELECT COUNT(*) FROM jobs WHERE attempts > 1").fetchone()[0]
+    finally:
+        conn.close()
+    return per_node, reassigned
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a sharded job with several local node processes")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=2, help="lookup workers per node")
+    parser.add_argument("--size", type=int, default=50, help="sample workbook (tests/NumeroRadicacion_<size>.xlsx)")
+    parser.add_argument("--latency-ms", type=int, default=100, help="delay of every backend answer")
+    parser.add_argument("--kill-after", type=float, default=1.5,
+                        help="kill the first node after this many seconds (0 keeps every node alive)")
+    parser.add_argument("--lease-seconds", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    source = os.path.join(TESTS_DIR, f"NumeroRadicacion_{args.size}.xlsx")
+    server, _, api_url = start_replica_server(synthetic=True, latency_ms=args.latency_ms)
+    try:
+        with tempfile.TemporaryDirectory(prefix="nr_multi_node_") as work_dir:
+            merged_path = os.path.join(work_dir, "merged.xlsx")
+            single_path = os.path.join(work_dir, "single.xlsx")
+            queue_path = os.path.join(work_dir, "job_queue.sqlite3")
+            shutil.copy(source, merged_path)
+            shutil.copy(source, single_path)
+
+            # Coordinator: seed the queue
+            overrides = base_overrides(work_dir, api_url, "coordinator", args)
+            overrides.update({"EXCEL_FILE_PATH": merged_path, "INPUT_FILE_PATH": merged_path})
+            subprocess.run(child_command(overrides, ["--queue", queue_path, "--seed"]), cwd=REPO_DIR, check=True)
+
+            # Nodes
+            started = time.perf_counter()
+            nodes = []
+            for index in range(args.nodes):
+                name = f"node-{index}"
+                command = child_command(base_overrides(work_dir, api_url, name, args),
+                                        ["--queue", queue_path, "--node-id", name])
+                nodes.append(subprocess.Popen(command, cwd=REPO_DIR, stdout=subprocess.DEVNULL,
+                                              stderr=subprocess.DEVNULL))
+            if args.kill_after:
+                time.sleep(args.kill_after)
+                nodes[0].kill()
+                print(f"Killed node-0 after {args.kill_after:.1f}s")
+            for node in nodes:
+                node.wait()
+            elapsed = time.perf_counter() - started
+            per_node, reassigned = queue_report(queue_path)
+
+            # Coordinator: merge into the A-J layout
+            subprocess.run(child_command(overrides, ["--queue", queue_path, "--merge"]), cwd=REPO_DIR, check=True)
+
+            # Reference: one process over the same workbook
+            overrides = base_overrides(work_dir, api_url, "single", args)
+            overrides.update({"EXCEL_FILE_PATH": single_path, "INPUT_FILE_PATH": single_path})
+            subprocess.run(child_command(overrides, []), cwd=REPO_DIR, check=True,
+                           stdout=subprocess.DEVNULL)
+
+            merged, single = read_columns(merged_path), read_columns(single_path)
+    finally:
+        server.shutdown()
+
+    print(f"{args.nodes} node(s) drained the queue in {elapsed:.1f}s")
+    for node, count in sorted(per_node.items()):
+        print(f"  {node}: {count} number(s)")
+    print(f"Numbers leased more than once (reassigned): {reassigned}")
+    differing = sum(1 for a, b in zip(merged, single) if a != b)
+    print(f"Merged workbook vs single-process run: {len(merged) - differing}/{len(merged)} row(s) identical")
+    return 0 if differing == 0 and len(merged) == len(single) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+// Replica of the consulta procesos SPA: search form, VOLVER dialog, results
+// table and the process view with its tabs. Every view is rendered from the
+// same JSON backend calls the real site makes (served by replica_server.py).
+(function () {
+    var API = '/api/v2';
+    var app = document.getElementById('app');
+    var overlay = document.getElementById('overlay');
+    var params = new URLSearchParams(window.location.search);
+    // ?dialog=0 disables the VOLVER dialog shown after each search
+    var showDialog = params.get('dialog') !== '0';
+    var state = {numero: '', procesos: [], proceso: null, detalle: null, tab: 'datos'};
+
+    function escapeHtml(value) {
+        return String(value === null || value === undefined ? '' : value)
+            .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+    }
+
+    function formatDate(value) {
+        return value ? String(value).substring(0, 10) : '';
+    }
+
+    function getJson(path) {
+        overlay.classList.add('v-overlay--active');
+        return new Promise(function (resolve, reject) {
+            var xhr = new XMLHttpRequest();
+            xhr.open('GET', API + path);
+            xhr.setRequestHeader('Accept', 'application/json');
+            xhr.onload = function () {
+                overlay.classList.remove('v-overlay--active');
+                if (xhr.status >= 400) { reject(new Error('HTTP ' + xhr.status)); return; }
+                resolve(JSON.parse(xhr.responseText));
+            };
+            xhr.onerror = function () {
+                overlay.classList.remove('v-overlay--active');
+                reject(new Error('network error'));
+            };
+            xhr.send();
+        });
+    }
+
+    function showError(message) {
+        var div = document.createElement('div');
+        div.className = 'error';
+        div.textContent = 'Error: ' + message;
+        app.appendChild(div);
+    }
+
+    // ------------------------------------------------------------------
+    // Search form
+    // ------------------------------------------------------------------
+
+    function renderForm() {
+        app.innerHTML =
+            '<h1>Consulta de Procesos por Número de Radicación</h1>' +
+            '<div role="radiogroup">' +
+            '  <label><input type="radio" name="tipo" value="recientes"> Procesos con Actuaciones Recientes (últimos 30 días)</label>' +
+            '  <label><input type="radio" name="tipo" value="todos"> Todos los Procesos (consulta completa, menos rápida)</label>' +
+            '</div>' +
+            '<label>Número de Radicación <input type="text" id="numero" maxlength="23" placeholder="Ingrese los 23 dígitos"></label>' +
+            '<div><button class="success" aria-label="Consultar número de radicación" id="consultar"><span>Consultar</span></button></div>';
+        document.getElementById('consultar').addEventListener('click', function () {
+            var numero = document.getElementById('numero').value.replace(/\D/g, '');
+            if (numero.length !== 23) { showError('El número de radicación debe tener 23 dígitos'); return; }
+            consultar(numero, true);
+        });
+    }
+
+    function goToForm() {
+        history.pushState({view: 'form'}, '');
+        renderForm();
+    }
+
+    function consultar(numero, push) {
+        var soloActivos = false;
+        getJson('/Procesos/Consulta/NumeroRadicacion?numero=' + numero + '&SoloActivos=' + soloActivos + '&pagina=1')
+            .then(function (data) {
+                state.numero = numero;
+                state.procesos = data.procesos || [];
+                if (push) { history.pushState({view: 'results', numero: numero}, ''); }
+                renderResults();
+                if (showDialog) { renderDialog(); }
+            })
+            .catch(function (e) { showError(e.message); });
+    }
+
+    // ------------------------------------------------------------------
+    // VOLVER dialog and results table
+    // ------------------------------------------------------------------
+
+    function renderDialog() {
+        var dialog = document.createElement('div');
+        dialog.className = 'v-dialog';
+        dialog.setAttribute('role', 'dialog');
+        dialog.innerHTML =
+            '<p>Tenga en cuenta que la información de los procesos es de carácter informativo.</p>' +
+            '<button aria-label="Volver al listado"><span>Volver</span></button>';
+        dialog.querySelector('button').addEventListener('click', function () {
+            dialog.parentNode.removeChild(dialog);
+        });
+        document.body.appendChild(dialog);
+    }
+
+    function renderResults() {
+        var rows = state.procesos.map(function (p, i) {
+            var numero = p.esPrivado
+                ? '<p>' + escapeHtml(p.llaveProceso) + '</p>'
+                : '<button data-index="' + i + '">' + escapeHtml(p.llaveProceso) + '</button>';
+            return '<tr><td>' + (i + 1) + '</td><td>' + numero + '</td>' +
+                '<td>' + formatDate(p.fechaProceso) + '<br>' + formatDate(p.fechaUltimaActuacion) + '</td>' +
+                '<td>' + escapeHtml(p.despacho) + '<br>' + escapeHtml(p.departamento) + '</td>' +
+                '<td>' + escapeHtml(p.sujetosProcesales) + '</td></tr>';
+        }).join('');
+        if (!rows) {
+            rows = '<tr><td colspan="5">No se encontraron resultados para el número ' + escapeHtml(state.numero) + '</td></tr>';
+        }
+        app.innerHTML =
+            '<button id="regresar"><span>Regresar</span></button>' +
+            '<table><thead><tr><th></th><th>Número de Radicación</th><th>Fecha de Radicación y última actuación</th>' +
+            '<th>Despacho y Departamento</th><th>Sujetos Procesales</th></tr></thead><tbody>' + rows + '</tbody></table>';
+        document.getElementById('regresar').addEventListener('click', goToForm);
+        Array.prototype.forEach.call(app.querySelectorAll('td button'), function (button) {
+            button.addEventListener('click', function () {
+                openProceso(state.procesos[Number(button.getAttribute('data-index'))], true);
+            });
+        });
+    }
+
+    // ------------------------------------------------------------------
+    // Process view with tabs
+    // ------------------------------------------------------------------
+
+    var TABS = [
+        ['datos', 'Datos del Proceso'],
+        ['sujetos', 'Sujetos Procesales'],
+        ['documentos', 'Documentos del Proceso'],
+        ['actuaciones', 'Actuaciones']
+    ];
+
+    function openProceso(proceso, push) {
+        getJson('/Proceso/Detalle/' + proceso.idProceso)
+            .then(function (detalle) {
+                state.proceso = proceso;
+                state.detalle = detalle;
+                if (push) { history.pushState({view: 'process', numero: state.numero, id: proceso.idProceso}, ''); }
+                renderProceso();
+            })
+            .catch(function (e) { showError(e.message); });
+    }
+
+    function renderProceso() {
+        var tabs = TABS.map(function (tab) {
+            return '<div role="tab" data-tab="' + tab[0] + '" aria-selected="false">' + tab[1] + '</div>';
+        }).join('');
+        app.innerHTML =
+            '<button id="regresar"><span>Regresar</span></button>' +
+            '<h2>Proceso ' + escapeHtml(state.proceso.llaveProceso) + '</h2>' +
+            '<div class="tabs" role="tablist">' + tabs + '</div><div id="tab-content"></div>';
+        document.getElementById('regresar').addEventListener('click', goToForm);
+        Array.prototype.forEach.call(app.querySelectorAll("div[role='tab']"), function (tab) {
+            tab.addEventListener('click', function () { selectTab(tab.getAttribute('data-tab')); });
+        });
+        selectTab('datos');
+    }
+
+    function selectTab(name) {
+        state.tab = name;
+        Array.prototype.forEach.call(app.querySelectorAll("div[role='tab']"), function (tab) {
+            var selected = tab.getAttribute('data-tab') === name;
+            tab.setAttribute('aria-selected', selected ? 'true' : 'false');
+            tab.className = selected ? 'active' : '';
+        });
+        var content = document.getElementById('tab-content');
+        content.innerHTML = '';
+        if (name === 'datos') {
+            renderDatos(content);
+        } else if (name === 'sujetos') {
+            getJson('/Proceso/Sujetos/' + state.proceso.idProceso + '?pagina=1')
+                .then(function (data) { if (state.tab === 'sujetos') { renderSujetos(content, data); } })
+                .catch(function (e) { showError(e.message); });
+        } else if (name === 'actuaciones') {
+            loadActuaciones(content, 1);
+        } else {
+            content.innerHTML = '<p>No hay documentos asociados.</p>';
+        }
+    }
+
+    function renderDatos(content) {
+        var d = state.detalle || {};
+        var pairs = [
+            ['Fecha de Radicación:', formatDate(d.fechaProceso)],
+            ['Despacho:', d.despacho],
+            ['Ponente:', d.ponente],
+            ['Tipo de Proceso:', d.tipoProceso],
+            ['Clase de Proceso:', d.claseProceso],
+            ['Subclase de Proceso:', d.subclaseProceso],
+            ['Recurso:', d.recurso],
+            ['Ubicación del Expediente:', d.ubicacion],
+            ['Contenido de Radicación:', d.contenidoRadicacion]
+        ];
+        content.innerHTML = '<table><tbody>' + pairs.map(function (pair) {
+            return '<tr><th>' + pair[0] + '</th><td>' + escapeHtml(pair[1]) + '</td></tr>';
+        }).join('') + '</tbody></table>';
+    }
+
+    function renderSujetos(content, data) {
+        var rows = (data.sujetos || []).map(function (s) {
+            return '<tr><td>' + escapeHtml(s.tipoSujeto) + '</td><td>' + escapeHtml(s.nombreRazonSocial) + '</td>' +
+                '<td>' + (s.esEmplazado ? 'Sí' : 'No') + '</td></tr>';
+        }).join('');
+        content.innerHTML = '<table><thead><tr><th>Tipo</th><th>Razón Social</th><th>Es Emplazado</th></tr></thead>' +
+            '<tbody>' + rows + '</tbody></table>';
+    }
+
+    function loadActuaciones(content, pagina) {
+        getJson('/Proceso/Actuaciones/' + state.proceso.idProceso + '?pagina=' + pagina)
+            .then(function (data) { if (state.tab === 'actuaciones') { renderActuaciones(content, data, pagina); } })
+            .catch(function (e) { showError(e.message); });
+    }
+
+    function renderActuaciones(content, data, pagina) {
+        var rows = (data.actuaciones || []).map(function (a) {
+            return '<tr><td>' + formatDate(a.fechaActuacion) + '</td><td>' + escapeHtml(a.actuacion) + '</td>' +
+                '<td>' + escapeHtml(a.anotacion) + '</td><td>' + formatDate(a.fechaInicial) + '</td>' +
+                '<td>' + formatDate(a.fechaFinal) + '</td><td>' + formatDate(a.fechaRegistro) + '</td></tr>';
+        }).join('');
+        var paginas = (data.paginacion && data.paginacion.cantidadPaginas) || 1;
+        var pager = '<nav class="pagination" aria-label="Paginación">' +
+            '<button aria-label="Página anterior" data-page="' + (pagina - 1) + '"' + (pagina <= 1 ? ' disabled' : '') + '><span>&lt;</span></button>' +
+            '<span class="current-page">' + pagina + '</span> / <span class="page-count">' + paginas + '</span>' +
+            '<button aria-label="Página siguiente" data-page="' + (pagina + 1) + '"' + (pagina >= paginas ? ' disabled' : '') + '><span>&gt;</span></button>' +
+            '</nav>';
+        content.innerHTML = '<table><thead><tr><th>Fecha de Actuación</th><th>Actuación</th><th>Anotación</th>' +
+            '<th>Fecha inicia Término</th><th>Fecha finaliza Término</th><th>Fecha de Registro</th></tr></thead>' +
+            '<tbody>' + rows + '</tbody></table>' + pager;
+        Array.prototype.forEach.call(content.querySelectorAll('nav button'), function (button) {
+            button.addEventListener('click', function () {
+                loadActuaciones(content, Number(button.getAttribute('data-page')));
+            });
+        });
+    }
+
+    // ------------------------------------------------------------------
+    // History: browser back returns to the previous view
+    // ------------------------------------------------------------------
+
+    window.addEventListener('popstate', function (event) {
+        var view = event.state && event.state.view;
+        var dialog = document.querySelector('.v-dialog');
+        if (dialog) { dialog.parentNode.removeChild(dialog); }
+        if (view === 'results') {
+            renderResults();
+        } else if (view === 'process' && state.proceso) {
+            renderProceso();
+        } else {
+            renderForm();
+        }
+    });
+
+    renderForm();
+})();
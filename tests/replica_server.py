@@ -0,0 +1,260 @@
+"""
+Local replica of the consulta procesos site: the SPA in tests/replica
+(search form, VOLVER dialog, results table and the three tabs) plus the
+JSON backend it calls, served from one local HTTP server.
+
+Recorded fixtures (tests/fixtures/api) are served as-is. With --synthetic,
+any other 23-digit number gets a deterministic generated process, so every
+row of the sample workbooks goes through the full lookup.
+
+Run with:
+    python tests/replica_server.py --port 8766 --synthetic
+then point the app at it:
+    set NUMERO_RADICACION_URL=http://127.0.0.1:8766/Procesos/NumeroRadicacion
+    set NUMERO_RADICACION_API_URL=http://127.0.0.1:8766/api/v2
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from stub_server import ROUTES, resolve
+
+REPLICA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replica")
+
+# Site paths -> (file in tests/replica, content type)
+PAGES = {
+    "/": ("index.html", "text/html; charset=utf-8"),
+    "/Procesos/NumeroRadicacion": ("index.html", "text/html; charset=utf-8"),
+    "/replica/app.js": ("app.js", "application/javascript; charset=utf-8"),
+}
+
+# Synthetic process ids start here so they never clash with the fixtures
+SYNTHETIC_ID_BASE = 500000
+# Actuaciones per page, as in the real backend
+ACTUACIONES_PER_PAGE = 40
+
+ACTUACION_NAMES = ["Fijacion estado", "Auto interlocutorio", "Recepción memorial", "Al despacho",
+                   "Auto que ordena archivo", "Notificación personal", "Traslado"]
+NOMBRES = ["ANA MARIA GOMEZ", "JOSE LUIS RAMIREZ", "EMPRESA EJEMPLO S.A.S.", "MUNICIPIO DE EJEMPLO",
+           "BANCO EJEMPLO S.A.", "LUZ DARY CASTRO"]
+
+
+def number_seed(numero):
+    """
+    Stable integer derived from a radicacion number
+    """
+    return int(hashlib.sha1(numero.encode("utf-8")).hexdigest()[:8], 16)
+
+
+class SyntheticBackend:
+    """
+    Deterministic generated processes for numbers without a fixture
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._numbers = {}
+
+    def consulta(self, numero):
+        if not re.fullmatch(r"\d{23}", numero):
+            return None
+        seed = number_seed(numero)
+        id_proceso = SYNTHETIC_ID_BASE + seed % 400000
+        with self._lock:
+            self._numbers[id_proceso] = numero
+        return {
+            "tipoConsulta": "NumeroRadicacion",
+            "procesos": [{
+                "idProceso": id_proceso,
+                "idConexion": 261,
+                "llaveProceso": numero,
+                "fechaProceso": f"{2010 + seed % 14}-0{1 + seed % 9}-1{seed % 10}T00:00:00",
+                "fechaUltimaActuacion": "2025-03-14T00:00:00",
+                "despacho": self.despacho(seed) + " ",
+                "departamento": "CAQUETÁ",
+                "sujetosProcesales": f"Demandante: {NOMBRES[seed % 6]} | Demandado: {NOMBRES[(seed // 7) % 6]}",
+                "esPrivado": False,
+                "cantFilas": -1
+            }],
+            "parametros": {"numero": numero},
+            "paginacion": {"cantidadRegistros": 1, "registrosPagina": 20, "cantidadPaginas": 1,
+                           "pagina": 1, "paginas": None}
+        }
+
+    @staticmethod
+    def despacho(seed):
+        return f"JUZGADO {1 + seed % 9:03d} CIVIL MUNICIPAL DE FLORENCIA"
+
+    def numero(self, id_proceso):
+        with self._lock:
+            return self._numbers.get(int(id_proceso))
+
+    def detalle(self, id_proceso):
+        numero = self.numero(id_proceso)
+        if numero is None:
+            return None
+        seed = number_seed(numero)
+        return {
+            "idRegProceso": int(id_proceso),
+            "llaveProceso": numero,
+            "esPrivado": False,
+            "fechaProceso": "2015-01-10T00:00:00",
+            "despacho": self.despacho(seed) + " ",
+            "ponente": "",
+            "tipoProceso": "Declarativo",
+            "claseProceso": "Verbal",
+            "subclaseProceso": "Sin Subclase de Proceso",
+            "recurso": "Sin Tipo de Recurso",
+            "ubicacion": "Secretaría",
+            "contenidoRadicacion": "",
+            "fechaConsulta": "2026-10-18T09:00:00",
+            "ultimaActualizacion": "2026-10-17T18:00:00"
+        }
+
+    def actuaciones(self, id_proceso, pagina):
+        numero = self.numero(id_proceso)
+        if numero is None:
+            return None
+        seed = number_seed(numero)
+        total = 3 + seed % 60
+        paginas = (total + ACTUACIONES_PER_PAGE - 1) // ACTUACIONES_PER_PAGE
+        start = (pagina - 1) * ACTUACIONES_PER_PAGE
+        actuaciones = []
+        for cons in range(total - start, max(0, total - start - ACTUACIONES_PER_PAGE), -1):
+            day = 1 + cons % 28
+            month = 1 + (cons // 28) % 12
+            fecha = f"{2015 + cons // 336}-{month:02d}-{day:02d}T00:00:00"
+            actuaciones.append({
+                "idRegActuacion": int(id_proceso) * 1000 + cons,
+                "llaveProceso": numero,
+                "consActuacion": cons,
+                "fechaActuacion": fecha,
+                "actuacion": ACTUACION_NAMES[(seed + cons) % len(ACTUACION_NAMES)],
+                "anotacion": f"Actuación {cons} del proceso",
+                "fechaInicial": fecha if cons % 3 == 0 else None,
+                "fechaFinal": fecha if cons % 3 == 0 else None,
+                "fechaRegistro": fecha,
+                "codRegla": "00",
+                "conDocumentos": False,
+                "cant": total
+            })
+        return {
+            "actuaciones": actuaciones,
+            "paginacion": {"cantidadRegistros": total, "registrosPagina": ACTUACIONES_PER_PAGE,
+                           "cantidadPaginas": paginas, "pagina": pagina, "paginas": None}
+        }
+
+    def sujetos(self, id_proceso):
+        numero = self.numero(id_proceso)
+        if numero is None:
+            return None
+        seed = number_seed(numero)
+        sujetos = [
+            {"idRegSujeto": 1, "tipoSujeto": "Demandante", "esEmplazado": False, "identificacion": None,
+             "nombreRazonSocial": NOMBRES[seed % 6], "cant": 2},
+            {"idRegSujeto": 2, "tipoSujeto": "Demandado", "esEmplazado": False, "identificacion": None,
+             "nombreRazonSocial": NOMBRES[(seed // 7) % 6], "cant": 2}
+        ]
+        return {"sujetos": sujetos, "paginacion": {"cantidadRegistros": 2, "registrosPagina": 40,
+                                                   "cantidadPaginas": 1, "pagina": 1, "paginas": None}}
+
+    def resolve(self, path, query):
+        """
+        Same contract as stub_server.resolve; returns None when the request
+        is not for a synthetic process
+        """
+        for pattern, folder in ROUTES:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if folder == "consulta":
+                payload = self.consulta(query.get("numero", [""])[0])
+            elif folder == "detalle":
+                payload = self.detalle(match.group(1))
+            elif folder == "actuaciones":
+                payload = self.actuaciones(match.group(1), int(query.get("pagina", ["1"])[0]))
+            else:
+                payload = self.sujetos(match.group(1))
+            return None if payload is None else (200, payload)
+        return None
+
+
+def make_handler(synthetic=False, latency_ms=0):
+    """
+    Build the request handler class. latency_ms delays every backend answer
+    to mimic the real site's response time.
+    """
+    backend = SyntheticBackend() if synthetic else None
+
+    class ReplicaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately; without this, Nagle's
+        # algorithm adds ~40 ms to every keep-alive response
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path in PAGES:
+                file_name, content_type = PAGES[parsed.path]
+                with open(os.path.join(REPLICA_DIR, file_name), "rb") as f:
+                    self.send_body(200, f.read(), content_type)
+                return
+
+            query = parse_qs(parsed.query)
+            status, payload = resolve(parsed.path, query)
+            fixture_miss = status == 404 or (parsed.path.endswith("/NumeroRadicacion") and not payload.get("procesos"))
+            if backend is not None and fixture_miss:
+                status, payload = backend.resolve(parsed.path, query) or (status, payload)
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_body(status, body, "application/json; charset=utf-8")
+
+        def send_body(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Keep benchmark output quiet
+            pass
+
+    return ReplicaHandler
+
+
+def start_replica_server(port=0, synthetic=True, latency_ms=0):
+    """
+    Start the replica in a background thread.
+    Returns (server, site_url, api_url): the values for NUMERO_RADICACION_URL
+    and NUMERO_RADICACION_API_URL.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(synthetic, latency_ms))
+    thread = threading.Thread(target=server.serve_forever, name="replica-server", daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    return server, f"{base}/Procesos/NumeroRadicacion", f"{base}/api/v2"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local replica of the consulta procesos site")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--synthetic", action="store_true",
+                        help="generate a process for numbers without a fixture")
+    parser.add_argument("--latency-ms", type=int, default=0,
+                        help="delay every backend answer by this many milliseconds")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.synthetic, args.latency_ms))
+    print(f"Serving the site replica at http://127.0.0.1:{args.port}/Procesos/NumeroRadicacion")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
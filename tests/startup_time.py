@@ -0,0 +1,107 @@
+"""
+Startup overhead of the program: how long `import main` takes in a fresh
+interpreter (and which heavy modules it loads), and how long an ad-hoc
+one-number run takes until its first lookup is queued (the "startup" span).
+
+Run with:
+    python tests/startup_time.py
+    python tests/startup_time.py --repeat 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from stub_server import start_stub_server
+from benchmark import state_overrides
+
+# Modules that should only be imported once they are needed
+HEAVY_MODULES = ["selenium", "openpyxl", "urllib3"]
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+print(json.dumps({{"seconds": time.perf_counter() - started,
+                  "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+# A number with a recorded fixture in tests/fixtures/api
+SAMPLE_NUMBER = "18001310500220120030203"
+
+
+def time_import(repeat):
+    """
+    Median seconds of `import main` over repeat fresh interpreters, and the
+    heavy modules it loaded
+    """
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return statistics.median(r["seconds"] for r in runs), runs[-1]["loaded"]
+
+
+def time_adhoc_lookup(work_dir, api_url):
+    """
+    Run main over a one-number JSONL input with the HTTP engine and a CSV
+    sink. Returns the "startup" span duration in seconds, or None.
+    """
+    input_path = os.path.join(work_dir, "numbers.jsonl")
+    trace_path = os.path.join(work_dir, "trace.json")
+    with open(input_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(SAMPLE_NUMBER) + "\n")
+    overrides = state_overrides(work_dir, "adhoc")
+    overrides.update({
+        "API_BASE_URL": api_url,
+        "LOOKUP_ENGINE": "http",
+        "TRACE_ENABLED": True,
+        "TRACE_FILE_PATH": trace_path,
+        "CACHE_ENABLED": False
+    })
+    settings = {
+        "config": overrides,
+        "argv": ["--input", input_path, "--sink", "csv", "--output", os.path.join(work_dir, "results.csv")]
+    }
+    subprocess.run([sys.executable, os.path.join(TESTS_DIR, "benchmark.py"), "--child", json.dumps(settings)],
+                   cwd=REPO_DIR, capture_output=True, text=True)
+    if not os.path.exists(trace_path):
+        return None
+    with open(trace_path, encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    startup = [e["dur"] / 1e6 for e in events if e.get("ph") == "X" and e["name"] == "startup"]
+    return startup[0] if startup else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the startup overhead of main.py")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters for the import timing")
+    args = parser.parse_args(argv)
+
+    seconds, loaded = time_import(args.repeat)
+    print(f"import main: {seconds * 1000:.0f} ms (median of {args.repeat})")
+    print(f"heavy modules loaded by the import: {', '.join(loaded) if loaded else 'none'}")
+
+    server, api_url = start_stub_server()
+    try:
+        with tempfile.TemporaryDirectory(prefix="nr_startup_") as work_dir:
+            startup = time_adhoc_lookup(work_dir, api_url)
+    finally:
+        server.shutdown()
+    if startup is None:
+        print("ad-hoc lookup: no startup span recorded (the run failed)")
+    else:
+        print(f"ad-hoc lookup: first number queued after {startup * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Local stub of the consulta procesos JSON backend, serving the recorded
+fixtures in tests/fixtures/api so the HTTP engine can run offline.
+
+Run with:
+    python tests/stub_server.py --port 8765
+then point the app at it:
+    set NUMERO_RADICACION_API_URL=http://127.0.0.1:8765/api/v2
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "api")
+
+# Path patterns of the backend endpoints -> fixture folder
+ROUTES = [
+    (re.compile(r"^/api/v2/Procesos/Consulta/NumeroRadicacion$"), "consulta"),
+    (re.compile(r"^/api/v2/Proceso/Detalle/(\d+)$"), "detalle"),
+    (re.compile(r"^/api/v2/Proceso/Actuaciones/(\d+)$"), "actuaciones"),
+    (re.compile(r"^/api/v2/Proceso/Sujetos/(\d+)$"), "sujetos"),
+]
+
+
+def load_fixture(folder, name):
+    """
+    Return the parsed fixture tests/fixtures/api/<folder>/<name>.json, or None
+    """
+    path = os.path.join(FIXTURES_DIR, folder, f"{name}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resolve(path, query):
+    """
+    Map a request to (status, payload) using the fixtures
+    """
+    for pattern, folder in ROUTES:
+        match = pattern.match(path)
+        if not match:
+            continue
+
+        if folder == "consulta":
+            numero = query.get("numero", [""])[0]
+            payload = load_fixture(folder, numero)
+            if payload is None:
+                # The backend answers unknown numbers with an empty list
+                payload = {"tipoConsulta": "NumeroRadicacion", "procesos": [], "parametros": {"numero": numero},
+                           "paginacion": {"cantidadRegistros": 0, "registrosPagina": 20, "cantidadPaginas": 0,
+                                          "pagina": 1, "paginas": None}}
+            return 200, payload
+
+        id_proceso = match.group(1)
+        if folder == "detalle":
+            payload = load_fixture(folder, id_proceso)
+        else:
+            pagina = query.get("pagina", ["1"])[0]
+            payload = load_fixture(folder, f"{id_proceso}_{pagina}")
+        if payload is None:
+            return 404, {"Message": "No se encontraron registros"}
+        return 200, payload
+
+    return 404, {"Message": "Not found"}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serve fixture JSON for GET requests
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        status, payload = resolve(parsed.path, parse_qs(parsed.query))
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep test output quiet
+        pass
+
+
+def start_stub_server(port=0):
+    """
+    Start the stub in a background thread.
+    Returns (server, base_url) where base_url is the value for NUMERO_RADICACION_API_URL.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, name="stub-server", daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/v2"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline stub of the consulta procesos backend")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler)
+    print(f"Serving fixtures from {FIXTURES_DIR} at http://127.0.0.1:{args.port}/api/v2")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
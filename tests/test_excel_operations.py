@@ -0,0 +1,55 @@
+"""
+Number normalization, the column D row index and the deduplicated input
+"""
+
+import pytest
+from openpyxl import Workbook
+from excel_operations import normalize_number, build_row_index, iter_unique_numbers
+
+NUMBER = "11001310300120200000100"
+
+
+@pytest.mark.parametrize("value", [
+    NUMBER,
+    "11001-31-03-001-2020-00001-00",
+    " 11001 3103 001 2020 00001 00 ",
+    "11001.31.03.001.2020.00001.00",
+    "11001/31/03/001/2020/00001_00",
+    11001310300120200000100
+])
+def test_normalize_number_gives_the_plain_digits(value):
+    assert normalize_number(value) == NUMBER
+
+
+def test_normalize_number_of_a_float_cell():
+    # openpyxl reads numbers typed without quotes as floats
+    assert normalize_number(1234567.0) == "1234567"
+
+
+def test_normalize_number_keeps_text_that_is_not_a_number():
+    assert normalize_number(" Sin radicado ") == "Sin radicado"
+
+
+@pytest.mark.parametrize("value", [None, "", "   "])
+def test_normalize_number_of_an_empty_cell(value):
+    assert normalize_number(value) == ""
+
+
+def test_build_row_index_keeps_every_row_of_a_number():
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.append(["Demandante", "Demandado", "Despacho", "Radicado"])
+    for number in [NUMBER, "11001-31-03-001-2020-00002-00", None, "11001-31-03-001-2020-00001-00"]:
+        worksheet.append([None, None, None, number])
+
+    assert build_row_index(worksheet) == {
+        NUMBER: [2, 5],
+        "11001310300120200000200": [3]
+    }
+
+
+def test_iter_unique_numbers_counts_repeated_rows():
+    row_counts = {}
+    numbers = ["1", "2", "1", "3", "1"]
+    assert list(iter_unique_numbers(numbers, row_counts)) == ["1", "2", "3"]
+    assert row_counts == {"1": 3, "2": 1, "3": 1}
@@ -0,0 +1,53 @@
+"""
+Incremental change detection: the latest actuacion read from the site
+against the one stored in columns E-J or the cache
+"""
+
+from datetime import date, datetime
+from incremental import normalize_cell, actuacion_fingerprint, is_unchanged, unchanged_result
+
+STORED = ["2024-03-01", "Auto admite demanda", "Se admite", "2024-03-04", "2024-03-15", "2024-03-01"]
+
+
+def test_same_actuacion_is_unchanged():
+    assert is_unchanged(list(STORED), STORED)
+
+
+def test_new_actuacion_is_a_change():
+    latest = ["2024-04-10", "Fijacion estado", "", "", "", "2024-04-10"]
+    assert not is_unchanged(latest, STORED)
+
+
+def test_excel_dates_and_whitespace_compare_equal():
+    # The same row as read back from the workbook: date cells and extra spaces
+    from_excel = [datetime(2024, 3, 1), "Auto  admite\ndemanda", " Se admite ", date(2024, 3, 4),
+                  date(2024, 3, 15), datetime(2024, 3, 1, 0, 0)]
+    assert is_unchanged(STORED, from_excel)
+
+
+def test_missing_trailing_cells_compare_as_empty():
+    latest = ["2024-04-10", "Fijacion estado", "", "", "", ""]
+    assert is_unchanged(latest, ["2024-04-10", "Fijacion estado", None])
+
+
+def test_empty_rows_never_match():
+    assert actuacion_fingerprint([]) is None
+    assert actuacion_fingerprint([None, "", "  "]) is None
+    assert not is_unchanged([], [])
+    assert not is_unchanged(STORED, None)
+
+
+def test_only_columns_e_to_j_are_compared():
+    assert is_unchanged(STORED + ["extra"], STORED)
+
+
+def test_normalize_cell():
+    assert normalize_cell(None) == ""
+    assert normalize_cell(datetime(2024, 3, 1, 12, 30)) == "2024-03-01"
+    assert normalize_cell("  a \t b  ") == "a b"
+    assert normalize_cell(7) == "7"
+
+
+def test_unchanged_result_carries_the_latest_row():
+    result = unchanged_result(tuple(STORED))
+    assert result == {"changed": False, "actuaciones": STORED}
@@ -0,0 +1,142 @@
+"""
+Shared job queue: claims, leases renewed by the heartbeat, expired leases
+reassigned (and failed after QUEUE_MAX_ATTEMPTS), results and release
+"""
+
+import os
+import pytest
+import job_queue
+from job_queue import JobQueue, node_file_path, PENDING, LEASED, DONE, FAILED
+
+LEASE = 10
+
+
+@pytest.fixture(autouse=True)
+def queue_clock(monkeypatch, clock):
+    """
+    The job queue runs on the fake clock, with short leases
+    """
+    monkeypatch.setattr(job_queue, "time", clock)
+    monkeypatch.setattr(job_queue, "QUEUE_LEASE_SECONDS", LEASE)
+    monkeypatch.setattr(job_queue, "QUEUE_MAX_ATTEMPTS", 2)
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "job_queue.sqlite3")
+
+
+@pytest.fixture
+def nodes(queue_path, clock):
+    """
+    Two nodes sharing one queue file seeded with five numbers
+    """
+    a = JobQueue(queue_path, node="a")
+    b = JobQueue(queue_path, node="b")
+    a.seed(["1", "2", "3", "4", "5"])
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_seed_adds_each_number_once(queue_path):
+    queue = JobQueue(queue_path, node="coordinator")
+    try:
+        assert queue.seed(["1", "2-", "3"]) == 3
+        assert queue.seed(["2", "3", "4"]) == 1
+        assert queue.counts() == {PENDING: 4}
+    finally:
+        queue.close()
+
+
+def test_claims_follow_input_order_and_never_overlap(nodes):
+    a, b = nodes
+    assert a.claim(limit=2) == ["1", "2"]
+    assert b.claim(limit=2) == ["3", "4"]
+    assert a.claim(limit=2) == ["5"]
+    assert b.claim(limit=2) == []
+    assert a.counts() == {LEASED: 5}
+
+
+def test_heartbeat_keeps_the_lease(nodes, clock):
+    a, b = nodes
+    a.claim(limit=5)
+    for _ in range(3):
+        clock(LEASE * 0.8)
+        a.heartbeat()
+        assert b.claim() == []
+    assert a.live_nodes() == ["a"]
+
+
+def test_expired_lease_is_reassigned(nodes, clock):
+    a, b = nodes
+    a.claim(limit=1)
+    b.claim(limit=4)
+    b.heartbeat()
+    clock(LEASE + 1)
+    b.heartbeat()
+    # a stopped renewing: its number goes to b, counted as a second attempt
+    assert b.claim() == ["1"]
+    assert a.live_nodes() == ["b"]
+    assert b.has_work_elsewhere() is False
+
+
+def test_lease_expired_too_often_fails_the_number(nodes, clock):
+    a, b = nodes
+    a.claim(limit=5)
+    clock(LEASE + 1)
+    # Pending numbers would come first; every number is leased here
+    assert b.claim(limit=5) == ["1", "2", "3", "4", "5"]
+    clock(LEASE + 1)
+    assert a.claim(limit=5) == []
+    failures = list(a.iter_failures())
+    assert [number for number, _ in failures] == ["1", "2", "3", "4", "5"]
+    assert failures[0][1]["kind"] == "lease_expired"
+    assert a.has_work_elsewhere() is False
+
+
+def test_first_result_wins(nodes, clock):
+    a, b = nodes
+    a.claim(limit=5)
+    clock(LEASE + 1)
+    assert b.claim(limit=1) == ["1"]
+    b.complete("1", {"despacho": "from b"})
+    a.complete("1", {"despacho": "from a"})
+    a.fail("1", {"kind": "timeout"})
+    assert list(a.iter_results()) == [("1", {"despacho": "from b"})]
+    assert a.counts()[DONE] == 1
+
+
+def test_results_and_failures_in_input_order(nodes):
+    a, _ = nodes
+    a.claim(limit=5)
+    a.complete("3", {"despacho": "x"})
+    a.complete("1", None)
+    a.fail("2", {"kind": "not_found", "stage": "search"})
+    assert list(a.iter_results()) == [("1", None), ("3", {"despacho": "x"})]
+    assert list(a.iter_failures()) == [("2", {"kind": "not_found", "stage": "search"})]
+    assert a.counts() == {LEASED: 2, DONE: 2, FAILED: 1}
+
+
+def test_release_gives_the_numbers_back(nodes):
+    a, b = nodes
+    a.claim(limit=2)
+    assert a.release() == 2
+    # Pending again, so other nodes take them without waiting for the lease
+    assert b.claim(limit=2) == ["1", "2"]
+    assert a.has_work_elsewhere() is True
+
+
+def test_iter_claimed_numbers_drains_the_queue(nodes):
+    a, _ = nodes
+    claimed = []
+    for number in a.iter_claimed_numbers():
+        claimed.append(number)
+        a.complete(number, None)
+    assert claimed == ["1", "2", "3", "4", "5"]
+    assert a.counts() == {DONE: 5}
+
+
+def test_node_file_path():
+    assert node_file_path(os.path.join("runs", "run_journal.jsonl"), "host/1 a") == \
+        os.path.join("runs", "run_journal.host_1_a.jsonl")
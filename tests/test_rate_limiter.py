@@ -0,0 +1,173 @@
+"""
+AdaptiveLimiter: additive increase after healthy windows, multiplicative
+decrease on congestion, errors and sustained latency increases, and the error
+classification
+"""
+
+import time
+import pytest
+from api_client import ApiError
+from failures import StageFailure, TIMEOUT, NOT_FOUND, PARSE_FAILURE, SITE_ERROR
+from rate_limiter import AdaptiveLimiter, is_congestion_error, error_outcome, OK, NEUTRAL, ERROR, CONGESTED
+
+
+def make_limiter(**overrides):
+    settings = {
+        "initial_rate": 4.0,
+        "min_rate": 1.0,
+        "max_rate": 10.0,
+        "rate_step": 0.5,
+        "burst": 100,
+        "initial_concurrency": 4,
+        "max_concurrency": 6,
+        "latency_factor": 2.5,
+        "latency_percentile": 0.8,
+        "latency_samples": 10,
+        "latency_floor": 0.5,
+        "error_rate": 0.2,
+        "window": 10
+    }
+    settings.update(overrides)
+    return AdaptiveLimiter(**settings)
+
+
+def finish(limiter, outcome, latency=0.1):
+    """
+    Take a slot and release it with the given outcome and latency (large
+    enough that timer noise never looks like a latency spike)
+    """
+    limiter.acquire()
+    limiter.release(time.monotonic() - latency, outcome)
+
+
+def test_additive_increase_after_a_window_of_healthy_requests():
+    limiter = make_limiter()
+    for _ in range(3):
+        finish(limiter, OK)
+    assert (limiter.rate, limiter.limit) == (4.0, 4)
+    finish(limiter, OK)
+    assert (limiter.rate, limiter.limit) == (4.5, 5)
+
+
+def test_increase_stops_at_the_maximums():
+    limiter = make_limiter(initial_rate=9.8, initial_concurrency=1, max_concurrency=2)
+    for _ in range(10):
+        finish(limiter, OK)
+    assert (limiter.rate, limiter.limit) == (10.0, 2)
+
+
+def test_congestion_halves_rate_and_limit_once_per_window():
+    limiter = make_limiter()
+    finish(limiter, CONGESTED)
+    assert (limiter.rate, limiter.limit) == (2.0, 2)
+    # Further failures of the same overload do not halve again right away
+    finish(limiter, CONGESTED)
+    assert (limiter.rate, limiter.limit) == (2.0, 2)
+
+
+def test_back_off_keeps_the_minimums():
+    limiter = make_limiter(initial_rate=1.5, initial_concurrency=1)
+    finish(limiter, CONGESTED)
+    assert (limiter.rate, limiter.limit) == (1.0, 1)
+
+
+def test_error_rate_above_threshold_backs_off():
+    limiter = make_limiter()
+    for _ in range(4):
+        finish(limiter, ERROR)
+    # Not enough samples yet to trust the error rate
+    assert (limiter.rate, limiter.limit) == (4.0, 4)
+    finish(limiter, ERROR)
+    assert (limiter.rate, limiter.limit) == (2.0, 2)
+
+
+def finish_batch(limiter, latencies):
+    """
+    Finish one healthy request per latency and return the rate and limit
+    before the last one, when the batch is judged
+    """
+    for latency in latencies[:-1]:
+        finish(limiter, OK, latency)
+    before = (limiter.rate, limiter.limit)
+    finish(limiter, OK, latencies[-1])
+    return before
+
+
+def fast_limiter():
+    # A rate high enough that batches of requests do not wait for tokens
+    return make_limiter(initial_rate=400.0, max_rate=1000.0)
+
+
+def test_single_latency_spike_does_not_back_off():
+    limiter = fast_limiter()
+    finish_batch(limiter, [0.1] * 10)
+    rate, limit = finish_batch(limiter, [0.1] * 9 + [2.0])
+    assert limiter.rate >= rate and limiter.limit >= limit
+
+
+def test_sustained_latency_increase_backs_off():
+    limiter = fast_limiter()
+    finish_batch(limiter, [0.1] * 10)
+    # 9 of 10 requests over the factor and the floor
+    rate, limit = finish_batch(limiter, [0.1] + [1.0] * 9)
+    assert (limiter.rate, limiter.limit) == (rate / 2, limit // 2)
+
+
+def test_slower_requests_under_the_floor_do_not_back_off():
+    limiter = fast_limiter()
+    finish_batch(limiter, [0.05] * 10)
+    # 8 times the baseline, but still faster than the 0.5 s floor
+    rate, limit = finish_batch(limiter, [0.4] * 10)
+    assert limiter.rate >= rate and limiter.limit >= limit
+
+
+def test_request_classifies_and_reraises_errors():
+    limiter = make_limiter()
+    with pytest.raises(ApiError):
+        with limiter.request():
+            raise ApiError("overloaded", status=503)
+    assert (limiter.rate, limiter.limit) == (2.0, 2)
+    assert limiter._in_flight == 0
+
+
+def test_numbers_not_found_do_not_back_off():
+    limiter = fast_limiter()
+    for _ in range(10):
+        with pytest.raises(StageFailure):
+            with limiter.request():
+                raise StageFailure(NOT_FOUND, "search", "no process")
+    assert (limiter.rate, limiter.limit) == (400.0, 4)
+    # They still count as answered requests for the error rate
+    for _ in range(2):
+        finish(limiter, ERROR)
+    assert (limiter.rate, limiter.limit) == (400.0, 4)
+    for _ in range(2):
+        finish(limiter, ERROR)
+    assert (limiter.rate, limiter.limit) == (200.0, 2)
+
+
+@pytest.mark.parametrize("error, congested", [
+    (ApiError("HTTP 429", status=429), True),
+    (ApiError("HTTP 503", status=503), True),
+    (ApiError("HTTP 404", status=404), False),
+    (TimeoutError(), True),
+    (StageFailure(TIMEOUT, "search", "timed out"), True),
+    (StageFailure(NOT_FOUND, "search", "no process"), False),
+    (ValueError("bad value"), False)
+])
+def test_is_congestion_error(error, congested):
+    assert is_congestion_error(error) is congested
+
+
+@pytest.mark.parametrize("error, outcome", [
+    (ApiError("HTTP 503", status=503), CONGESTED),
+    (StageFailure(TIMEOUT, "search", "timed out"), CONGESTED),
+    (ApiError("HTTP 404", status=404), NEUTRAL),
+    (StageFailure(NOT_FOUND, "search", "no process"), NEUTRAL),
+    (StageFailure(PARSE_FAILURE, "actuaciones", "no rows"), NEUTRAL),
+    (StageFailure(SITE_ERROR, "page_load", "blank page"), ERROR),
+    (ApiError("HTTP 400", status=400), ERROR),
+    (ConnectionError("reset"), ERROR)
+])
+def test_error_outcome(error, outcome):
+    assert error_outcome(error) == outcome
@@ -0,0 +1,133 @@
+"""
+Lookup scheduling: value of a lookup, ordering by value, fetch statistics
+and the --max-minutes time budget
+"""
+
+import pytest
+import scheduler
+from scheduler import FetchStats, TimeBudget, lookup_value, order_by_value
+
+HOUR = 3600
+NOW = 1_000_000.0
+ROW = ["2024-03-01", "Auto admite demanda", "", "", "", "2024-03-01"]
+NEW_ROW = ["2024-04-10", "Fijacion estado", "", "", "", "2024-04-10"]
+
+
+@pytest.fixture
+def fetch_stats(tmp_path):
+    stats = FetchStats(str(tmp_path / "fetch_stats.sqlite3"))
+    yield stats
+    stats.close()
+
+
+@pytest.fixture(autouse=True)
+def scheduler_clock(monkeypatch, clock):
+    """
+    The scheduler runs on the fake clock
+    """
+    monkeypatch.setattr(scheduler, "time", clock)
+
+
+# ----------------------------------------------------------------------------
+# Value and ordering
+# ----------------------------------------------------------------------------
+
+def test_staler_numbers_are_worth_more():
+    fresh = lookup_value(0, (NOW - 1 * HOUR, 4, 1), NOW)
+    stale = lookup_value(0, (NOW - 48 * HOUR, 4, 1), NOW)
+    assert stale > fresh > 0
+
+
+def test_numbers_that_change_often_are_worth_more():
+    steady = lookup_value(0, (NOW - 24 * HOUR, 10, 0), NOW)
+    changing = lookup_value(0, (NOW - 24 * HOUR, 10, 8), NOW)
+    assert changing > steady > 0
+
+
+def test_priority_raises_the_value():
+    stats = (NOW - 24 * HOUR, 4, 1)
+    assert lookup_value(2, stats, NOW) > lookup_value(0, stats, NOW)
+
+
+def test_never_fetched_numbers_come_before_recent_ones():
+    assert lookup_value(0, None, NOW) > lookup_value(0, (NOW - 24 * HOUR, 10, 10), NOW)
+
+
+def test_just_fetched_number_is_worth_nothing():
+    assert lookup_value(5, (NOW, 3, 3), NOW) == 0
+
+
+def test_order_by_value(fetch_stats, clock):
+    for number in ["1", "2", "3"]:
+        fetch_stats.record(number, ROW)
+    clock(HOUR)
+    fetch_stats.record("2", ROW)
+    clock(HOUR)
+    # 1 and 3 are equally stale and keep their input order; 4 was never
+    # fetched; 2 is the freshest, unless it has a priority
+    assert order_by_value(["1", "2", "3", "4"], fetch_stats) == ["4", "1", "3", "2"]
+    assert order_by_value(["1", "2", "3", "4"], fetch_stats, {"2": 100}) == ["4", "2", "1", "3"]
+
+
+# ----------------------------------------------------------------------------
+# Fetch statistics
+# ----------------------------------------------------------------------------
+
+def test_fetch_stats_count_changes_from_the_fingerprint(fetch_stats, clock):
+    fetch_stats.record("11001-31", ROW)
+    clock(HOUR)
+    fetch_stats.record("1100131", ROW)
+    fetch_stats.record("1100131", NEW_ROW)
+    assert fetch_stats.get_all() == {"1100131": (clock.now, 3, 1)}
+
+
+def test_fetch_stats_use_the_incremental_answer_when_known(fetch_stats):
+    fetch_stats.record("1", ROW, changed=True)
+    fetch_stats.record("1", NEW_ROW, changed=False)
+    assert fetch_stats.get_all()["1"][1:] == (2, 1)
+
+
+def test_fetch_stats_keep_the_fingerprint_of_an_empty_lookup(fetch_stats):
+    fetch_stats.record("1", ROW)
+    fetch_stats.record("1", [])
+    fetch_stats.record("1", ROW)
+    assert fetch_stats.get_all()["1"][1:] == (3, 0)
+
+
+# ----------------------------------------------------------------------------
+# Time budget
+# ----------------------------------------------------------------------------
+
+def test_budget_queues_until_the_throughput_says_stop(clock):
+    budget = TimeBudget(minutes=1)
+    for _ in range(4):
+        assert budget.try_queue()
+    # 2 lookups finish in 20 s: 0.1 lookups/s, so 3 pending need 30 s of the 40 s left
+    clock(20)
+    budget.lookup_finished()
+    budget.lookup_finished()
+    assert budget.try_queue()
+    # 2 lookups in 21 s: 4 pending would need 42 s of the 39 s left
+    clock(1)
+    assert not budget.try_queue()
+    assert budget.deferred == 1
+
+
+def test_budget_defers_everything_after_the_first_deferral(clock):
+    budget = TimeBudget(minutes=1)
+    assert budget.try_queue()
+    clock(50)
+    budget.lookup_finished()
+    assert not budget.try_queue()
+    # Lookups finishing later do not let a less valuable number overtake
+    for _ in range(3):
+        budget.lookup_finished()
+        assert not budget.try_queue()
+    assert (budget.queued, budget.deferred) == (1, 4)
+
+
+def test_budget_stops_at_the_deadline(clock):
+    budget = TimeBudget(minutes=0.5)
+    assert budget.try_queue()
+    clock(31)
+    assert not budget.try_queue()
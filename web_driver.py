@@ -2,24 +2,248 @@
 Web driver initialization and URL access
 """
 
-from selenium import webdriver
-import time
-from config import URL, logger
+import json
+import os
+import threading
+from config import (
+    URL,
+    logger,
+    DRIVER_PATHS_FILE,
+    CHROME_HEADLESS,
+    CHROME_PAGE_LOAD_STRATEGY,
+    CHROME_WINDOW_SIZE,
+    CHROME_DISABLE_IMAGES,
+    CHROME_DISABLE_FONTS,
+    CHROME_DISABLE_MEDIA,
+    CHROME_BLOCKED_URLS,
+    CHROME_EXTRA_ARGUMENTS,
+    EXTRACTION_MODE
+)
+from stage_timing import timed
 
+# Selenium is imported inside the functions that use it: it is the slowest
+# import of the program and runs with the HTTP engine don't need it at all
 
+
+# ============================================================================
+# CHROME PROFILE - Headless, eager page loads, no heavy or third-party resources
+# ============================================================================
+
+# URL patterns of the resource types that can be disabled in config.py
+FONT_URL_PATTERNS = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+MEDIA_URL_PATTERNS = ["*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m4a"]
+IMAGE_URL_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico"]
+
+
+def build_chrome_options():
+    """
+    Build the Chrome options of the performance profile configured in config.py
+    """
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.page_load_strategy = CHROME_PAGE_LOAD_STRATEGY
+    if CHROME_HEADLESS:
+        options.add_argument("--headless=new")
+    options.add_argument(f"--window-size={CHROME_WINDOW_SIZE}")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-background-networking")
+    options.add_argument("--disable-sync")
+    options.add_argument("--no-first-run")
+    options.add_argument("--mute-audio")
+
+    prefs = {}
+    if CHROME_DISABLE_IMAGES:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        prefs["profile.managed_default_content_settings.images"] = 2
+    if CHROME_DISABLE_MEDIA:
+        options.add_argument("--autoplay-policy=user-gesture-required")
+    if prefs:
+        options.add_experimental_option("prefs", prefs)
+
+    if EXTRACTION_MODE == "network":
+        # Network events go to the performance log, read by network_capture
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+    for argument in CHROME_EXTRA_ARGUMENTS:
+        options.add_argument(argument)
+    return options
+
+
+def get_blocked_url_patterns():
+    """
+    URL patterns blocked at the network level: configured third-party hosts
+    plus the disabled resource types
+    """
+    patterns = list(CHROME_BLOCKED_URLS)
+    if CHROME_DISABLE_FONTS:
+        patterns += FONT_URL_PATTERNS
+    if CHROME_DISABLE_MEDIA:
+        patterns += MEDIA_URL_PATTERNS
+    if CHROME_DISABLE_IMAGES:
+        patterns += IMAGE_URL_PATTERNS
+    return patterns
+
+
+# Counts the page's in-flight XHR/fetch requests in window.__nrPending (read
+# by web_scraper.wait_for_page_idle). Installed on every new document before
+# the page's own scripts run, so requests started by the first click count too.
+REQUEST_COUNTER_SCRIPT = """
+if (!window.__nrPending) {
+    window.__nrPending = {count: 0};
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        window.__nrPending.count++;
+        this.addEventListener('loadend', function () { window.__nrPending.count--; });
+        return originalSend.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            window.__nrPending.count++;
+            return originalFetch.apply(this, arguments).finally(function () { window.__nrPending.count--; });
+        };
+    }
+}
+"""
+
+
+def install_request_counter(driver):
+    """
+    Register REQUEST_COUNTER_SCRIPT for every document the driver loads
+    (reloads and back navigations included). Must run before the first
+    page load. Returns True on success.
+    """
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": REQUEST_COUNTER_SCRIPT})
+        return True
+    except Exception as e:
+        # wait_for_search_form still installs it on each form before any click
+        logger.warning(f"Could not register the request counter: {str(e)}")
+        return False
+
+
+def apply_resource_blocking(driver):
+    """
+    Block the unneeded URLs through the DevTools Network domain.
+    Must run before the first page load. Returns True on success.
+    """
+    patterns = get_blocked_url_patterns()
+    if not patterns and EXTRACTION_MODE != "network":
+        return True
+    try:
+        # Also needed to read response bodies in network extraction mode
+        driver.execute_cdp_cmd("Network.enable", {})
+        if patterns:
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        logger.debug(f"Blocking {len(patterns)} URL pattern(s)")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not enable resource blocking: {str(e)}")
+        return False
+
+
+# ============================================================================
+# DRIVER RESOLUTION - Find chromedriver and Chrome once, reuse across runs
+# ============================================================================
+
+# chromedriver/Chrome paths used by this process (resolved at most once)
+_driver_paths = None
+_driver_paths_lock = threading.Lock()
+
+
+def load_cached_driver_paths():
+    """
+    Return the paths saved by an earlier run, or None if there are none or
+    the files they point to are gone
+    """
+    try:
+        with open(DRIVER_PATHS_FILE, encoding="utf-8") as f:
+            paths = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.isfile(paths.get("driver_path") or ""):
+        return None
+    if paths.get("browser_path") and not os.path.isfile(paths["browser_path"]):
+        return None
+    return paths
+
+
+def resolve_driver_paths(options, refresh=False):
+    """
+    Return ({'driver_path', 'browser_path'}, reused). Selenium Manager (a
+    subprocess that may download chromedriver) only runs when neither this
+    process nor an earlier run (DRIVER_PATHS_FILE) has resolved the paths, or
+    when refresh is True. reused is True when the paths were not resolved by
+    this call.
+    """
+    global _driver_paths
+    with _driver_paths_lock:
+        if refresh:
+            _driver_paths = None
+        elif _driver_paths is None:
+            _driver_paths = load_cached_driver_paths()
+        if _driver_paths is not None:
+            return _driver_paths, True
+
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.common.driver_finder import DriverFinder
+
+        finder = DriverFinder(Service(), options)
+        _driver_paths = {"driver_path": finder.get_driver_path(), "browser_path": finder.get_browser_path()}
+        logger.info(f"Resolved chromedriver: {_driver_paths['driver_path']}")
+        try:
+            with open(DRIVER_PATHS_FILE, "w", encoding="utf-8") as f:
+                json.dump(_driver_paths, f)
+        except OSError as e:
+            logger.warning(f"Could not save the driver paths: {str(e)}")
+        return _driver_paths, False
+
+
+def start_chrome(options):
+    """
+    Start Chrome with the resolved chromedriver/Chrome paths. If saved paths
+    no longer work (e.g. Chrome updated itself), they are resolved again once.
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    try:
+        paths, reused = resolve_driver_paths(options)
+    except Exception as e:
+        # Let Selenium resolve the driver itself
+        logger.warning(f"Could not resolve the driver paths: {str(e)}")
+        return webdriver.Chrome(options=options)
+
+    for attempt in range(2):
+        if paths.get("browser_path"):
+            options.binary_location = paths["browser_path"]
+        try:
+            return webdriver.Chrome(options=options, service=Service(executable_path=paths["driver_path"]))
+        except Exception as e:
+            if not reused or attempt:
+                raise
+            logger.warning(f"Saved driver paths did not work ({str(e).strip().splitlines()[0]}), resolving again")
+            paths, reused = resolve_driver_paths(options, refresh=True)
+
+
+@timed("page_load")
 def access_url():
     """
     Access the URL and return the driver if successful
     """
     try:
-        # Initialize the Chrome driver
-        driver = webdriver.Chrome()
+        # Initialize the Chrome driver with the lean profile
+        driver = start_chrome(build_chrome_options())
+        apply_resource_blocking(driver)
+        install_request_counter(driver)
 
         logger.info(f"Attempting to access: {URL}")
         driver.get(URL)
 
-        # Wait a moment for the page to load
-        time.sleep(2)
+        # Wait for the search form to render instead of a fixed pause
+        wait_for_search_form(driver)
 
         # Check if page loaded successfully
         if driver.title:
@@ -34,3 +258,108 @@ def access_url():
     except Exception as e:
         logger.error(f"Error accessing URL: {str(e)}", exc_info=True)
         return None
+
+
+# ============================================================================
+# SESSION REUSE - Keep one browser alive across searches
+# ============================================================================
+
+def is_session_alive(driver):
+    """
+    Check whether the browser session still responds to commands
+    """
+    from selenium.common.exceptions import WebDriverException
+
+    if driver is None:
+        return False
+    try:
+        # Any round trip fails fast if Chrome crashed or the session was closed
+        _ = driver.current_url
+        return True
+    except WebDriverException:
+        return False
+    except Exception:
+        return False
+
+
+def wait_for_search_form(driver, timeout=10):
+    """
+    Wait until the search form (radio buttons and text input) is visible and
+    make sure the request counter is installed before anything is clicked.
+    Returns True if the form is ready, False on timeout.
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.visibility_of_element_located((By.CSS_SELECTOR, "input[type='radio']"))
+        )
+        WebDriverWait(driver, timeout).until(
+            EC.visibility_of_element_located((By.CSS_SELECTOR, "input[type='text']"))
+        )
+        # No-op when the new-document script already installed it
+        driver.execute_script(REQUEST_COUNTER_SCRIPT)
+        return True
+    except Exception:
+        return False
+
+
+@timed("return_to_form")
+def return_to_search_form(driver):
+    """
+    Bring an already open session back to the search form inside the SPA
+    without reloading the page. Tries the in-app buttons first, then the
+    browser history, and only reloads the URL as a last resort.
+    Returns True if the search form is ready, False otherwise.
+    """
+    from selenium.webdriver.common.by import By
+
+    try:
+        # Strategy 1: In-app navigation buttons shown on the process detail view
+        for label in ("Regresar", "Nueva consulta", "Volver"):
+            try:
+                buttons = driver.find_elements(By.XPATH, f"//button[.//span[contains(text(), '{label}')]]")
+                visible = [button for button in buttons if button.is_displayed()]
+                if not visible:
+                    continue
+                driver.execute_script("arguments[0].click();", visible[0])
+                if wait_for_search_form(driver, timeout=5):
+                    logger.info(f"Returned to search form (Strategy 1 - '{label}' button)")
+                    return True
+            except Exception:
+                continue
+
+        # Strategy 2: Navigate back through the SPA history
+        for _ in range(2):
+            driver.back()
+            if wait_for_search_form(driver, timeout=5):
+                logger.info(f"Returned to search form (Strategy 2 - browser back)")
+                return True
+
+        # Strategy 3: Reload the search page in the same browser
+        logger.info(f"Reloading search page in the existing browser session")
+        driver.get(URL)
+        if wait_for_search_form(driver, timeout=10):
+            logger.info(f"Returned to search form (Strategy 3 - page reload)")
+            return True
+
+        logger.error("Could not return to the search form")
+        return False
+
+    except Exception as e:
+        logger.error(f"Error returning to search form: {str(e)}", exc_info=True)
+        return False
+
+
+def quit_driver(driver):
+    """
+    Close the browser, ignoring errors from sessions that already died
+    """
+    if driver is None:
+        return
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.debug(f"Error closing browser: {str(e)}")
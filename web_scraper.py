@@ -2,18 +2,101 @@
 Web scraping functions: clicking buttons, entering data, extracting information
 """
 
+import re
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
-import re
-from config import logger
+from config import logger, WAIT_TIMEOUT_SECONDS, LOADING_OVERLAY_SELECTOR, EXTRACTION_MODE
+from incremental import is_unchanged, unchanged_result
+from stage_timing import timed
+from failures import run_stage, StageFailure, TIMEOUT, NOT_FOUND
+from network_capture import NetworkCapture
+from web_driver import REQUEST_COUNTER_SCRIPT
+from api_client import actuacion_to_row, build_result
+from actuaciones_history import collect_history
+
+
+# ============================================================================
+# WAIT HELPERS - Move on as soon as the page is ready instead of sleeping
+# ============================================================================
+
+# Reports whether the page is idle: document loaded, no pending requests
+# (counted by web_driver.REQUEST_COUNTER_SCRIPT, installed with every page
+# before the first click; installed here only as a fallback) and no visible
+# loading overlay
+PAGE_IDLE_SCRIPT = REQUEST_COUNTER_SCRIPT + """
+var overlays = document.querySelectorAll(arguments[0]);
+for (var i = 0; i < overlays.length; i++) {
+    var style = window.getComputedStyle(overlays[i]);
+    if (overlays[i].getClientRects().length > 0 && style.visibility !== 'hidden' && style.display !== 'none') {
+        return false;
+    }
+}
+return document.readyState === 'complete' && window.__nrPending.count <= 0;
+"""
+
+# Resolves as soon as a table cell holds non-empty, non-timestamp text,
+# re-checking on every DOM mutation instead of polling; resolves false on timeout
+ACTUACIONES_READY_SCRIPT = """
+var timeoutMs = arguments[0];
+var done = arguments[arguments.length - 1];
+var timestampRe = /\\d{4}-\\d{2}-\\d{2}|\\d{1,2}\\s+[A-Za-z]{3,}\\s+\\d{4}|\\d{4}-\\d{2}-\\d{2}\\s+\\d{2}:\\d{2}/;
+function isReady() {
+    var rows = document.querySelectorAll('table tr');
+    for (var r = 0; r < rows.length; r++) {
+        var cells = rows[r].querySelectorAll('td');
+        if (!cells.length) { cells = rows[r].querySelectorAll('th'); }
+        for (var c = 0; c < cells.length; c++) {
+            var text = (cells[c].innerText || '').trim();
+            if (text && !timestampRe.test(text)) { return true; }
+        }
+    }
+    return false;
+}
+if (isReady()) { done(true); return; }
+var observer = new MutationObserver(function () {
+    if (isReady()) { observer.disconnect(); clearTimeout(timer); done(true); }
+});
+observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+var timer = setTimeout(function () { observer.disconnect(); done(isReady()); }, timeoutMs);
+"""
+
+
+def wait_for_page_idle(driver, timeout=WAIT_TIMEOUT_SECONDS):
+    """
+    Wait until the page has no pending network requests and no visible
+    loading overlay. Returns True if idle, False on timeout.
+    """
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script(PAGE_IDLE_SCRIPT, LOADING_OVERLAY_SELECTOR)
+        )
+        return True
+    except Exception:
+        logger.warning(f"Page did not become idle within {timeout}s")
+        return False
+
+
+def wait_for_tab_selected(driver, tab, timeout=WAIT_TIMEOUT_SECONDS):
+    """
+    Wait until the clicked tab is marked as selected and its content has loaded.
+    Returns True if ready, False on timeout.
+    """
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: tab.get_attribute("aria-selected") == "true"
+            or "active" in (tab.get_attribute("class") or "")
+        )
+    except Exception:
+        logger.warning(f"Tab was not marked as selected within {timeout}s")
+    return wait_for_page_idle(driver, timeout)
 
 
 # ============================================================================
 # WEB INTERACTION - Page navigation and form filling
 # ============================================================================
 
+@timed("select_option")
 def select_second_radio_button(driver):
     """
     Select the 2nd radio button on the page
@@ -34,8 +117,8 @@ def select_second_radio_button(driver):
         # Use JavaScript to click the 2nd radio button to bypass click interception
         second_radio = radio_buttons[1]
         driver.execute_script("arguments[0].click();", second_radio)
+        WebDriverWait(driver, 5, poll_frequency=0.1).until(EC.element_to_be_selected(second_radio))
         logger.info(f"Successfully selected 2nd radio button")
-        time.sleep(1)
         return True
 
     except Exception as e:
@@ -43,6 +126,7 @@ def select_second_radio_button(driver):
         return False
 
 
+@timed("enter_number")
 def enter_search_number(driver, search_number):
     """
     Enter the search number into the text field
@@ -66,8 +150,11 @@ def enter_search_number(driver, search_number):
         # Clear any existing value and enter the search number
         search_field.clear()
         search_field.send_keys(search_number)
+        # Wait until the field holds the typed value (input masks may reformat it)
+        WebDriverWait(driver, 5, poll_frequency=0.1).until(
+            lambda d: (search_field.get_attribute("value") or "").strip() != ""
+        )
         logger.info(f"Successfully entered search number: {search_number}")
-        time.sleep(1)
         return True
 
     except Exception as e:
@@ -75,6 +162,7 @@ def enter_search_number(driver, search_number):
         return False
 
 
+@timed("consultar")
 def click_consultar_button(driver):
     """
     Click the CONSULTAR button - tries multiple strategies to find it
@@ -88,7 +176,8 @@ def click_consultar_button(driver):
             consultar_button = driver.find_element(By.XPATH, "//button[contains(@aria-label, 'Consultar')]")
             driver.execute_script("arguments[0].click();", consultar_button)
             logger.info(f"Successfully clicked CONSULTAR button (Strategy 1 - aria-label)")
-            time.sleep(2)
+            # Wait for the search request to finish
+            wait_for_page_idle(driver)
             return True
         except:
             pass
@@ -101,7 +190,8 @@ def click_consultar_button(driver):
             consultar_button = driver.find_element(By.XPATH, "//button//span[contains(text(), 'Consultar')]/..")
             driver.execute_script("arguments[0].click();", consultar_button)
             logger.info(f"Successfully clicked CONSULTAR button (Strategy 2 - span text)")
-            time.sleep(2)
+            # Wait for the search request to finish
+            wait_for_page_idle(driver)
             return True
         except:
             pass
@@ -116,7 +206,8 @@ def click_consultar_button(driver):
                                                    "//button[contains(@class, 'success')]//span[contains(text(), 'Consultar')]/../..")
             driver.execute_script("arguments[0].click();", consultar_button)
             logger.info(f"Successfully clicked CONSULTAR button (Strategy 3 - success class)")
-            time.sleep(2)
+            # Wait for the search request to finish
+            wait_for_page_idle(driver)
             return True
         except:
             pass
@@ -129,35 +220,51 @@ def click_consultar_button(driver):
         return False
 
 
+@timed("volver")
 def click_volver_button(driver):
     """
     Click the VOLVER button if it appears (in dialog)
-    This button may not always appear, so we use a shorter timeout
+    This button may not always appear, so we only wait until either the
+    dialog or the results table shows up
     """
+    span_xpath = "//button//span[contains(text(), 'Volver')]"
+    aria_xpath = "//button[contains(@aria-label, 'Volver')]"
     try:
-        # Strategy 1: Find button by span text "Volver" inside button
+        # Wait for whichever comes first: the dialog or the results table
         try:
-            WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.XPATH, "//button//span[contains(text(), 'Volver')]"))
+            WebDriverWait(driver, 3, poll_frequency=0.1).until(
+                EC.any_of(
+                    EC.element_to_be_clickable((By.XPATH, span_xpath)),
+                    EC.element_to_be_clickable((By.XPATH, aria_xpath)),
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "table td button"))
+                )
             )
-            volver_button = driver.find_element(By.XPATH, "//button//span[contains(text(), 'Volver')]/..")
-            driver.execute_script("arguments[0].click();", volver_button)
-            logger.info(f"Successfully clicked VOLVER button (Strategy 1 - span text)")
-            time.sleep(1)
-            return True
+        except:
+            pass
+
+        # Strategy 1: Find button by span text "Volver" inside button
+        try:
+            volver_button = driver.find_element(By.XPATH, span_xpath + "/..")
+            if volver_button.is_displayed():
+                driver.execute_script("arguments[0].click();", volver_button)
+                logger.info(f"Successfully clicked VOLVER button (Strategy 1 - span text)")
+                # Wait for the dialog to close
+                WebDriverWait(driver, 5, poll_frequency=0.1).until(EC.invisibility_of_element(volver_button))
+                wait_for_page_idle(driver)
+                return True
         except:
             pass
 
         # Strategy 2: Find button with aria-label containing "Volver"
         try:
-            WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(@aria-label, 'Volver')]"))
-            )
-            volver_button = driver.find_element(By.XPATH, "//button[contains(@aria-label, 'Volver')]")
-            driver.execute_script("arguments[0].click();", volver_button)
-            logger.info(f"Successfully clicked VOLVER button (Strategy 2 - aria-label)")
-            time.sleep(1)
-            return True
+            volver_button = driver.find_element(By.XPATH, aria_xpath)
+            if volver_button.is_displayed():
+                driver.execute_script("arguments[0].click();", volver_button)
+                logger.info(f"Successfully clicked VOLVER button (Strategy 2 - aria-label)")
+                # Wait for the dialog to close
+                WebDriverWait(driver, 5, poll_frequency=0.1).until(EC.invisibility_of_element(volver_button))
+                wait_for_page_idle(driver)
+                return True
         except:
             pass
 
@@ -170,6 +277,7 @@ def click_volver_button(driver):
         return False
 
 
+@timed("open_process")
 def click_first_clickable_table_number(driver):
     """
     Find the table and click the first clickable number in the second column
@@ -214,7 +322,11 @@ def click_first_clickable_table_number(driver):
                     # Click the button
                     driver.execute_script("arguments[0].click();", button)
                     logger.info(f"Successfully clicked the number: {number_text}")
-                    time.sleep(2)
+                    # Wait for the process detail (tabs) to load
+                    WebDriverWait(driver, WAIT_TIMEOUT_SECONDS, poll_frequency=0.1).until(
+                        EC.presence_of_element_located((By.XPATH, "//div[@role='tab']"))
+                    )
+                    wait_for_page_idle(driver)
                     return True
 
                 except:
@@ -244,6 +356,7 @@ def click_first_clickable_table_number(driver):
 # TAB NAVIGATION
 # ============================================================================
 
+@timed("actuaciones_tab")
 def click_actuaciones_tab(driver):
     """
     Click the Actuaciones tab
@@ -260,8 +373,8 @@ def click_actuaciones_tab(driver):
         # Click the tab using JavaScript to avoid any click interception
         driver.execute_script("arguments[0].click();", actuaciones_tab)
         logger.info(f"Successfully clicked Actuaciones tab")
-        # Wait a short moment for tab content to load
-        time.sleep(1)
+        # Wait for the tab content to load
+        wait_for_tab_selected(driver, actuaciones_tab)
 
         # Wait until an actuaciones table appears to be ready (has a non-timestamp cell)
         if wait_for_actuaciones_table_ready(driver, timeout=8):
@@ -276,6 +389,33 @@ def click_actuaciones_tab(driver):
         return False
 
 
+@timed("datos_tab")
+def click_datos_proceso_tab(driver):
+    """
+    Click the Datos del Proceso tab (only needed when another tab was opened first)
+    """
+    try:
+        # Wait for the tab to be present
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_all_elements_located((By.XPATH, "//div[@role='tab']"))
+        )
+
+        # Find the Datos del Proceso tab by searching for a div with role="tab" containing "Datos del Proceso"
+        tab = driver.find_element(By.XPATH, "//div[@role='tab'][contains(text(), 'Datos del Proceso')]")
+
+        # Click the tab using JavaScript to avoid any click interception
+        driver.execute_script("arguments[0].click();", tab)
+        logger.info(f"Successfully clicked Datos del Proceso tab")
+        # Wait for the tab content to load
+        wait_for_tab_selected(driver, tab)
+        return True
+
+    except Exception as e:
+        logger.error(f"Error clicking Datos del Proceso tab: {str(e)}", exc_info=True)
+        return False
+
+
+@timed("sujetos_tab")
 def click_subjetos_procesales_tab(driver):
     """
     Click the Sujetos Procesales tab
@@ -292,7 +432,8 @@ def click_subjetos_procesales_tab(driver):
         # Click the tab using JavaScript to avoid any click interception
         driver.execute_script("arguments[0].click();", tab)
         logger.info(f"Successfully clicked Sujetos Procesales tab")
-        time.sleep(2)
+        # Wait for the tab content to load
+        wait_for_tab_selected(driver, tab)
         return True
 
     except Exception as e:
@@ -307,35 +448,18 @@ def click_subjetos_procesales_tab(driver):
 def wait_for_actuaciones_table_ready(driver, timeout=8):
     """
     Wait until at least one table row contains a non-empty, non-timestamp cell.
+    The check runs in the page and re-runs on every DOM mutation, so it
+    returns as soon as the table is filled.
     Returns True if ready, False on timeout.
     """
-    end_time = time.time() + timeout
-    timestamp_re = re.compile(r"\d{4}-\d{2}-\d{2}|\d{1,2}\s+[A-Za-z]{3,}\s+\d{4}|\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}")
     try:
-        while time.time() < end_time:
-            tables = driver.find_elements(By.TAG_NAME, "table")
-            for t in tables:
-                rows = t.find_elements(By.TAG_NAME, "tr")
-                for row in rows:
-                    cells = row.find_elements(By.TAG_NAME, "td")
-                    if not cells:
-                        cells = row.find_elements(By.TAG_NAME, "th")
-                    for cell in cells:
-                        try:
-                            text = (cell.get_attribute('innerText') or cell.text or "").strip()
-                        except:
-                            text = (cell.text or "").strip()
-                        if not text:
-                            continue
-                        # if the text doesn't look like a timestamp, consider table ready
-                        if not timestamp_re.search(text):
-                            return True
-            time.sleep(0.5)
-        return False
+        driver.set_script_timeout(timeout + 5)
+        return bool(driver.execute_async_script(ACTUACIONES_READY_SCRIPT, int(timeout * 1000)))
     except Exception:
         return False
 
 
+@timed("extract_actuaciones")
 def print_actuaciones_first_row(driver):
     """
     Find the Actuaciones table and return the first row.
@@ -347,6 +471,9 @@ def print_actuaciones_first_row(driver):
             EC.presence_of_all_elements_located((By.TAG_NAME, "table"))
         )
 
+        if EXTRACTION_MODE == "script":
+            return actuaciones_first_row_from_snapshot(snapshot_tables(driver))
+
         tables = driver.find_elements(By.TAG_NAME, "table")
         if not tables:
             logger.error("No tables found on Actuaciones tab")
@@ -449,6 +576,7 @@ def print_actuaciones_first_row(driver):
 # DATOS DE PROCESO - Extract data from Datos de Proceso tab
 # ============================================================================
 
+@timed("extract_despacho")
 def extract_despacho_value(driver):
     """
     Extract the "Despacho" value from the Datos de Proceso table
@@ -460,6 +588,14 @@ def extract_despacho_value(driver):
             EC.presence_of_all_elements_located((By.TAG_NAME, "table"))
         )
 
+        if EXTRACTION_MODE == "script":
+            tables = snapshot_tables(driver)
+            despacho_value = despacho_from_snapshot(tables)
+            if not despacho_value and tables:
+                logger.warning(f"Despacho row not found in table")
+                log_snapshot_debug(tables)
+            return despacho_value
+
         # Get all tables on the page
         tables = driver.find_elements(By.TAG_NAME, "table")
 
@@ -548,6 +684,7 @@ def print_datos_proceso_table_debug(driver):
 # SUBJETOS PROCESALES - Extract data from Subjetos Procesales tab
 # ============================================================================
 
+@timed("extract_sujetos")
 def extract_subjetos_procesales(driver):
     """
     Extract Demandante and Demandado values from the Subjetos Procesales table
@@ -559,6 +696,9 @@ def extract_subjetos_procesales(driver):
             EC.presence_of_all_elements_located((By.TAG_NAME, "table"))
         )
 
+        if EXTRACTION_MODE == "script":
+            return subjetos_procesales_from_snapshot(snapshot_tables(driver))
+
         # Get all tables on the page
         tables = driver.find_elements(By.TAG_NAME, "table")
 
@@ -610,3 +750,564 @@ def extract_subjetos_procesales(driver):
     except Exception as e:
         logger.error(f"Error extracting Subjetos Procesales data: {str(e)}", exc_info=True)
         return {"demandante": "", "demandado": ""}
+
+
+# ============================================================================
+# SCRIPT EXTRACTION - Read every table of a tab in one round trip
+# ============================================================================
+
+# Returns every table on the page as JSON. Each row lists its th and td
+# descendants; each cell carries its innerText and the innerText of its
+# first nested button/span/a (null when there is none). tbody_rows holds
+# the indexes of the rows inside the table's first tbody (null if none).
+TABLE_SNAPSHOT_SCRIPT = """
+function textOf(el) { return el.innerText || ''; }
+function cellInfo(cell) {
+    function first(tag) {
+        var el = cell.querySelector(tag);
+        return el ? textOf(el) : null;
+    }
+    return {text: textOf(cell), button: first('button'), span: first('span'), a: first('a')};
+}
+function cellsOf(row, tag) {
+    return Array.prototype.map.call(row.querySelectorAll(tag), cellInfo);
+}
+return Array.prototype.map.call(document.querySelectorAll('table'), function (table) {
+    var rows = Array.prototype.slice.call(table.querySelectorAll('tr'));
+    var tbody = table.querySelector('tbody');
+    return {
+        rows: rows.map(function (row) { return {th: cellsOf(row, 'th'), td: cellsOf(row, 'td')}; }),
+        tbody_rows: tbody ? Array.prototype.map.call(tbody.querySelectorAll('tr'), function (row) {
+            return rows.indexOf(row);
+        }) : null
+    };
+});
+"""
+
+
+def snapshot_tables(driver):
+    """
+    Read every table on the page with a single execute_script call.
+    Returns a list of {"rows": [{"th": [...], "td": [...]}], "tbody_rows": [...] or None}
+    """
+    return driver.execute_script(TABLE_SNAPSHOT_SCRIPT) or []
+
+
+def actuaciones_data_rows_from_snapshot(tables):
+    """
+    Same table selection as the DOM walk in print_actuaciones_first_row,
+    applied to a table snapshot. Returns the data rows of the chosen table
+    (header row excluded), or an empty list.
+    """
+    if not tables:
+        logger.error("No tables found on Actuaciones tab")
+        return []
+
+    # Reuse the same selection heuristics
+    chosen_table = None
+    best_col_count = 0
+    header_keywords = ["fecha", "actuaci", "despacho", "tipo", "documento", "observacion"]
+    for t in tables:
+        for row in t["rows"]:
+            cells = row["th"] or row["td"]
+            if cells:
+                header_text = " ".join([cell["text"].strip().lower() for cell in cells])
+
+                if any(k in header_text for k in header_keywords):
+                    chosen_table = t
+                    best_col_count = len(cells)
+                    break
+
+                col_count = len(cells)
+                if col_count == 6:
+                    chosen_table = t
+                    best_col_count = col_count
+                    break
+                if col_count > best_col_count:
+                    chosen_table = t
+                    best_col_count = col_count
+                break
+        if best_col_count == 6:
+            break
+
+    if chosen_table is None:
+        chosen_table = tables[0]
+
+    # Prefer rows in tbody if present (these are typically data rows)
+    has_tbody = chosen_table["tbody_rows"] is not None
+    if has_tbody:
+        rows = [chosen_table["rows"][i] for i in chosen_table["tbody_rows"] if i >= 0]
+    else:
+        rows = chosen_table["rows"]
+
+    if not rows:
+        logger.error("Actuaciones table has no rows")
+        return []
+
+    # Data rows start below the header row when there is no tbody
+    if has_tbody or len(rows) == 1:
+        return rows
+    return rows[1:]
+
+
+def snapshot_row_values(data_row):
+    """
+    The first 6 cell values of a snapshot row, with the same nested-element
+    preference as the DOM walk (padded to 6 values)
+    """
+    cells = data_row["td"] or data_row["th"]
+
+    row_values = []
+    for c in range(6):
+        if c < len(cells):
+            cell = cells[c]
+            # prefer common nested elements
+            text = cell["button"]
+            if text is None:
+                text = cell["span"]
+            if text is None:
+                text = cell["a"]
+            if text is None:
+                text = cell["text"]
+            row_values.append((text or "").strip())
+        else:
+            row_values.append("")
+    return row_values
+
+
+def actuaciones_first_row_from_snapshot(tables):
+    """
+    Same table selection and cell heuristics as the DOM walk in
+    print_actuaciones_first_row, applied to a table snapshot.
+    """
+    rows = actuaciones_data_rows_from_snapshot(tables)
+    if not rows:
+        return []
+    row_values = snapshot_row_values(rows[0])
+    logger.info(f"Actuaciones first row extracted")
+    return row_values
+
+
+def actuaciones_rows_from_snapshot(tables):
+    """
+    Every data row of the Actuaciones table in a snapshot, 6 values each
+    """
+    return [snapshot_row_values(row) for row in actuaciones_data_rows_from_snapshot(tables)]
+
+
+def despacho_from_snapshot(tables):
+    """
+    Same "Despacho:" lookup as extract_despacho_value, applied to a table snapshot.
+    Returns the despacho value, or empty string if not found
+    """
+    if not tables:
+        logger.error(f"No tables found in Datos de Proceso")
+        return ""
+
+    for table in tables:
+        for row in table["rows"]:
+            th_elements = row["th"]
+            td_elements = row["td"]
+            if not th_elements or not td_elements:
+                continue
+
+            # Check if first th is "Despacho:"
+            if th_elements[0]["text"].strip() == "Despacho:":
+                despacho_value = td_elements[0]["text"].strip()
+
+                # Skip if it's a date (YYYY-MM-DD format) or if it looks like a label (contains ":")
+                is_date = len(despacho_value) == 10 and despacho_value[4] == '-' and despacho_value[7] == '-'
+                is_label = ":" in despacho_value and len(despacho_value) < 30
+
+                if despacho_value and not is_date and not is_label:
+                    logger.info(f"Found Despacho: {despacho_value}")
+                    return despacho_value
+
+    return ""
+
+
+def subjetos_procesales_from_snapshot(tables):
+    """
+    Same Demandante/Demandado lookup as extract_subjetos_procesales, applied to a table snapshot.
+    Returns a dictionary with 'demandante' and 'demandado' keys
+    """
+    if not tables:
+        logger.error(f"No tables found in Subjetos Procesales")
+        return {"demandante": "", "demandado": ""}
+
+    demandante = ""
+    demandado = ""
+    for table in tables:
+        for row in table["rows"]:
+            cells = row["td"]
+            if len(cells) >= 2:
+                first_cell_text = cells[0]["text"].strip()
+                second_cell_text = cells[1]["text"].strip()
+
+                # Check for Demandante
+                if first_cell_text == "Demandante" and not demandante:
+                    demandante = second_cell_text
+                    logger.info(f"Found Demandante: {demandante}")
+
+                # Check for Demandado
+                if first_cell_text == "Demandado" and not demandado:
+                    demandado = second_cell_text
+                    logger.info(f"Found Demandado: {demandado}")
+
+                # If we have both, we can stop searching
+                if demandante and demandado:
+                    return {"demandante": demandante, "demandado": demandado}
+
+    logger.info(f"Demandante: {demandante if demandante else '(not found)'}")
+    logger.info(f"Demandado: {demandado if demandado else '(not found)'}")
+    return {"demandante": demandante, "demandado": demandado}
+
+
+def log_snapshot_debug(tables):
+    """
+    Debug helper: log the first rows of each table in a snapshot
+    """
+    logger.debug(f"Found {len(tables)} table(s) on Datos de Proceso tab")
+    for t_idx, table in enumerate(tables):
+        rows = table["rows"]
+        logger.debug(f"  Table {t_idx + 1}: {len(rows)} row(s)")
+        for r_idx, row in enumerate(rows[:10]):  # Log first 10 rows
+            row_data = []
+            for cell in row["th"] or row["td"]:
+                text = cell["text"].strip()
+                row_data.append(text[:50] + ("..." if len(text) > 50 else ""))  # Limit to 50 chars for readability
+            logger.debug(f"    Row {r_idx + 1}: {row_data}")
+
+
+# ============================================================================
+# ACTUACIONES HISTORY - Walk the pages of the Actuaciones table
+# ============================================================================
+
+# Pager button of the Actuaciones table
+NEXT_PAGE_XPATH = "//button[@aria-label='Página siguiente']"
+
+# Text of the first data row of the Actuaciones table ("" when empty), used
+# to tell when the next page has replaced the current one
+FIRST_ROW_TEXT_SCRIPT = """
+var row = document.querySelector('table tbody tr') || document.querySelectorAll('table tr')[1];
+return row ? row.innerText : '';
+"""
+
+
+def has_next_actuaciones_page(driver):
+    """
+    True if the Actuaciones pager has an enabled "next page" button
+    """
+    buttons = driver.find_elements(By.XPATH, NEXT_PAGE_XPATH)
+    if not buttons:
+        return False
+    button = buttons[0]
+    return not (button.get_attribute("disabled") or "disabled" in (button.get_attribute("class") or ""))
+
+
+def press_next_page_button(driver):
+    """
+    Click the "next page" button of the Actuaciones pager without waiting
+    for the new rows. Returns True if it was clicked.
+    """
+    try:
+        button = driver.find_element(By.XPATH, NEXT_PAGE_XPATH)
+        driver.execute_script("arguments[0].click();", button)
+        return True
+    except Exception as e:
+        logger.debug(f"Could not click the next page button: {str(e)}")
+        return False
+
+
+@timed("actuaciones_next_page")
+def click_next_actuaciones_page(driver):
+    """
+    Open the next page of the Actuaciones table and wait until its rows
+    have replaced the current ones. Returns True on success, False otherwise.
+    """
+    try:
+        previous_first_row = driver.execute_script(FIRST_ROW_TEXT_SCRIPT)
+        if not press_next_page_button(driver):
+            return False
+        WebDriverWait(driver, WAIT_TIMEOUT_SECONDS, poll_frequency=0.1).until(
+            lambda d: d.execute_script(FIRST_ROW_TEXT_SCRIPT) not in ("", previous_first_row)
+        )
+        return wait_for_page_idle(driver)
+    except Exception as e:
+        logger.error(f"Error opening the next Actuaciones page: {str(e)}", exc_info=True)
+        return False
+
+
+@timed("extract_actuaciones_page")
+def read_actuaciones_page(driver):
+    """
+    Every row of the Actuaciones page on screen, 6 values each. Uses the
+    table snapshot in both extraction modes: walking a whole page cell by
+    cell would cost one WebDriver call per cell.
+    """
+    return actuaciones_rows_from_snapshot(snapshot_tables(driver))
+
+
+def iter_actuaciones_table_pages(driver):
+    """
+    Yield the rows of each Actuaciones page, newest first, starting with the
+    page on screen. The next page is opened only when the caller asks for it.
+    """
+    while True:
+        # A process without actuaciones has an empty page; only a failed read is retried
+        yield run_stage("extract_actuaciones_page", read_actuaciones_page, driver, check_result=False)
+        if not has_next_actuaciones_page(driver):
+            return
+        # Not retried: a second click after a slow page change would skip a page
+        run_stage("actuaciones_next_page", click_next_actuaciones_page, driver, attempts=1)
+
+
+# ============================================================================
+# FULL LOOKUP - Run every step for one number
+# ============================================================================
+
+# True when the results table is shown but has no process that can be
+# opened (no rows, a "no results" row, or only private processes)
+NO_RESULTS_SCRIPT = """
+var table = document.querySelector('table');
+if (!table) { return false; }
+var rows = table.querySelectorAll('tr');
+for (var i = 0; i < rows.length; i++) {
+    var cells = rows[i].querySelectorAll('td');
+    if (cells.length >= 2 && cells[1].querySelector('button')) { return false; }
+}
+return true;
+"""
+
+
+def open_process_failure_kind(driver):
+    """
+    Classify a failed click on the result number: NOT_FOUND if the results
+    table has nothing to open, TIMEOUT if the table never loaded
+    """
+    try:
+        return NOT_FOUND if driver.execute_script(NO_RESULTS_SCRIPT) else TIMEOUT
+    except Exception:
+        return TIMEOUT
+
+
+def wait_for_tables(driver, timeout=10):
+    """
+    Wait for the tab's tables. Raises TimeoutException when they never
+    appear, so the extraction stage is retried; an empty table is content.
+    """
+    WebDriverWait(driver, timeout).until(EC.presence_of_all_elements_located((By.TAG_NAME, "table")))
+
+
+def read_despacho(driver):
+    """
+    Despacho value of the Datos de Proceso tab ("" when the table has none)
+    """
+    wait_for_tables(driver)
+    return extract_despacho_value(driver)
+
+
+def read_first_actuacion(driver):
+    """
+    First row of the Actuaciones table ([] when the process has none)
+    """
+    wait_for_tables(driver)
+    return print_actuaciones_first_row(driver)
+
+
+def read_actuaciones_first_row(driver):
+    """
+    Open the Actuaciones tab and return its first data row padded to 6 values
+    (columns E-J), or [] when the table has no actuacion. Raises StageFailure
+    if the tab or its table cannot be loaded.
+    """
+    run_stage("actuaciones_tab", click_actuaciones_tab, driver)
+    first_row = run_stage("extract_actuaciones", read_first_actuacion, driver, check_result=False)
+    if not first_row:
+        logger.info(f"No first row found in Actuaciones table")
+        return []
+    # Ensure exactly 6 columns (E-J)
+    row_values = first_row[:6]
+    while len(row_values) < 6:
+        row_values.append("")
+    return row_values
+
+
+def read_sujetos(driver):
+    """
+    Demandante and Demandado of the Sujetos Procesales tab (empty strings
+    for the ones the table does not list)
+    """
+    wait_for_tables(driver)
+    return extract_subjetos_procesales(driver)
+
+
+@timed("scrape")
+def scrape_number(driver, search_number, known_actuaciones=None, history=None):
+    """
+    Run the full search and extraction for one number on a driver that is
+    positioned on the search form. Nothing is written to Excel here, so the
+    result can be handed to a single writer.
+    Returns a dictionary with 'despacho', 'actuaciones' (list of 6 values),
+    'demandante' and 'demandado' keys.
+
+    Each step is retried on its own (see failures.run_stage); a step that
+    still fails raises StageFailure with its failure kind, so a number is
+    never returned half-extracted. Content that is legitimately empty (no
+    Despacho, no actuacion, no Demandante/Demandado) is returned as such,
+    like the HTTP engine does.
+
+    Incremental mode: when known_actuaciones (the stored E-J values) is given,
+    the Actuaciones tab is read first and the lookup stops there if its first
+    row is the stored one, returning {'changed': False, 'actuaciones': [...]}.
+
+    history (an actuaciones_history.HistoryStore) also stores the full
+    Actuaciones history, walking the table's pages only until a stored
+    actuacion.
+    """
+    if EXTRACTION_MODE == "network":
+        return scrape_number_from_network(driver, search_number, known_actuaciones, history)
+
+    result = {"despacho": "", "actuaciones": [], "demandante": "", "demandado": ""}
+
+    # Select the 2nd radio button
+    run_stage("select_option", select_second_radio_button, driver)
+
+    # Enter the search number
+    run_stage("enter_number", enter_search_number, driver, search_number)
+
+    # Click the CONSULTAR button
+    run_stage("consultar", click_consultar_button, driver)
+
+    # Click the VOLVER button if a dialog appears
+    run_stage("volver", click_volver_button, driver)
+
+    # Click the first clickable number in the table's second column
+    run_stage("open_process", click_first_clickable_table_number, driver,
+              failure_kind=lambda value: open_process_failure_kind(driver))
+
+    if known_actuaciones is not None:
+        # Cheapest check first: is the latest actuacion the one we already have?
+        row_values = read_actuaciones_first_row(driver)
+        if history is not None:
+            collect_history(search_number, iter_actuaciones_table_pages(driver), history)
+        if is_unchanged(row_values, known_actuaciones):
+            logger.info(f"No new actuacion for {search_number}, skipping Datos and Sujetos")
+            return unchanged_result(row_values)
+        result["actuaciones"] = row_values
+        result["changed"] = True
+
+        # Go back to Datos del Proceso for the Despacho value
+        run_stage("datos_tab", click_datos_proceso_tab, driver)
+        result["despacho"] = run_stage("extract_despacho", read_despacho, driver, check_result=False)
+    else:
+        # Extract the Despacho value from the Datos de Proceso tab (default view)
+        result["despacho"] = run_stage("extract_despacho", read_despacho, driver, check_result=False)
+
+        # Click the Actuaciones tab and get the first data row (columns E-J)
+        result["actuaciones"] = read_actuaciones_first_row(driver)
+        if history is not None:
+            collect_history(search_number, iter_actuaciones_table_pages(driver), history)
+
+    # Click the Subjetos Procesales tab and extract Demandante and Demandado
+    run_stage("sujetos_tab", click_subjetos_procesales_tab, driver)
+    sujetos_data = run_stage("extract_sujetos", read_sujetos, driver, check_result=False)
+    result["demandante"] = sujetos_data["demandante"]
+    result["demandado"] = sujetos_data["demandado"]
+
+    return result
+
+
+# ============================================================================
+# NETWORK EXTRACTION - Build the result from the JSON the page fetches
+# ============================================================================
+
+def click_tab(driver, label):
+    """
+    Click the tab whose text contains label without waiting for its content
+    to render (network mode waits for the tab's JSON response instead)
+    """
+    try:
+        tab = driver.find_element(By.XPATH, f"//div[@role='tab'][contains(text(), '{label}')]")
+        driver.execute_script("arguments[0].click();", tab)
+        return True
+    except Exception as e:
+        logger.debug(f"Could not click {label} tab: {str(e)}")
+        return False
+
+
+def capture_tab_payload(driver, capture, tab_label, kind, key):
+    """
+    Return the (kind, key) backend payload, clicking the tab that loads it
+    only if the page has not fetched it already
+    """
+    capture.drain()
+    if (kind, key) not in capture.payloads:
+        run_stage(f"{kind}_tab", click_tab, driver, tab_label)
+    return run_stage(f"{kind}_payload", capture.wait_for, kind, key)
+
+
+def iter_network_actuaciones_pages(driver, capture, id_proceso, first_page):
+    """
+    Network-mode counterpart of iter_actuaciones_table_pages: pages through
+    the table with the pager button and yields the rows of each captured
+    actuaciones payload, starting with first_page
+    """
+    payload = first_page
+    pagina = 1
+    while True:
+        yield [actuacion_to_row(a) for a in payload.get("actuaciones") or []]
+        paginas = (payload.get("paginacion") or {}).get("cantidadPaginas") or 1
+        if pagina >= paginas or not payload.get("actuaciones"):
+            return
+        pagina += 1
+        run_stage("actuaciones_next_page", press_next_page_button, driver, attempts=1)
+        payload = run_stage("actuaciones_payload", capture.wait_for, "actuaciones", (id_proceso, pagina))
+
+
+def scrape_number_from_network(driver, search_number, known_actuaciones=None, history=None):
+    """
+    Same contract as scrape_number, but the values come from the backend
+    responses the page receives (read from the DevTools performance log)
+    and are mapped like the HTTP engine does. The tables are never read and
+    nothing waits for them to render.
+    """
+    capture = NetworkCapture(driver)
+    numero = re.sub(r"\D", "", str(search_number))
+
+    run_stage("select_option", select_second_radio_button, driver)
+    run_stage("enter_number", enter_search_number, driver, search_number)
+    run_stage("consultar", click_consultar_button, driver)
+    consulta = run_stage("consulta_payload", capture.wait_for, "consulta", numero)
+
+    # Same choice as the table click: the first process that can be opened
+    public_procesos = [p for p in consulta.get("procesos") or [] if not p.get("esPrivado")]
+    if not public_procesos:
+        raise StageFailure(NOT_FOUND, "consulta_payload", "no public process")
+    proceso = public_procesos[0]
+    id_proceso = str(proceso.get("idProceso"))
+
+    run_stage("volver", click_volver_button, driver)
+    run_stage("open_process", click_first_clickable_table_number, driver,
+              failure_kind=lambda value: open_process_failure_kind(driver))
+    detalle = run_stage("detalle_payload", capture.wait_for, "detalle", id_proceso)
+
+    first_page = capture_tab_payload(driver, capture, "Actuaciones", "actuaciones", (id_proceso, 1))
+    actuaciones = first_page.get("actuaciones") or []
+    if history is not None:
+        collect_history(search_number, iter_network_actuaciones_pages(driver, capture, id_proceso, first_page),
+                        history)
+    if known_actuaciones is not None:
+        latest_row = actuacion_to_row(actuaciones[0]) if actuaciones else []
+        if is_unchanged(latest_row, known_actuaciones):
+            logger.info(f"No new actuacion for {search_number}, skipping Sujetos")
+            return unchanged_result(latest_row)
+
+    sujetos = capture_tab_payload(driver, capture, "Sujetos Procesales", "sujetos",
+                                  id_proceso).get("sujetos") or []
+
+    result = build_result(proceso, detalle, actuaciones, sujetos)
+    if known_actuaciones is not None:
+        result["changed"] = True
+    logger.info(f"Captured {search_number} from network responses - Despacho: {result['despacho']}")
+    return result
@@ -0,0 +1,225 @@
+"""
+Parallel lookup workers: each worker owns a driver (or uses the shared HTTP pool)
+and pulls numbers from a shared queue
+"""
+
+import queue
+import threading
+import time
+from config import logger, WORKER_COUNT, WORK_QUEUE_SIZE_PER_WORKER, REUSE_BROWSER_SESSION, LOOKUP_ENGINE
+from rate_limiter import search_limiter
+from stage_timing import tracer, FAILED
+from failures import StageFailure, classify_exception, SITE_ERROR
+
+
+# Sentinel telling a worker there is no more work
+_STOP = object()
+
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+def _record_failure(item, error):
+    """
+    Attach the failure kind, stage and message of a failed lookup to its
+    work item, for the journal and the dead-letter file
+    """
+    if isinstance(error, StageFailure):
+        logger.warning(f"Lookup failed for {item['number']}: {str(error)}")
+        item["failure"] = {"kind": error.kind, "stage": error.stage, "error": error.message}
+    else:
+        logger.error(f"Error during lookup for {item['number']}: {str(error)}", exc_info=True)
+        item["failure"] = {"kind": classify_exception(error), "stage": "lookup", "error": str(error)}
+
+
+def _browser_worker(work_queue, result_queue, history=None):
+    """
+    Pull work items from the work queue until the stop sentinel arrives,
+    scrape each one with this worker's own driver and push (item, result)
+    to the result queue. Never touches the Excel file.
+    item["baseline"] is the stored Actuaciones row (incremental mode);
+    history, when given, receives the full Actuaciones history.
+    """
+    # Imported here so runs with the HTTP engine never load Selenium
+    from web_driver import access_url, quit_driver
+    from web_scraper import scrape_number
+    from browser_session import BrowserSession
+
+    # Recycles the reused session before it degrades (REUSE_BROWSER_SESSION)
+    session = BrowserSession()
+    driver = None
+    try:
+        while True:
+            item = work_queue.get()
+            if item is _STOP:
+                break
+
+            number = item["number"]
+            logger.info(f"Processing number {item['index']}: {number}")
+            tracer.set_number(number)
+            result = None
+            started = time.perf_counter()
+            try:
+                # Each browser lookup counts as one search for the shared rate limiter
+                with tracer.span("lookup") as span, search_limiter.request():
+                    if REUSE_BROWSER_SESSION:
+                        # Keep the warm session and go back to the search form
+                        driver = session.acquire()
+                    else:
+                        # Start by accessing the URL
+                        driver = access_url()
+
+                    if driver:
+                        result = scrape_number(driver, number, item.get("baseline"), history)
+                    else:
+                        span["outcome"] = FAILED
+                        logger.error(f"Failed to initialize browser for: {number}")
+                        item["failure"] = {"kind": SITE_ERROR, "stage": "page_load",
+                                           "error": "browser could not be initialized"}
+
+            except Exception as e:
+                # The session is kept: only the failed stage was retried, and a
+                # broken session is replaced on the next number
+                _record_failure(item, e)
+
+            finally:
+                if REUSE_BROWSER_SESSION:
+                    session.record(time.perf_counter() - started, ok=result is not None)
+                else:
+                    # Close the driver after each search
+                    quit_driver(driver)
+                    driver = None
+
+            result_queue.put((item, result))
+
+    finally:
+        # Close this worker's session at the end of the run
+        if REUSE_BROWSER_SESSION:
+            session.close()
+        else:
+            quit_driver(driver)
+
+
+def _http_worker(work_queue, result_queue, history=None):
+    """
+    Same contract as _browser_worker, but looks numbers up through the JSON
+    backend on the shared keep-alive HTTP pool instead of a browser
+    (every backend request is paced by the shared rate limiter)
+    """
+    from api_client import fetch_number
+
+    while True:
+        item = work_queue.get()
+        if item is _STOP:
+            break
+
+        number = item["number"]
+        logger.info(f"Processing number {item['index']}: {number}")
+        tracer.set_number(number)
+        result = None
+        try:
+            with tracer.span("lookup"):
+                result = fetch_number(number, item.get("baseline"), history)
+        except Exception as e:
+            _record_failure(item, e)
+
+        result_queue.put((item, result))
+
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+def _feed(work_items, work_queue, result_queue, worker_count, feed_state):
+    """
+    Consume work_items lazily and hand them to the workers. The bounded work
+    queue makes this thread wait while the workers are busy, so the input is
+    never read far ahead of the lookups. Items that already carry a result
+    (cache hits, resumed numbers) skip the workers and go straight to the
+    collector.
+    """
+    try:
+        for index, item in enumerate(work_items, start=1):
+            item["index"] = index
+            feed_state["fed"] += 1
+            if "result" in item:
+                result_queue.put((item, item["result"]))
+            else:
+                work_queue.put(item)
+    except Exception as e:
+        logger.error(f"Error reading work items: {str(e)}", exc_info=True)
+        # Re-raised by run_worker_pool once the items already fed are handled
+        feed_state["error"] = e
+    finally:
+        for _ in range(worker_count):
+            work_queue.put(_STOP)
+        feed_state["done"].set()
+
+
+def run_worker_pool(work_items, handle_result, worker_count=WORKER_COUNT, history=None):
+    """
+    Look up the numbers in work_items with worker_count concurrent workers,
+    using the engine selected by LOOKUP_ENGINE ("selenium" or "http").
+    work_items is any iterable (typically a generator over the input file) of
+    dictionaries with a 'number' key and optionally a 'baseline' (incremental
+    mode) or a ready 'result'; it is read on a separate thread while the
+    workers run, so lookups start on the first numbers before the rest of
+    the input has been read.
+    handle_result(item, result) is called from the calling thread for every
+    item as results arrive, so only one thread ever writes to the Excel file.
+    result is None when the lookup failed; item["failure"] then holds its
+    failure kind, stage and message.
+    history (an actuaciones_history.HistoryStore, thread-safe) is filled by
+    the workers with the full Actuaciones history as pages are read.
+    If reading work_items fails, the items already fed are still handled and
+    the error is then raised.
+    """
+    worker_count = max(1, worker_count)
+    work_queue = queue.Queue(maxsize=worker_count * WORK_QUEUE_SIZE_PER_WORKER)
+    result_queue = queue.Queue()
+    feed_state = {"fed": 0, "done": threading.Event(), "error": None}
+
+    feeder = threading.Thread(
+        target=_feed,
+        args=(work_items, work_queue, result_queue, worker_count, feed_state),
+        name="feeder",
+        daemon=True
+    )
+    feeder.start()
+
+    worker_target = _http_worker if LOOKUP_ENGINE == "http" else _browser_worker
+    logger.info(f"Starting {worker_count} {LOOKUP_ENGINE} worker(s)")
+    workers = []
+    for worker_id in range(1, worker_count + 1):
+        worker = threading.Thread(
+            target=worker_target,
+            args=(work_queue, result_queue, history),
+            name=f"worker-{worker_id}",
+            daemon=True
+        )
+        worker.start()
+        workers.append(worker)
+
+    # Collect exactly one result per item fed. The short timeout keeps the
+    # main thread responsive to Ctrl-C while waiting.
+    collected = 0
+    while not (feed_state["done"].is_set() and collected == feed_state["fed"]):
+        try:
+            item, result = result_queue.get(timeout=1)
+        except queue.Empty:
+            continue
+        collected += 1
+        try:
+            handle_result(item, result)
+        except Exception as e:
+            logger.error(f"Error handling result for {item['number']}: {str(e)}", exc_info=True)
+
+    for worker in workers:
+        worker.join()
+    if feed_state["error"] is not None:
+        # An input that could not be read completely is not a finished run
+        logger.error(f"Stopping the run: the input could not be read completely ({collected} number(s) handled; "
+                     f"continue with --resume)")
+        raise feed_state["error"]
+    return collected